@@ -0,0 +1,127 @@
+import argparse
+import asyncio
+import sys
+import time
+
+from ucapi_framework import DeviceEvents
+
+from uc_intg_stormaudio.config import StormAudioConfig
+from uc_intg_stormaudio.device import BURST_MAX_DURATION, StormAudioDevice
+
+# The start of an initial state dump, which is never terminated by `ssp.zones.profiles.end`
+INITIAL_LINES = (
+    "ssp.power.on",
+    "ssp.procstate.[2]",
+    "ssp.mute.off",
+    "ssp.vol.[-40.0]",
+)
+
+
+async def stream_without_end_marker(
+    reader: asyncio.StreamReader, writer: asyncio.StreamWriter, interval: float
+) -> None:
+    """Stream level updates more often than the idle gap, and acknowledge mute commands."""
+
+    async def stream() -> None:
+        for line in INITIAL_LINES:
+            writer.write((line + "\n").encode())
+        volume = -40.0
+        while True:
+            volume = -40.0 if volume < -60.0 else volume - 0.5
+            writer.write(f"ssp.vol.[{volume:.1f}]\n".encode())
+            await writer.drain()
+            await asyncio.sleep(interval)
+
+    streamer = asyncio.create_task(stream())
+    try:
+        while data := await reader.readline():
+            if (command := data.decode().strip()) in ("ssp.mute.on", "ssp.mute.off"):
+                writer.write((command + "\n").encode())
+    except ConnectionError:
+        pass
+    finally:
+        streamer.cancel()
+        writer.close()
+
+
+async def run(args: argparse.Namespace) -> bool:
+    server = await asyncio.start_server(
+        lambda reader, writer: stream_without_end_marker(reader, writer, args.interval),
+        "127.0.0.1",
+        args.port,
+    )
+    device = StormAudioDevice(
+        StormAudioConfig(
+            identifier="isp", name="ISP", address="127.0.0.1", port=args.port
+        ),
+        loop=asyncio.get_running_loop(),
+    )
+    updates = 0
+
+    def on_update(*_args) -> None:
+        nonlocal updates
+        updates += 1
+
+    device.events.on(DeviceEvents.UPDATE, on_update)
+
+    try:
+        started_at = time.monotonic()
+        await device.connect()
+        try:
+            await asyncio.wait_for(
+                device._burst_complete.wait(), BURST_MAX_DURATION + 1.0
+            )
+            burst_duration = time.monotonic() - started_at
+        except asyncio.TimeoutError:
+            burst_duration = None
+
+        started_at = time.monotonic()
+        await device.mute_on(force=True)
+        mute_duration = time.monotonic() - started_at
+
+        # The updates of the streamed lines are published, too, once the burst has completed
+        updates_before = updates
+        await asyncio.sleep(1.0)
+        updates_after_burst = updates - updates_before
+    finally:
+        await device.disconnect()
+        server.close()
+        await server.wait_closed()
+
+    print(
+        "burst completed:  "
+        + (f"{burst_duration * 1000:.0f} ms" if burst_duration is not None else "never")
+    )
+    print(f"mute_on:          {mute_duration * 1000:.0f} ms")
+    print(f"updates:          {updates} ({updates_after_burst} in the last second)")
+
+    return (
+        burst_duration is not None
+        and burst_duration <= BURST_MAX_DURATION + 0.5
+        and mute_duration < 1.0
+        and updates_after_burst > 0
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Check that an initial state dump without an end marker still completes in time"
+    )
+    parser.add_argument(
+        "--port", type=int, default=2400, help="port of the streaming ISP"
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=0.1,
+        help="seconds between two streamed lines, must be below the burst's idle gap",
+    )
+    args = parser.parse_args()
+
+    if not asyncio.run(run(args)):
+        print("FAILED")
+        sys.exit(1)
+    print("OK")
+
+
+main()
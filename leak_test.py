@@ -0,0 +1,125 @@
+import argparse
+import asyncio
+import gc
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from uc_intg_stormaudio.stormaudio import ConnectionLostError, StormAudioClient
+
+
+def open_sockets() -> int:
+    """Return the number of open sockets of this process, or -1 if they can't be counted on this platform."""
+    try:
+        return sum(
+            os.readlink(f"/proc/self/fd/{fd}").startswith("socket:")
+            for fd in os.listdir("/proc/self/fd")
+        )
+    except OSError:
+        return -1
+
+
+async def cycle(client: StormAudioClient) -> float:
+    """Connect, wait for a response that never arrives, close, and return how long the waiter took to fail."""
+    connection = await client.connect()
+    reader = asyncio.create_task(client.parse_response_messages(connection))
+    waiter = asyncio.create_task(
+        client.wait_for_response("ssp.never.", timeout=5.0, prefix_match=True)
+    )
+    await asyncio.sleep(0)
+
+    started_at = time.perf_counter()
+    await client.close(connection)
+    try:
+        await waiter
+    except ConnectionLostError:
+        pass
+    else:
+        raise AssertionError("The waiter didn't fail when the connection was closed")
+    failed_after = time.perf_counter() - started_at
+
+    await reader
+    return failed_after
+
+
+async def run(args: argparse.Namespace) -> bool:
+    client = StormAudioClient("127.0.0.1", args.port)
+
+    # Warm up, so one-time allocations (e.g. imports, the DNS cache) aren't counted as leaks
+    for _ in range(100):
+        await cycle(client)
+    gc.collect()
+    tracemalloc.start()
+    memory_before = tracemalloc.get_traced_memory()[0]
+    tasks_before = len(asyncio.all_tasks())
+    sockets_before = open_sockets()
+
+    slowest_failure = 0.0
+    for _ in range(args.cycles):
+        slowest_failure = max(slowest_failure, await cycle(client))
+
+    gc.collect()
+    memory_growth = tracemalloc.get_traced_memory()[0] - memory_before
+    tracemalloc.stop()
+    tasks = len(asyncio.all_tasks()) - tasks_before
+    sockets = open_sockets() - sockets_before if sockets_before >= 0 else 0
+    waiters = len(client._waiters)
+
+    print(f"cycles:           {args.cycles}")
+    print(f"slowest failure:  {slowest_failure * 1000:.2f} ms")
+    print(f"memory growth:    {memory_growth / 1024:.1f} KB")
+    print(f"leaked tasks:     {tasks}")
+    print(f"leaked sockets:   {sockets}")
+    print(f"leaked waiters:   {waiters}")
+
+    return (
+        memory_growth <= args.max_memory_growth * 1024
+        and tasks == 0
+        and sockets == 0
+        and waiters == 0
+    )
+
+
+async def run_with_emulator(args: argparse.Namespace) -> bool:
+    # The emulated ISP runs in its own process, so its sockets and memory aren't counted. Its warnings about writing
+    # the initial data burst to the already closed connections are expected, so they are discarded.
+    emulator = subprocess.Popen(
+        [sys.executable, "server.py", "--count=1", f"--port={args.port}", "--quiet"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        await asyncio.sleep(1)
+        return await run(args)
+    finally:
+        emulator.terminate()
+        emulator.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Check that connect/disconnect cycles leak neither tasks, sockets, waiters nor memory"
+    )
+    parser.add_argument(
+        "--cycles", type=int, default=10_000, help="connect/disconnect cycles"
+    )
+    parser.add_argument(
+        "--port", type=int, default=2300, help="port of the emulated ISP"
+    )
+    parser.add_argument(
+        "--max-memory-growth",
+        type=float,
+        default=256.0,
+        help="memory growth in KB, above which the cycles are considered leaking",
+    )
+    args = parser.parse_args()
+
+    if not asyncio.run(run_with_emulator(args)):
+        print("LEAKING")
+        sys.exit(1)
+    print("OK")
+
+
+main()
@@ -0,0 +1,186 @@
+import argparse
+import asyncio
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from uc_intg_stormaudio.config import StormAudioConfig
+from uc_intg_stormaudio.device import StormAudioDevice
+
+
+class MeasuredDevice(StormAudioDevice):
+    """Device, which counts the lines it has processed."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lines = 0
+
+    def _process_message(self, msg: str) -> None:
+        self.lines += 1
+        super()._process_message(msg)
+
+    def _apply_batch(self, lines: list[str]) -> None:
+        self.lines += len(lines)
+        super()._apply_batch(lines)
+
+
+async def measure(
+    count: int, port: int, duration: float, commands: int
+) -> dict[str, float]:
+    tracemalloc.start()
+    memory_before = tracemalloc.get_traced_memory()[0]
+
+    devices = [
+        MeasuredDevice(
+            StormAudioConfig(
+                identifier=f"isp_{index}",
+                name=f"ISP {index}",
+                address="127.0.0.1",
+                port=port + index,
+            ),
+            loop=asyncio.get_running_loop(),
+        )
+        for index in range(count)
+    ]
+    for device in devices:
+        await device.connect()
+
+    # Wait for all initial data bursts
+    await asyncio.gather(
+        *(asyncio.wait_for(device._burst_complete.wait(), 10) for device in devices)
+    )
+    memory_per_device = (tracemalloc.get_traced_memory()[0] - memory_before) / count
+    tracemalloc.stop()
+
+    lines_before = sum(device.lines for device in devices)
+    cpu_before = time.process_time()
+    await asyncio.sleep(duration)
+    lines = sum(device.lines for device in devices) - lines_before
+    cpu = time.process_time() - cpu_before
+
+    latencies = []
+
+    async def send_commands(device: MeasuredDevice) -> None:
+        for index in range(commands):
+            started_at = time.perf_counter()
+            await (
+                device.mute_on(force=True)
+                if index % 2 == 0
+                else device.mute_off(force=True)
+            )
+            latencies.append(time.perf_counter() - started_at)
+
+    await asyncio.gather(*(send_commands(device) for device in devices))
+
+    for device in devices:
+        await device.disconnect()
+
+    return {
+        "devices": count,
+        "memory_per_device_kb": memory_per_device / 1024,
+        "lines_per_second": lines / duration,
+        "cpu_per_line_us": cpu / lines * 1_000_000 if lines else 0.0,
+        "latency_p50_ms": statistics.median(latencies) * 1000,
+        "latency_p95_ms": statistics.quantiles(latencies, n=20)[-1] * 1000,
+    }
+
+
+async def run_sizes(args: argparse.Namespace) -> None:
+    for count in args.sizes:
+        # The emulated ISPs run in their own process, so they don't skew the driver's measurements
+        emulator = subprocess.Popen(
+            [
+                sys.executable,
+                "server.py",
+                f"--count={count}",
+                f"--port={args.port}",
+                f"--profile={args.profile}",
+                "--quiet",
+            ],
+            stdout=subprocess.DEVNULL,
+        )
+        try:
+            await asyncio.sleep(1)
+            result = await measure(count, args.port, args.duration, args.commands)
+        finally:
+            emulator.terminate()
+            emulator.wait()
+
+        print(
+            f"{args.loop:>8} {result['devices']:>8} {result['memory_per_device_kb']:>11.1f} KB"
+            f" {result['lines_per_second']:>9.0f} {result['cpu_per_line_us']:>6.1f} µs"
+            f" {result['latency_p50_ms']:>9.2f} ms {result['latency_p95_ms']:>9.2f} ms",
+            flush=True,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure how the driver scales with the number of ISPs"
+    )
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[1, 10, 50],
+        help="numbers of ISPs to measure",
+    )
+    parser.add_argument(
+        "--loops",
+        nargs="+",
+        choices=["asyncio", "uvloop"],
+        default=["asyncio", "uvloop"],
+        help="event loops to measure the driver on",
+    )
+    parser.add_argument("--loop", help=argparse.SUPPRESS)
+    parser.add_argument(
+        "--port", type=int, default=2300, help="port of the first emulated ISP"
+    )
+    parser.add_argument(
+        "--profile",
+        default="mixed",
+        help="traffic profile of the emulated ISPs, see server.py",
+    )
+    parser.add_argument(
+        "--duration",
+        type=float,
+        default=10.0,
+        help="seconds to measure the CPU time per line",
+    )
+    parser.add_argument(
+        "--commands",
+        type=int,
+        default=20,
+        help="commands per ISP to measure the latency",
+    )
+    args = parser.parse_args()
+
+    if args.loop is None:
+        # Every event loop is measured in a fresh process, as asyncio primitives are bound to a single loop
+        print(
+            f"{'loop':>8} {'devices':>8} {'memory/device':>14} {'lines/s':>9} {'CPU/line':>9}"
+            f" {'latency p50':>12} {'latency p95':>12}",
+            flush=True,
+        )
+        for loop in args.loops:
+            subprocess.run(
+                [sys.executable, __file__, *sys.argv[1:], f"--loop={loop}"], check=True
+            )
+        return
+
+    loop_factory = None
+    if args.loop == "uvloop":
+        try:
+            import uvloop
+        except ImportError:
+            print(f"{args.loop:>8} is not installed")
+            return
+        loop_factory = uvloop.new_event_loop
+
+    with asyncio.Runner(loop_factory=loop_factory) as runner:
+        runner.run(run_sizes(args))
+
+
+main()
@@ -1,8 +1,50 @@
+import argparse
 import asyncio
+import itertools
 import os
 from asyncio import StreamWriter
+from dataclasses import dataclass, field
 from typing import AsyncIterator
 
+PROFILES = ("idle", "slider", "flapping")
+
+# Lines sent alternately by the `flapping` profile, like an ISP does while the source's audio/video format settles
+FLAPPING_LINES = (
+    (
+        "ssp.fs.[48 kHz]",
+        "ssp.stream.[PCM]",
+        "ssp.format.[2.0.0]",
+        "ssp.allowedmode.[7]",
+        'ssp.hdmi1.timing.["1920x1080@60Hz"]',
+        'ssp.hdmi1.hdr.["SDR"]',
+    ),
+    (
+        "ssp.fs.[48 kHz]",
+        "ssp.stream.[Dolby Atmos TrueHD]",
+        "ssp.format.[7.1.4]",
+        "ssp.allowedmode.[3]",
+        'ssp.hdmi1.timing.["3840x2160@24Hz"]',
+        'ssp.hdmi1.hdr.["HDR10"]',
+    ),
+)
+
+
+@dataclass
+class EmulatedIsp:
+    """State of a single emulated ISP, every one of them listens on its own port."""
+
+    port: int
+    profile: str = "idle"
+    quiet: bool = False
+    powered_on: bool = False
+    muted: bool = False
+    volume: float = -55.0
+    writers: set[StreamWriter] = field(default_factory=set)
+
+    def log(self, message: str) -> None:
+        if not self.quiet:
+            print(f"[{self.port}] {message}")
+
 
 async def readlines(reader: asyncio.StreamReader) -> AsyncIterator[bytes]:
     while line := await read_until_eol(reader):
@@ -20,8 +62,8 @@ async def read_until_eol(reader: asyncio.StreamReader) -> bytes | None:
     return None
 
 
-def send_initial_data_burst(writer: StreamWriter, powered_on: bool = False) -> None:
-    if powered_on:
+def send_initial_data_burst(writer: StreamWriter, isp: EmulatedIsp) -> None:
+    if isp.powered_on:
         writer.write(("ssp.power.on" + "\n").encode())
         writer.write(("ssp.procstate.[2]" + "\n").encode())
     else:
@@ -39,8 +81,8 @@ def send_initial_data_burst(writer: StreamWriter, powered_on: bool = False) -> N
     writer.write(("ssp.version.[4.7r2-rc4]" + "\n").encode())
     writer.write(("ssp.msgstatus.[0]" + "\n").encode())
     writer.write(('ssp.msgstatusTxt.[0, ""]' + "\n").encode())
-    writer.write(("ssp.mute.off" + "\n").encode())
-    writer.write(("ssp.vol.[-55.0]" + "\n").encode())
+    writer.write((f"ssp.mute.{'on' if isp.muted else 'off'}" + "\n").encode())
+    writer.write((f"ssp.vol.[{isp.volume:.1f}]" + "\n").encode())
     writer.write(("ssp.dim.off" + "\n").encode())
     writer.write(("ssp.input.[1]" + "\n").encode())
     writer.write(("ssp.inputZone2.[0]" + "\n").encode())
@@ -145,42 +187,151 @@ def send_initial_data_burst(writer: StreamWriter, powered_on: bool = False) -> N
     writer.write(("ssp.zones.profiles.end" + "\n").encode())
 
 
-async def handle_connection(reader, writer):
+async def handle_connection(isp: EmulatedIsp, reader, writer):
     addr = writer.get_extra_info("peername")
 
-    print(f"Connected to: {addr!r}")
+    isp.log(f"Connected to: {addr!r}")
+    isp.writers.add(writer)
+
+    try:
+        send_initial_data_burst(writer, isp)
+        await writer.drain()
+
+        async for data in readlines(reader):
+            message = data.decode().strip()
+            isp.log(f"Message from client: {message!r}")
+
+            match message:
+                case "ssp.power.on":
+                    isp.powered_on = True
+                    send_initial_data_burst(writer, isp)
+                    await writer.drain()
+
+                case "ssp.power.off":
+                    isp.powered_on = False
+                    writer.write(("ssp.power.off" + "\n").encode())
+                    writer.write(("ssp.procstate.[0]" + "\n").encode())
+                    await writer.drain()
+
+                case "ssp.procstate":
+                    writer.write(("ssp.procstate.[2]" + "\n").encode())
+                    await writer.drain()
+
+                case "ssp.mute.on" | "ssp.mute.off" | "ssp.mute.toggle":
+                    isp.muted = (
+                        not isp.muted
+                        if message == "ssp.mute.toggle"
+                        else message == "ssp.mute.on"
+                    )
+                    writer.write(
+                        (f"ssp.mute.{'on' if isp.muted else 'off'}" + "\n").encode()
+                    )
+                    await writer.drain()
+
+                case message if message.startswith("ssp.vol.["):
+                    isp.volume = float(message[len("ssp.vol.[") : -1])  # noqa: E203
+                    writer.write((f"ssp.vol.[{isp.volume:.1f}]" + "\n").encode())
+                    await writer.drain()
+    except ConnectionError:
+        # The client has closed the connection while it was written to
+        pass
+    finally:
+        isp.writers.discard(writer)
+
+    isp.log(f"{addr}: Connection closed by the remote peer.")
+
+
+async def generate_traffic(isp: EmulatedIsp) -> None:
+    """Push unsolicited state changes to all clients of the ISP, according to its traffic profile."""
+    match isp.profile:
+        case "slider":
+            # Somebody drags the volume slider on the front panel, the ISP reports every 0.5 dB step
+            for step in itertools.cycle([*range(0, 40), *range(40, 0, -1)]):
+                isp.volume = -60.0 + step / 2
+                broadcast(isp, f"ssp.vol.[{isp.volume:.1f}]")
+                await asyncio.sleep(0.02)
+
+        case "flapping":
+            # The source's format flips several times per second, e.g. while switching sources
+            for lines in itertools.cycle(FLAPPING_LINES):
+                for line in lines:
+                    broadcast(isp, line)
+                await asyncio.sleep(0.1)
+
+
+def broadcast(isp: EmulatedIsp, line: str) -> None:
+    for writer in isp.writers:
+        writer.write((line + "\n").encode())
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="StormAudio ISP emulator")
+    parser.add_argument("--count", type=int, default=1, help="number of emulated ISPs")
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=23,
+        help="port of the first ISP, the others use the next ports",
+    )
+    parser.add_argument(
+        "--profile",
+        choices=[*PROFILES, "mixed"],
+        default="idle",
+        help="traffic profile of the ISPs, `mixed` assigns the profiles round-robin",
+    )
+    parser.add_argument(
+        "--quiet", action="store_true", help="don't log connections and messages"
+    )
+    parser.add_argument(
+        "--loop",
+        choices=["asyncio", "uvloop"],
+        default="asyncio",
+        help="event loop of the emulator",
+    )
+    return parser.parse_args()
+
+
+async def main(args: argparse.Namespace):
+    print(f"Running on the {args.loop} event loop")
 
-    send_initial_data_burst(writer)
-    await writer.drain()
+    isps = [
+        EmulatedIsp(
+            port=args.port + index,
+            profile=PROFILES[index % len(PROFILES)]
+            if args.profile == "mixed"
+            else args.profile,
+            quiet=args.quiet,
+        )
+        for index in range(args.count)
+    ]
 
-    async for data in readlines(reader):
-        message = data.decode().strip()
-        print(f"Message from client: {message!r}")
+    servers = []
+    for isp in isps:
+        server = await asyncio.start_server(
+            lambda reader, writer, isp=isp: handle_connection(isp, reader, writer),
+            "0.0.0.0",
+            isp.port,
+        )
+        servers.append(server)
+        addrs = ", ".join(str(sock.getsockname()) for sock in server.sockets)
+        print(f"Serving on {addrs} ({isp.profile})")
 
-        match message:
-            case "ssp.power.on":
-                send_initial_data_burst(writer, True)
-                await writer.drain()
+    traffic = [asyncio.create_task(generate_traffic(isp)) for isp in isps]
 
-            case "ssp.power.off":
-                writer.write(("ssp.power.off" + "\n").encode())
-                writer.write(("ssp.procstate.[0]" + "\n").encode())
-                await writer.drain()
+    await asyncio.gather(*(server.serve_forever() for server in servers), *traffic)
 
-            case "ssp.procstate":
-                writer.write(("ssp.procstate.[2]" + "\n").encode())
-                await writer.drain()
 
-    print(f"{addr}: Connection closed by the remote peer.")
+def run() -> None:
+    args = parse_args()
 
+    loop_factory = None
+    if args.loop == "uvloop":
+        import uvloop
 
-async def main():
-    server = await asyncio.start_server(handle_connection, "0.0.0.0", 23)
-    addrs = ", ".join(str(sock.getsockname()) for sock in server.sockets)
-    print(f"Serving on {addrs}")
+        loop_factory = uvloop.new_event_loop
 
-    async with server:
-        await server.serve_forever()
+    with asyncio.Runner(loop_factory=loop_factory) as runner:
+        runner.run(main(args))
 
 
-asyncio.run(main())
+run()
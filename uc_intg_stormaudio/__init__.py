@@ -7,25 +7,50 @@ the driver, sets up logging, and starts the integration API.
 :license: Mozilla Public License Version 2.0, see LICENSE for more details.
 """
 
+import argparse
 import asyncio
 import logging
 import os
+import signal
 
-from ucapi_framework import BaseConfigManager, BaseIntegrationDriver, get_config_path
+from ucapi_framework import BaseIntegrationDriver, get_config_path
 
 from uc_intg_stormaudio.config import StormAudioConfig
-from uc_intg_stormaudio.const import Loggers, SelectType, SensorType
+from uc_intg_stormaudio.const import Loggers, SelectType
 from uc_intg_stormaudio.device import StormAudioDevice
-from uc_intg_stormaudio.discover import StormAudioDiscovery
+from uc_intg_stormaudio.diagnostics import configure as configure_diagnostics
+from uc_intg_stormaudio.diagnostics import write_diagnostics
+from uc_intg_stormaudio.discover import StormAudioDiscovery, StormAudioDiscoveryCache
+from uc_intg_stormaudio.loop_monitor import LoopMonitor
 from uc_intg_stormaudio.media_player import StormAudioMediaPlayer
+from uc_intg_stormaudio.persistence import PersistenceWorker, StormAudioConfigManager
+from uc_intg_stormaudio.profiler import DEFAULT_DURATION
+from uc_intg_stormaudio.profiler import configure as configure_profiler
+from uc_intg_stormaudio.profiler import start_profiling
 from uc_intg_stormaudio.remote import StormAudioRemote
 from uc_intg_stormaudio.select import StormAudioSelect
-from uc_intg_stormaudio.sensor import StormAudioSensor
+from uc_intg_stormaudio.sensor import StormAudioSensor, get_sensor_types
 from uc_intg_stormaudio.setup import StormAudioSetupFlow
+from uc_intg_stormaudio.startup import StartupProfile
+from uc_intg_stormaudio.tracing import configure as configure_tracing
+
+_LOG = logging.getLogger(Loggers.DRIVER)
+
+_SERVICE_TYPE = "_stormremote._tcp.local."
 
 
 async def main():
     """Start the Remote Two integration driver."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        default=os.getenv("UC_PROFILE_STARTUP", "false").lower() == "true",
+        help="write the timings of the startup phases to the configuration directory",
+    )
+    args, _unknown = parser.parse_known_args()
+    startup_profile = StartupProfile() if args.profile_startup else None
+
     logging.basicConfig()
 
     # Configure logging level from environment variable
@@ -33,44 +58,137 @@ async def main():
     for logger in Loggers:
         logging.getLogger(logger).setLevel(level)
 
+    _LOG.info(
+        "Running on the %s event loop",
+        "uvloop"
+        if type(asyncio.get_running_loop()).__module__.startswith("uvloop")
+        else "default asyncio",
+    )
+
+    # Measure the event loop's lag, as a single slow step delays everything else
+    debug_loop = os.getenv("UC_LOOP_MONITOR_DEBUG", "false").lower() == "true"
+    loop_monitor = LoopMonitor(debug=debug_loop)
+    loop_monitor.start()
+
+    # All files are written by a single background worker, so the event loop never waits for the storage
+    persistence = PersistenceWorker()
+
+    # The discovery cache is shared by the setup flow and all devices, so they can follow DHCP address changes
+    discovery_cache = StormAudioDiscoveryCache(
+        service_type=_SERVICE_TYPE, persistence=persistence
+    )
+
     # Initialize the integration driver
     integration_driver = BaseIntegrationDriver(
-        device_class=StormAudioDevice,
+        device_class=StormAudioDevice.with_discovery_cache(discovery_cache),
         entity_classes=[
             StormAudioMediaPlayer,
             StormAudioRemote,
             lambda device_config, dev: [
-                StormAudioSelect(dev, select_type) for select_type in SelectType
+                StormAudioSelect(dev, select_type)
+                for select_type in SelectType
+                if select_type in device_config.select_types
             ],
             lambda device_config, dev: [
-                StormAudioSensor(dev, sensor_type) for sensor_type in SensorType
+                StormAudioSensor(dev, sensor_type)
+                for sensor_type in get_sensor_types(device_config)
             ],
         ],
     )
+    _mark(startup_profile, "driver")
 
     # Configure the device config manager
-    integration_driver.config_manager = BaseConfigManager(
-        get_config_path(integration_driver.api.config_dir_path),
+    config_path = get_config_path(integration_driver.api.config_dir_path)
+    integration_driver.config_manager = StormAudioConfigManager(
+        config_path,
         integration_driver.on_device_added,
         integration_driver.on_device_removed,
         config_class=StormAudioConfig,
+        persistence=persistence,
     )
+    discovery_cache.load(config_path)
+    if os.getenv("UC_TRACE_COMMANDS", "false").lower() == "true":
+        configure_tracing(config_path)
+    _mark(startup_profile, "config")
 
     # Register all configured devices from config file
     await integration_driver.register_all_device_instances(True)
+    _mark(startup_profile, "devices")
 
     # Set up device discovery (optional - remove if not using discovery)
-    discovery = StormAudioDiscovery(timeout=5, service_type="_stormremote._tcp.local.")
+    discovery = StormAudioDiscovery(
+        timeout=5,
+        service_type=_SERVICE_TYPE,
+        probe_subnet=os.getenv("UC_DISCOVERY_PROBE_SUBNET", "false").lower() == "true",
+        cache=discovery_cache,
+    )
     setup_handler = StormAudioSetupFlow.create_handler(
         driver=integration_driver, discovery=discovery
     )
 
     # Initialize the API with the driver configuration
     await integration_driver.api.init("driver.json", setup_handler)
+    _mark(startup_profile, "api")
+
+    # Keep the discovery cache up to date in the background. It's not needed before, so it doesn't delay the API.
+    await discovery_cache.start()
+    _mark(startup_profile, "discovery")
+
+    if startup_profile:
+        startup_profile.write(config_path, persistence)
+
+    # The profiler can be started via the environment, the remote entity (`PROFILE_<Seconds>`) or SIGUSR1
+    configure_profiler(config_path, persistence)
+    if profile_seconds := float(os.getenv("UC_PROFILE_SECONDS", "0")):
+        start_profiling(profile_seconds)
+    try:
+        asyncio.get_running_loop().add_signal_handler(
+            signal.SIGUSR1, start_profiling, DEFAULT_DURATION
+        )
+    except (AttributeError, NotImplementedError):
+        _LOG.debug("Profiling via SIGUSR1 isn't supported on this platform")
+
+    # The metrics are written to the configuration directory periodically, and via the remote entity (`DIAGNOSTICS`)
+    configure_diagnostics(config_path, persistence, loop_monitor.metrics).start()
 
     # Keep the driver running
-    await asyncio.Future()
+    await _run_until_stopped(persistence)
+
+
+async def _run_until_stopped(persistence: PersistenceWorker) -> None:
+    """Keep the driver running until it is terminated (SIGTERM) or interrupted, then write the pending files."""
+    stopping = asyncio.Event()
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stopping.set)
+    except (AttributeError, NotImplementedError):
+        _LOG.debug("Shutting down on SIGTERM isn't supported on this platform")
+
+    try:
+        await stopping.wait()
+    finally:
+        # The files scheduled but not written yet (e.g. the configuration) would be lost otherwise
+        _LOG.info("Shutting down, writing the pending files")
+        write_diagnostics()
+        await persistence.flush()
+
+
+def _mark(startup_profile: StartupProfile | None, phase: str) -> None:
+    if startup_profile:
+        startup_profile.mark(phase)
+
+
+def run() -> None:
+    """Run the integration driver on uvloop, if it is installed, or on the default asyncio event loop otherwise."""
+    try:
+        import uvloop  # pylint: disable=import-outside-toplevel
+
+        loop_factory = uvloop.new_event_loop
+    except ImportError:
+        loop_factory = None
+
+    with asyncio.Runner(loop_factory=loop_factory) as runner:
+        runner.run(main())
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    run()
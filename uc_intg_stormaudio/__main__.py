@@ -6,9 +6,7 @@ This allows running: python -m uc_intg_stormaudio
 :license: Mozilla Public License Version 2.0, see LICENSE for more details.
 """
 
-import asyncio
-
-from . import main
+from . import run
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    run()
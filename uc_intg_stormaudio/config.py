@@ -7,6 +7,9 @@ This module contains the configuration dataclass
 """
 
 from dataclasses import dataclass, field
+from typing import Any
+
+from uc_intg_stormaudio.const import SelectType, StatusType
 
 
 @dataclass
@@ -30,8 +33,26 @@ class StormAudioConfig:
     port: int = 23
     """Port number for device communication."""
 
+    queue_while_offline: bool = False
+    """Whether to queue commands while the device is offline and send them once it reconnects."""
+
+    consolidated_status: bool = False
+    """Whether to expose a few status sensors (audio, video, processing, tone) instead of one sensor per value."""
+
+    sensor_groups: list[str] = field(default_factory=lambda: list(StatusType))
+    """Sensor groups (see `StatusType`) to expose, the sensors of all other groups aren't created at all."""
+
+    select_types: list[str] = field(default_factory=lambda: list(SelectType))
+    """Select types (see `SelectType`) to expose, all other selects aren't created at all."""
+
+    max_update_rates: dict[str, float] = field(default_factory=dict)
+    """Maximum updates per second per sensor type, overriding `SENSOR_MAX_UPDATE_RATES` (0 means uncapped)."""
+
     sources: dict[str, int] = field(default_factory=dict)
     """Dictionary containing all the currently configured sources/inputs of the StormAudio ISP."""
 
     presets: dict[str, int] = field(default_factory=dict)
     """Dictionary containing all the currently configured presets of the StormAudio ISP."""
+
+    scenes: dict[str, dict[str, Any]] = field(default_factory=dict)
+    """Dictionary containing the named scenes, i.e. the target state per scene attribute (see `SceneAttribute`)."""
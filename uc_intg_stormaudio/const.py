@@ -82,6 +82,7 @@ class StormAudioCommands(StrEnum):
     POWER_OFF = "ssp.power.off"
     POWER_TOGGLE = "ssp.power.toggle"
     PROC_STATE = "ssp.procstate"
+    MUTE = "ssp.mute"
     MUTE_ON = "ssp.mute.on"
     MUTE_OFF = "ssp.mute.off"
     MUTE_TOGGLE = "ssp.mute.toggle"
@@ -89,11 +90,16 @@ class StormAudioCommands(StrEnum):
     VOLUME_X_FORMAT = "ssp.vol.[{:.1f}]"
     VOLUME_DOWN = "ssp.vol.down"
     VOLUME_UP = "ssp.vol.up"
+    INPUT = "ssp.input"
     INPUT_X_FORMAT = "ssp.input.[{}]"
+    SURROUND_MODE = "ssp.surroundmode"
     SURROUND_MODE_X_FORMAT = "ssp.surroundmode.[{}]"
     PRESET_NEXT = "ssp.preset.next"
     PRESET_PREV = "ssp.preset.prev"
+    PRESET = "ssp.preset"
     PRESET_X_FORMAT = "ssp.preset.[{}]"
+    LOUDNESS = "ssp.loudness"
+    LOUDNESS_X_FORMAT = "ssp.loudness.[{}]"
     LOUDNESS_OFF = "ssp.loudness.[0]"
     LOUDNESS_LOW = "ssp.loudness.[1]"
     LOUDNESS_MEDIUM = "ssp.loudness.[2]"
@@ -105,26 +111,32 @@ class StormAudioCommands(StrEnum):
     NAV_OK = "ssp.nav.ok"
     NAV_BACK = "ssp.nav.back"
     BASS = "ssp.bass"
+    BASS_X_FORMAT = "ssp.bass.[{}]"
     BASS_UP = "ssp.bass.up"
     BASS_DOWN = "ssp.bass.down"
     BASS_RESET = "ssp.bass.[0]"
     TREBLE = "ssp.treble"
+    TREBLE_X_FORMAT = "ssp.treble.[{}]"
     TREBLE_UP = "ssp.treble.up"
     TREBLE_DOWN = "ssp.treble.down"
     TREBLE_RESET = "ssp.treble.[0]"
     BRIGHTNESS = "ssp.brightness"
+    BRIGHTNESS_X_FORMAT = "ssp.brightness.[{}]"
     BRIGHTNESS_UP = "ssp.brightness.up"
     BRIGHTNESS_DOWN = "ssp.brightness.down"
     BRIGHTNESS_RESET = "ssp.brightness.[0]"
     CENTER_ENHANCE = "ssp.c_en"
+    CENTER_ENHANCE_X_FORMAT = "ssp.c_en.[{}]"
     CENTER_ENHANCE_UP = "ssp.c_en.up"
     CENTER_ENHANCE_DOWN = "ssp.c_en.down"
     CENTER_ENHANCE_RESET = "ssp.c_en.[0]"
     SURROUND_ENHANCE = "ssp.s_en"
+    SURROUND_ENHANCE_X_FORMAT = "ssp.s_en.[{}]"
     SURROUND_ENHANCE_UP = "ssp.s_en.up"
     SURROUND_ENHANCE_DOWN = "ssp.s_en.down"
     SURROUND_ENHANCE_RESET = "ssp.s_en.[0]"
     LFE_ENHANCE = "ssp.lfe_en"
+    LFE_ENHANCE_X_FORMAT = "ssp.lfe_en.[{}]"
     LFE_ENHANCE_UP = "ssp.lfe_en.up"
     LFE_ENHANCE_DOWN = "ssp.lfe_en.down"
     LFE_ENHANCE_RESET = "ssp.lfe_en.[0]"
@@ -132,6 +144,7 @@ class StormAudioCommands(StrEnum):
     DOLBY_MODE_MOVIE = "ssp.dolbymode.[1]"
     DOLBY_MODE_MUSIC = "ssp.dolbymode.[2]"
     DOLBY_MODE_NIGHT = "ssp.dolbymode.[3]"
+    DOLBY_MODE_X_FORMAT = "ssp.dolbymode.[{}]"
     STORM_XT_ON = "ssp.stormxt.on"
     STORM_XT_OFF = "ssp.stormxt.off"
     STORM_XT_TOGGLE = "ssp.stormxt.toggle"
@@ -157,6 +170,10 @@ class StormAudioResponses(StrEnum):
     PROC_STATE_OFF = "ssp.procstate.[0]"
     PROC_STATE_INDETERMINATE = "ssp.procstate.[1]"
     PROC_STATE_ON = "ssp.procstate.[2]"
+    PROC_STATE_X = "ssp.procstate."
+    MUTE_X = "ssp.mute."
+    BRAND_X = "ssp.brand."
+    MODEL_X = "ssp.model."
     MUTE_ON = "ssp.mute.on"
     MUTE_OFF = "ssp.mute.off"
     VOLUME_X = "ssp.vol."
@@ -185,9 +202,12 @@ class StormAudioResponses(StrEnum):
     PRESET_LIST_X = "ssp.preset.list."
     PRESET_X_FORMAT = "ssp.preset.[{}]"
     PRESET_X = "ssp.preset."
+    PRESET_CURRENT_X = "ssp.preset.["
+    ZONES_PROFILES_LIST_END = "ssp.zones.profiles.end"
     PRESET_CUSTOM_X = "ssp.preset.custom."
     INPUT_X_FORMAT = "ssp.input.[{}]"
     INPUT_X = "ssp.input."
+    INPUT_CURRENT_X = "ssp.input.["
     ALLOWED_MODE_X = "ssp.allowedmode."
     SURROUND_MODE_X = "ssp.surroundmode."
     DOLBY_MODE_X = "ssp.dolbymode."
@@ -197,12 +217,15 @@ class StormAudioResponses(StrEnum):
     DOLBY_MODE_NIGHT = "ssp.dolbymode.[3]"
     STORM_XT_ON = "ssp.stormxt.on"
     STORM_XT_OFF = "ssp.stormxt.off"
+    STORM_XT_X = "ssp.stormxt."
     AURO_PRESET_X = "ssp.auropreset."
     AURO_STRENGTH_X = "ssp.aurostrength."
     DOLBY_CENTER_SPREAD_ON = "ssp.cspread.on"
     DOLBY_CENTER_SPREAD_OFF = "ssp.cspread.off"
+    DOLBY_CENTER_SPREAD_X = "ssp.cspread."
     DOLBY_VIRTUALIZER_ON = "ssp.dolbyvirtualizer.on"
     DOLBY_VIRTUALIZER_OFF = "ssp.dolbyvirtualizer.off"
+    DOLBY_VIRTUALIZER_X = "ssp.dolbyvirtualizer."
     AUDIO_SAMPLE_RATE_X = "ssp.fs."
     AUDIO_STREAM_X = "ssp.stream."
     AUDIO_FORMAT_X = "ssp.format."
@@ -269,6 +292,55 @@ class SensorType(StrEnum):
     VOLUME_DB = "volume_db"
 
 
+class StatusType(StrEnum):
+    """Defines the consolidated status sensors, each of which summarizes a group of sensor types."""
+
+    AUDIO = "status_audio"
+    VIDEO = "status_video"
+    PROCESSING = "status_processing"
+    TONE = "status_tone"
+
+
+class SceneAttribute(StrEnum):
+    """
+    Defines the attributes a scene can set on StormAudio devices.
+
+    Scenes are applied in this order, so that source and preset changes happen first.
+    """
+
+    SOURCE = "source"
+    PRESET = "preset"
+    SOUND_MODE = "sound_mode"
+    VOLUME = "volume"
+    MUTED = "muted"
+    LOUDNESS = "loudness"
+    DOLBY_MODE = "dolby_mode"
+    BASS = "bass"
+    TREBLE = "treble"
+    BRIGHTNESS = "brightness"
+    CENTER_ENHANCE = "center_enhance"
+    SURROUND_ENHANCE = "surround_enhance"
+    LFE_ENHANCE = "lfe_enhance"
+
+
+class StateQuery(StrEnum):
+    """Defines the device attributes which can be queried from StormAudio devices."""
+
+    BASS = "bass"
+    BRIGHTNESS = "brightness"
+    CENTER_ENHANCE = "center_enhance"
+    INPUT = "input"
+    LFE_ENHANCE = "lfe_enhance"
+    LOUDNESS = "loudness"
+    MUTE = "mute"
+    PRESET = "preset"
+    PROC_STATE = "proc_state"
+    SURROUND_ENHANCE = "surround_enhance"
+    SURROUND_MODE = "surround_mode"
+    TREBLE = "treble"
+    VOLUME = "volume"
+
+
 class StormAudioStates(StrEnum):
     """Defines the possible states of the StormAudio device."""
 
@@ -305,3 +377,72 @@ SENSOR_STATE_MAPPING = {
     StormAudioStates.UNAVAILABLE: SensorStates.UNAVAILABLE,
     StormAudioStates.UNKNOWN: SensorStates.UNKNOWN,
 }
+
+STATE_QUERY_MAPPING = {
+    StateQuery.BASS: (StormAudioCommands.BASS, StormAudioResponses.BASS_X),
+    StateQuery.BRIGHTNESS: (
+        StormAudioCommands.BRIGHTNESS,
+        StormAudioResponses.BRIGHTNESS_X,
+    ),
+    StateQuery.CENTER_ENHANCE: (
+        StormAudioCommands.CENTER_ENHANCE,
+        StormAudioResponses.CENTER_ENHANCE_X,
+    ),
+    StateQuery.INPUT: (StormAudioCommands.INPUT, StormAudioResponses.INPUT_CURRENT_X),
+    StateQuery.LFE_ENHANCE: (
+        StormAudioCommands.LFE_ENHANCE,
+        StormAudioResponses.LFE_ENHANCE_X,
+    ),
+    StateQuery.LOUDNESS: (StormAudioCommands.LOUDNESS, StormAudioResponses.LOUDNESS_X),
+    StateQuery.MUTE: (StormAudioCommands.MUTE, StormAudioResponses.MUTE_X),
+    StateQuery.PRESET: (
+        StormAudioCommands.PRESET,
+        StormAudioResponses.PRESET_CURRENT_X,
+    ),
+    StateQuery.PROC_STATE: (
+        StormAudioCommands.PROC_STATE,
+        StormAudioResponses.PROC_STATE_X,
+    ),
+    StateQuery.SURROUND_ENHANCE: (
+        StormAudioCommands.SURROUND_ENHANCE,
+        StormAudioResponses.SURROUND_ENHANCE_X,
+    ),
+    StateQuery.SURROUND_MODE: (
+        StormAudioCommands.SURROUND_MODE,
+        StormAudioResponses.SURROUND_MODE_X,
+    ),
+    StateQuery.TREBLE: (StormAudioCommands.TREBLE, StormAudioResponses.TREBLE_X),
+    StateQuery.VOLUME: (StormAudioCommands.VOLUME, StormAudioResponses.VOLUME_X),
+}
+
+# The first path segments (without trailing digits, e.g. `trig` for `ssp.trig1.off`) of the messages the
+# driver doesn't process. Those are rejected with a single lookup instead of running through the whole parser.
+IGNORED_RESPONSE_PATHS = frozenset(
+    {
+        "dialogcontrol",
+        "drc",
+        "frontpanel",
+        "generator",
+        "lipsync",
+        "msgstatus",
+        "msgstatusTxt",
+        "trig",
+        "trigger",
+        "zones",
+    }
+)
+
+# Maximum number of updates per second sent to the Remote for the sensors, whose values flap while switching sources.
+# The final value is always sent after the interval. All other sensors (e.g. the volume) are uncapped.
+SENSOR_MAX_UPDATE_RATES: dict[str, float] = {
+    SensorType.AUDIO_STREAM: 10.0,
+    SensorType.HDMI_1_VIDEO_STREAM: 10.0,
+    SensorType.HDMI_2_VIDEO_STREAM: 10.0,
+    StatusType.AUDIO: 10.0,
+    StatusType.VIDEO: 10.0,
+}
+
+# Sensors, whose changes are always sent right away, even within a rate limited status sensor (e.g. volume ramps)
+UNCAPPED_SENSOR_TYPES: frozenset[str] = frozenset(
+    {SensorType.VOLUME_DB, SensorType.MUTE}
+)
@@ -9,41 +9,146 @@ sends commands, and tracks the device state.
 :license: Mozilla Public License Version 2.0, see LICENSE for more details.
 """
 
+import asyncio
 import json
 import logging
-from typing import Any
+import time
+from dataclasses import asdict
+from typing import Any, Callable, Iterable
 
 from ucapi_framework import PersistentConnectionDevice
 
 from uc_intg_stormaudio.const import (
+    IGNORED_RESPONSE_PATHS,
+    STATE_QUERY_MAPPING,
     Loggers,
+    SceneAttribute,
+    StateQuery,
     StormAudioCommands,
     StormAudioResponses,
     StormAudioStates,
 )
 from uc_intg_stormaudio.device_attributes import StormAudioDeviceAttributes
-from uc_intg_stormaudio.helpers import fix_json
-from uc_intg_stormaudio.stormaudio import StormAudioClient
+from uc_intg_stormaudio.diagnostics import register_device
+from uc_intg_stormaudio.discover import StormAudioDiscoveryCache
+from uc_intg_stormaudio.helpers import fix_json, get_response_prefix
+from uc_intg_stormaudio.metrics import StormAudioMetrics
+from uc_intg_stormaudio.stormaudio import ConnectionLostError, StormAudioClient
+from uc_intg_stormaudio.tracing import (
+    STAGE_ATTRIBUTES_UPDATED,
+    STAGE_QUEUED,
+    STAGE_QUEUED_OFFLINE,
+    record,
+)
 
 _LOG = logging.getLogger(Loggers.DEVICE)
 
 MIN_VOLUME = 0
 MAX_VOLUME = 100
 MAX_TIME_OUT = 9  # the current command timeout is 10 seconds. Therefore, we need to be below that threshold.
+ACK_TIME_OUT = 1.0  # custom commands may not be acknowledged at all, so we don't wait as long for those.
+MIN_ACK_TIME_OUT = (
+    0.1  # lower bound of the adaptive acknowledgement timeout of custom commands
+)
+ACK_RTT_FACTOR = (
+    4.0  # the adaptive timeout is this multiple of the measured acknowledgement RTT
+)
+ACK_RTT_WEIGHT = (
+    0.2  # weight of a new sample in the moving average of the acknowledgement RTT
+)
+# Custom commands ending in one of these (or setting a value, e.g. `ssp.vol.[-40]`) are echoed by the ISP
+ACKNOWLEDGED_COMMAND_SUFFIXES = (".on", ".off", ".toggle", ".up", ".down")
+FAILOVER_THRESHOLD = 3  # consecutive connect failures before looking up a new address in the discovery cache
+QUEUE_TIME_OUT = 30.0  # commands queued while offline are dropped, if the device doesn't reconnect in time
+BURST_IDLE_GAP = 0.5  # the initial state dump is considered complete, if no further line arrives within this gap
+BURST_TIME_OUT = (
+    5.0  # commands wait at most this long for the initial state dump to complete
+)
+BURST_MAX_DURATION = 3.0  # the initial state dump is considered complete at the latest, if the ISP keeps streaming
+BURST_END_MARKERS = (StormAudioResponses.ZONES_PROFILES_LIST_END,)
+MAX_UNHANDLED_PREFIXES = 64  # bounds the statistics of unhandled messages, the remaining ones are counted as "other"
+CONNECT_TIME_OUT = 5.0  # deadline of a single connection attempt, unreachable devices are retried in the background
+MAX_CONCURRENT_CONNECTS = (
+    8  # bounds the connection attempts of all devices, e.g. at startup
+)
+
+# Shared by all devices, so a site with many ISPs doesn't flood the network (and the Remote) with connection attempts.
+# The semaphore is created per event loop, see `_get_connect_slots`.
+_connect_slots: tuple[asyncio.AbstractEventLoop, asyncio.Semaphore] | None = None  # pylint: disable=invalid-name
+
+# Maps the level based scene attributes to their device attribute and command
+_SCENE_LEVELS = {
+    SceneAttribute.BASS: (
+        "bass",
+        StormAudioCommands.BASS_X_FORMAT,
+    ),
+    SceneAttribute.TREBLE: (
+        "treble",
+        StormAudioCommands.TREBLE_X_FORMAT,
+    ),
+    SceneAttribute.BRIGHTNESS: (
+        "brightness",
+        StormAudioCommands.BRIGHTNESS_X_FORMAT,
+    ),
+    SceneAttribute.CENTER_ENHANCE: (
+        "center_enhance",
+        StormAudioCommands.CENTER_ENHANCE_X_FORMAT,
+    ),
+    SceneAttribute.SURROUND_ENHANCE: (
+        "surround_enhance",
+        StormAudioCommands.SURROUND_ENHANCE_X_FORMAT,
+    ),
+    SceneAttribute.LFE_ENHANCE: (
+        "lfe_enhance",
+        StormAudioCommands.LFE_ENHANCE_X_FORMAT,
+    ),
+}
+
+
+class DeviceOfflineError(ConnectionError):
+    """Raised when a command cannot be sent or acknowledged, as the device is not connected (anymore)."""
 
 
 class StormAudioDevice(PersistentConnectionDevice):
     """StormAudio Device."""
 
+    discovery_cache: StormAudioDiscoveryCache | None = None
+    """The cache of the devices advertised via mDNS, which the devices use to follow DHCP address changes."""
+
+    @classmethod
+    def with_discovery_cache(
+        cls, discovery_cache: StormAudioDiscoveryCache
+    ) -> type["StormAudioDevice"]:
+        """Return a device class, whose devices use the given discovery cache, to pass to the driver."""
+        return type(cls.__name__, (cls,), {"discovery_cache": discovery_cache})
+
     def __init__(self, *args, **kwargs):
         """Initialize the device."""
         super().__init__(*args, **kwargs)
 
-        self.device_attributes: StormAudioDeviceAttributes = (
-            StormAudioDeviceAttributes()
+        # The lists of the previous session are used until the device sends its current ones
+        self.device_attributes: StormAudioDeviceAttributes = StormAudioDeviceAttributes(
+            sources=dict(self._device_config.sources),
+            presets=dict(self._device_config.presets),
         )
+        self.metrics: StormAudioMetrics = StormAudioMetrics()
+        register_device(self.identifier, self.metrics)
 
         self._client = StormAudioClient(self.address, self.device_config.port)
+        self._connect_failures = 0
+        self._command_queue: list[tuple[str, float]] = []
+        self._list_buffers: dict[str, dict[str, int]] = {}
+        self._raw_lines: dict[str, str] = {}
+        self._batching = False
+        self._batch_updated = False
+        self._batch_config: dict[str, Any] = {}
+        self._burst_cache_hits = 0
+        self._burst_complete = asyncio.Event()
+        self._burst_started_at = 0.0
+        self._burst_lines = 0
+        self._burst_timer: asyncio.TimerHandle | None = None
+        self._background_tasks: set[asyncio.Task] = set()
+        self._entity_timers: set[asyncio.TimerHandle] = set()
 
     @property
     def address(self) -> str | None:
@@ -71,11 +176,86 @@ class StormAudioDevice(PersistentConnectionDevice):
         return self.device_attributes.state
 
     async def establish_connection(self) -> Any:
-        """Establish connection to the device."""
-        return await self._client.connect()
+        """
+        Establish connection to the device.
+
+        All the addresses the device has been advertised with are raced against the configured one, within a
+        deadline of `CONNECT_TIME_OUT` seconds. After repeated failures, the device is looked up in the discovery
+        cache. If it is advertised with a new address (e.g. after a DHCP change), the configuration is updated and
+        the new address is used instead.
+        """
+        if self.discovery_cache is not None:
+            self._client.addresses = self.discovery_cache.get(
+                self.identifier, self.address
+            )
+
+        try:
+            connection = await self._connect()
+        except OSError:
+            self._connect_failures += 1
+            if (
+                self._connect_failures < FAILOVER_THRESHOLD
+                or not await self._failover_address()
+            ):
+                raise
+
+            connection = await self._connect()
+
+        self._connect_failures = 0
+        self.metrics.connect_rtt = self._client.connect_rtt
+        return connection
+
+    async def _connect(self) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        """
+        Connect to the device within the connection deadline.
+
+        At most `MAX_CONCURRENT_CONNECTS` devices connect at once. Waiting for a free slot doesn't count towards the
+        deadline. If the deadline is exceeded, a `TimeoutError` (an `OSError`) is raised and the framework retries
+        in the background.
+        """
+        async with _get_connect_slots():
+            try:
+                async with asyncio.timeout(CONNECT_TIME_OUT):
+                    return await self._client.connect()
+            except TimeoutError as error:
+                raise TimeoutError(
+                    f"No connection within {CONNECT_TIME_OUT:.0f} seconds"
+                ) from error
+
+    async def _failover_address(self) -> bool:
+        """Switch to the most recently advertised address of the device, if it has changed."""
+        if self.discovery_cache is None:
+            return False
+
+        addresses = await self.discovery_cache.lookup(self.identifier, self.address)
+        if not addresses or self.address in addresses:
+            return False
+
+        _LOG.info(
+            "[%s] Device is now advertised at %s, switching from %s",
+            self.log_id,
+            addresses[0],
+            self.address,
+        )
+        self.update_config(address=addresses[0])
+        # The waiters of the previous client could never be resolved anymore
+        self._client.fail_waiters()
+        self._client = StormAudioClient(
+            self.address, self.device_config.port, addresses
+        )
+        self._connect_failures = 0
+        self.metrics.address_failovers += 1
+
+        return True
+
+    async def disconnect(self) -> None:
+        """Close the connection and stop reconnecting, e.g. as the device has been removed."""
+        await super().disconnect()
+        self._cancel_entity_timers()
 
     async def close_connection(self) -> None:
         """Close the connection."""
+        self._cancel_entity_timers()
         if self._connection:
             try:
                 await self._client.close(self._connection)
@@ -86,413 +266,829 @@ class StormAudioDevice(PersistentConnectionDevice):
                     error,
                 )
 
-    async def maintain_connection(self) -> None:  # pylint: disable=too-many-statements
-        """Maintain the connection."""  # noqa: D202
+    async def maintain_connection(self) -> None:
+        """
+        Maintain the connection.
+
+        Once the device has closed the connection, it is dropped right away, so commands fail fast instead of being
+        written to the closed connection until the framework reconnects.
+        """
+        self._start_burst()
+        try:
+            await self._client.parse_response_messages(
+                self._connection, self._process_message, self._apply_batch
+            )
+        finally:
+            if self._burst_timer:
+                self._burst_timer.cancel()
+
+        _LOG.info("[%s] Connection closed by the device", self.log_id)
+        await self.close_connection()
+        self._connection = None
+
+    def _process_message(self, message: str) -> None:
+        """Process a single message from the device."""
+        try:
+            self._handle_changed_message(message)
+        finally:
+            self._track_burst(message)
+
+    def _handle_message(  # pylint: disable=too-many-branches,too-many-locals,too-many-statements
+        self, message: str
+    ) -> bool:
+        """Parse a single message and update the device attributes accordingly, returns whether it was handled."""
+        match message:
+            case message if message.startswith(StormAudioResponses.AUDIO_FORMAT_X):
+                self.device_attributes.audio_format = message[
+                    len(StormAudioResponses.AUDIO_FORMAT_X)
+                    + 1 : -1  # noqa: E203
+                ]
+                self._update_attributes()
+
+            case message if message.startswith(StormAudioResponses.AUDIO_SAMPLE_RATE_X):
+                self.device_attributes.audio_sample_rate = message[
+                    len(StormAudioResponses.AUDIO_SAMPLE_RATE_X)
+                    + 1 : -1  # noqa: E203
+                ]
+                self._update_attributes()
+
+            case message if message.startswith(StormAudioResponses.AUDIO_STREAM_X):
+                self.device_attributes.audio_stream = message[
+                    len(StormAudioResponses.AUDIO_STREAM_X)
+                    + 1 : -1  # noqa: E203
+                ]
+                self._update_attributes()
+
+            case message if message.startswith(StormAudioResponses.DOLBY_MODE_X):
+                dolby_mode, *_tail = json.loads(
+                    message[len(StormAudioResponses.DOLBY_MODE_X) :]  # noqa: E203
+                )
+                self.device_attributes.dolby_mode_id = dolby_mode
+                self._update_attributes()
+
+            case (
+                StormAudioResponses.DOLBY_CENTER_SPREAD_ON
+                | StormAudioResponses.DOLBY_CENTER_SPREAD_OFF
+            ):
+                self.device_attributes.dolby_center_spread = (
+                    message == StormAudioResponses.DOLBY_CENTER_SPREAD_ON
+                )
+                self._update_attributes()
+
+            case (
+                StormAudioResponses.DOLBY_VIRTUALIZER_ON
+                | StormAudioResponses.DOLBY_VIRTUALIZER_OFF
+            ):
+                self.device_attributes.dolby_virtualizer = (
+                    message == StormAudioResponses.DOLBY_VIRTUALIZER_ON
+                )
+                self._update_attributes()
+
+            case message if message.startswith(
+                StormAudioResponses.VIDEO_HDMI_1_INPUT_X
+            ):
+                hdmi_input_name, *_tail = json.loads(
+                    message[len(StormAudioResponses.VIDEO_HDMI_1_INPUT_X) :]  # noqa: E203
+                )
 
-        # pylint: disable=too-many-branches,too-many-locals,too-many-statements
-        def message_handler(message: str) -> None:
-            match message:
-                case message if message.startswith(StormAudioResponses.AUDIO_FORMAT_X):
-                    self.device_attributes.audio_format = message[
-                        len(StormAudioResponses.AUDIO_FORMAT_X)
-                        + 1 : -1  # noqa: E203
-                    ]
-                    self._update_attributes()
-
-                case message if message.startswith(
-                    StormAudioResponses.AUDIO_SAMPLE_RATE_X
-                ):
-                    self.device_attributes.audio_sample_rate = message[
-                        len(StormAudioResponses.AUDIO_SAMPLE_RATE_X)
-                        + 1 : -1  # noqa: E203
-                    ]
-                    self._update_attributes()
+                self.device_attributes.hdmi_1.update({"input_name": hdmi_input_name})
+                self._update_attributes()
 
-                case message if message.startswith(StormAudioResponses.AUDIO_STREAM_X):
-                    self.device_attributes.audio_stream = message[
-                        len(StormAudioResponses.AUDIO_STREAM_X)
-                        + 1 : -1  # noqa: E203
+            case message if message.startswith(
+                StormAudioResponses.VIDEO_HDMI_1_TIMING_X
+            ):
+                hdmi_timing, *_tail = json.loads(
+                    message[len(StormAudioResponses.VIDEO_HDMI_1_TIMING_X) :]  # noqa: E203
+                )
+
+                self.device_attributes.hdmi_1.update({"timing": hdmi_timing})
+                self._update_attributes()
+
+            case message if message.startswith(
+                StormAudioResponses.VIDEO_HDMI_1_COPY_PROTECTION_X
+            ):
+                hdmi_copy_protection, *_tail = json.loads(
+                    message[
+                        len(
+                            StormAudioResponses.VIDEO_HDMI_1_COPY_PROTECTION_X
+                        ) :  # noqa: E203
                     ]
-                    self._update_attributes()
+                )
 
-                case message if message.startswith(StormAudioResponses.DOLBY_MODE_X):
-                    dolby_mode, *_tail = json.loads(
-                        message[len(StormAudioResponses.DOLBY_MODE_X) :]  # noqa: E203
-                    )
-                    self.device_attributes.dolby_mode_id = dolby_mode
-                    self._update_attributes()
-
-                case (
-                    StormAudioResponses.DOLBY_CENTER_SPREAD_ON
-                    | StormAudioResponses.DOLBY_CENTER_SPREAD_OFF
-                ):
-                    self.device_attributes.dolby_center_spread = (
-                        message == StormAudioResponses.DOLBY_CENTER_SPREAD_ON
-                    )
-                    self._update_attributes()
-
-                case (
-                    StormAudioResponses.DOLBY_VIRTUALIZER_ON
-                    | StormAudioResponses.DOLBY_VIRTUALIZER_OFF
-                ):
-                    self.device_attributes.dolby_virtualizer = (
-                        message == StormAudioResponses.DOLBY_VIRTUALIZER_ON
-                    )
-                    self._update_attributes()
+                self.device_attributes.hdmi_1.update(
+                    {"copy_protection": hdmi_copy_protection}
+                )
+                self._update_attributes()
 
-                case message if message.startswith(
-                    StormAudioResponses.VIDEO_HDMI_1_INPUT_X
-                ):
-                    hdmi_input_name, *_tail = json.loads(
-                        message[len(StormAudioResponses.VIDEO_HDMI_1_INPUT_X) :]  # noqa: E203
-                    )
+            case message if message.startswith(
+                StormAudioResponses.VIDEO_HDMI_1_COLOR_SPACE_X
+            ):
+                hdmi_color_space, *_tail = json.loads(
+                    message[len(StormAudioResponses.VIDEO_HDMI_1_COLOR_SPACE_X) :]  # noqa: E203
+                )
 
-                    self.device_attributes.hdmi_1.update(
-                        {"input_name": hdmi_input_name}
-                    )
-                    self._update_attributes()
+                self.device_attributes.hdmi_1.update({"color_space": hdmi_color_space})
+                self._update_attributes()
 
-                case message if message.startswith(
-                    StormAudioResponses.VIDEO_HDMI_1_TIMING_X
-                ):
-                    hdmi_timing, *_tail = json.loads(
-                        message[len(StormAudioResponses.VIDEO_HDMI_1_TIMING_X) :]  # noqa: E203
-                    )
+            case message if message.startswith(
+                StormAudioResponses.VIDEO_HDMI_1_COLOR_DEPTH_X
+            ):
+                hdmi_color_depth, *_tail = json.loads(
+                    message[len(StormAudioResponses.VIDEO_HDMI_1_COLOR_DEPTH_X) :]  # noqa: E203
+                )
 
-                    self.device_attributes.hdmi_1.update({"timing": hdmi_timing})
-                    self._update_attributes()
-
-                case message if message.startswith(
-                    StormAudioResponses.VIDEO_HDMI_1_COPY_PROTECTION_X
-                ):
-                    hdmi_copy_protection, *_tail = json.loads(
-                        message[
-                            len(
-                                StormAudioResponses.VIDEO_HDMI_1_COPY_PROTECTION_X
-                            ) :  # noqa: E203
-                        ]
-                    )
+                self.device_attributes.hdmi_1.update({"color_depth": hdmi_color_depth})
+                self._update_attributes()
 
-                    self.device_attributes.hdmi_1.update(
-                        {"copy_protection": hdmi_copy_protection}
-                    )
-                    self._update_attributes()
+            case message if message.startswith(StormAudioResponses.VIDEO_HDMI_1_MODE_X):
+                hdmi_mode, *_tail = json.loads(
+                    message[len(StormAudioResponses.VIDEO_HDMI_1_MODE_X) :]  # noqa: E203
+                )
 
-                case message if message.startswith(
-                    StormAudioResponses.VIDEO_HDMI_1_COLOR_SPACE_X
-                ):
-                    hdmi_color_space, *_tail = json.loads(
-                        message[len(StormAudioResponses.VIDEO_HDMI_1_COLOR_SPACE_X) :]  # noqa: E203
-                    )
+                self.device_attributes.hdmi_1.update({"mode": hdmi_mode})
+                self._update_attributes()
 
-                    self.device_attributes.hdmi_1.update(
-                        {"color_space": hdmi_color_space}
-                    )
-                    self._update_attributes()
+            case message if message.startswith(StormAudioResponses.VIDEO_HDMI_1_HDR_X):
+                hdmi_hdr, *_tail = json.loads(
+                    message[len(StormAudioResponses.VIDEO_HDMI_1_HDR_X) :]  # noqa: E203
+                )
 
-                case message if message.startswith(
-                    StormAudioResponses.VIDEO_HDMI_1_COLOR_DEPTH_X
-                ):
-                    hdmi_color_depth, *_tail = json.loads(
-                        message[len(StormAudioResponses.VIDEO_HDMI_1_COLOR_DEPTH_X) :]  # noqa: E203
-                    )
+                self.device_attributes.hdmi_1.update({"hdr": hdmi_hdr})
+                self._update_attributes()
 
-                    self.device_attributes.hdmi_1.update(
-                        {"color_depth": hdmi_color_depth}
-                    )
-                    self._update_attributes()
+            case message if message.startswith(
+                StormAudioResponses.VIDEO_HDMI_2_INPUT_X
+            ):
+                hdmi_input_name, *_tail = json.loads(
+                    message[len(StormAudioResponses.VIDEO_HDMI_2_INPUT_X) :]  # noqa: E203
+                )
 
-                case message if message.startswith(
-                    StormAudioResponses.VIDEO_HDMI_1_MODE_X
-                ):
-                    hdmi_mode, *_tail = json.loads(
-                        message[len(StormAudioResponses.VIDEO_HDMI_1_MODE_X) :]  # noqa: E203
-                    )
+                self.device_attributes.hdmi_2.update({"input": hdmi_input_name})
+                self._update_attributes()
 
-                    self.device_attributes.hdmi_1.update({"mode": hdmi_mode})
-                    self._update_attributes()
+            case message if message.startswith(
+                StormAudioResponses.VIDEO_HDMI_2_TIMING_X
+            ):
+                hdmi_timing, *_tail = json.loads(
+                    message[len(StormAudioResponses.VIDEO_HDMI_2_TIMING_X) :]  # noqa: E203
+                )
 
-                case message if message.startswith(
-                    StormAudioResponses.VIDEO_HDMI_1_HDR_X
-                ):
-                    hdmi_hdr, *_tail = json.loads(
-                        message[len(StormAudioResponses.VIDEO_HDMI_1_HDR_X) :]  # noqa: E203
-                    )
+                self.device_attributes.hdmi_2.update({"timing": hdmi_timing})
+                self._update_attributes()
+
+            case message if message.startswith(
+                StormAudioResponses.VIDEO_HDMI_2_COPY_PROTECTION_X
+            ):
+                hdmi_copy_protection, *_tail = json.loads(
+                    message[
+                        len(
+                            StormAudioResponses.VIDEO_HDMI_2_COPY_PROTECTION_X
+                        ) :  # noqa: E203
+                    ]
+                )
 
-                    self.device_attributes.hdmi_1.update({"hdr": hdmi_hdr})
-                    self._update_attributes()
+                self.device_attributes.hdmi_2.update(
+                    {"copy_protection": hdmi_copy_protection}
+                )
+                self._update_attributes()
 
-                case message if message.startswith(
-                    StormAudioResponses.VIDEO_HDMI_2_INPUT_X
-                ):
-                    hdmi_input_name, *_tail = json.loads(
-                        message[len(StormAudioResponses.VIDEO_HDMI_2_INPUT_X) :]  # noqa: E203
-                    )
+            case message if message.startswith(
+                StormAudioResponses.VIDEO_HDMI_2_COLOR_SPACE_X
+            ):
+                hdmi_color_space, *_tail = json.loads(
+                    message[len(StormAudioResponses.VIDEO_HDMI_2_COLOR_SPACE_X) :]  # noqa: E203
+                )
 
-                    self.device_attributes.hdmi_2.update({"input": hdmi_input_name})
-                    self._update_attributes()
+                self.device_attributes.hdmi_2.update({"color_space": hdmi_color_space})
+                self._update_attributes()
 
-                case message if message.startswith(
-                    StormAudioResponses.VIDEO_HDMI_2_TIMING_X
-                ):
-                    hdmi_timing, *_tail = json.loads(
-                        message[len(StormAudioResponses.VIDEO_HDMI_2_TIMING_X) :]  # noqa: E203
-                    )
+            case message if message.startswith(
+                StormAudioResponses.VIDEO_HDMI_2_COLOR_DEPTH_X
+            ):
+                hdmi_color_depth, *_tail = json.loads(
+                    message[len(StormAudioResponses.VIDEO_HDMI_2_COLOR_DEPTH_X) :]  # noqa: E203
+                )
 
-                    self.device_attributes.hdmi_2.update({"timing": hdmi_timing})
-                    self._update_attributes()
-
-                case message if message.startswith(
-                    StormAudioResponses.VIDEO_HDMI_2_COPY_PROTECTION_X
-                ):
-                    hdmi_copy_protection, *_tail = json.loads(
-                        message[
-                            len(
-                                StormAudioResponses.VIDEO_HDMI_2_COPY_PROTECTION_X
-                            ) :  # noqa: E203
-                        ]
-                    )
+                self.device_attributes.hdmi_2.update({"color_depth": hdmi_color_depth})
+                self._update_attributes()
 
-                    self.device_attributes.hdmi_2.update(
-                        {"copy_protection": hdmi_copy_protection}
-                    )
-                    self._update_attributes()
+            case message if message.startswith(StormAudioResponses.VIDEO_HDMI_2_MODE_X):
+                hdmi_mode, *_tail = json.loads(
+                    message[len(StormAudioResponses.VIDEO_HDMI_2_MODE_X) :]  # noqa: E203
+                )
 
-                case message if message.startswith(
-                    StormAudioResponses.VIDEO_HDMI_2_COLOR_SPACE_X
-                ):
-                    hdmi_color_space, *_tail = json.loads(
-                        message[len(StormAudioResponses.VIDEO_HDMI_2_COLOR_SPACE_X) :]  # noqa: E203
-                    )
+                self.device_attributes.hdmi_2.update({"mode": hdmi_mode})
+                self._update_attributes()
 
-                    self.device_attributes.hdmi_2.update(
-                        {"color_space": hdmi_color_space}
-                    )
-                    self._update_attributes()
+            case message if message.startswith(StormAudioResponses.VIDEO_HDMI_2_HDR_X):
+                hdmi_hdr, *_tail = json.loads(
+                    message[len(StormAudioResponses.VIDEO_HDMI_2_HDR_X) :]  # noqa: E203
+                )
 
-                case message if message.startswith(
-                    StormAudioResponses.VIDEO_HDMI_2_COLOR_DEPTH_X
-                ):
-                    hdmi_color_depth, *_tail = json.loads(
-                        message[len(StormAudioResponses.VIDEO_HDMI_2_COLOR_DEPTH_X) :]  # noqa: E203
-                    )
+                self.device_attributes.hdmi_2.update({"hdr": hdmi_hdr})
+                self._update_attributes()
 
-                    self.device_attributes.hdmi_2.update(
-                        {"color_depth": hdmi_color_depth}
-                    )
-                    self._update_attributes()
+            case StormAudioResponses.INPUT_LIST_START:
+                self._list_buffers["sources"] = {}
 
-                case message if message.startswith(
-                    StormAudioResponses.VIDEO_HDMI_2_MODE_X
-                ):
-                    hdmi_mode, *_tail = json.loads(
-                        message[len(StormAudioResponses.VIDEO_HDMI_2_MODE_X) :]  # noqa: E203
+            case message if message.startswith(StormAudioResponses.INPUT_LIST_X):
+                input_name, input_id, *_tail = json.loads(
+                    fix_json(
+                        message[len(StormAudioResponses.INPUT_LIST_X) :]  # noqa: E203
                     )
+                )
+
+                self._list_buffers.setdefault("sources", {})[input_name] = input_id
 
-                    self.device_attributes.hdmi_2.update({"mode": hdmi_mode})
-                    self._update_attributes()
+            case StormAudioResponses.INPUT_LIST_END:
+                self._swap_list("sources")
 
-                case message if message.startswith(
-                    StormAudioResponses.VIDEO_HDMI_2_HDR_X
-                ):
-                    hdmi_hdr, *_tail = json.loads(
-                        message[len(StormAudioResponses.VIDEO_HDMI_2_HDR_X) :]  # noqa: E203
+            case message if message.startswith(StormAudioResponses.INPUT_X):
+                source_id, *_tail = json.loads(
+                    fix_json(
+                        message[len(StormAudioResponses.INPUT_X) :]  # noqa: E203
                     )
+                )
+                self.device_attributes.source_id = source_id
+                self._update_attributes()
 
-                    self.device_attributes.hdmi_2.update({"hdr": hdmi_hdr})
-                    self._update_attributes()
+            case message if message.startswith(StormAudioResponses.LOUDNESS_X):
+                loudness, *_tail = json.loads(
+                    message[len(StormAudioResponses.LOUDNESS_X) :]  # noqa: E203
+                )
+                self.device_attributes.loudness_mode_id = loudness
+                self._update_attributes()
 
-                case StormAudioResponses.INPUT_LIST_START:
-                    self.device_attributes.sources = {}
+            case StormAudioResponses.MUTE_ON | StormAudioResponses.MUTE_OFF:
+                self.device_attributes.muted = message == StormAudioResponses.MUTE_ON
+                self._update_attributes()
 
-                case message if message.startswith(StormAudioResponses.INPUT_LIST_X):
-                    input_name, input_id, *_tail = json.loads(
-                        fix_json(
-                            message[len(StormAudioResponses.INPUT_LIST_X) :]  # noqa: E203
-                        )
+            case StormAudioResponses.PRESET_LIST_START:
+                self._list_buffers["presets"] = {}
+
+            case message if message.startswith(StormAudioResponses.PRESET_LIST_X):
+                preset_name, preset_id, *_tail = json.loads(
+                    fix_json(
+                        message[len(StormAudioResponses.PRESET_LIST_X) :]  # noqa: E203
                     )
+                )
 
-                    self.device_attributes.sources.update({input_name: input_id})
+                self._list_buffers.setdefault("presets", {})[preset_name] = preset_id
 
-                case StormAudioResponses.INPUT_LIST_END:
-                    self.update_config(sources=self.device_attributes.sources)
-                    self._update_attributes()
+            case StormAudioResponses.PRESET_LIST_END:
+                self._swap_list("presets")
 
-                case message if message.startswith(StormAudioResponses.INPUT_X):
-                    source_id, *_tail = json.loads(
-                        fix_json(
-                            message[len(StormAudioResponses.INPUT_X) :]  # noqa: E203
-                        )
+            case message if message.startswith(
+                StormAudioResponses.PRESET_X
+            ) and not message.startswith(StormAudioResponses.PRESET_CUSTOM_X):
+                preset_id, *_tail = json.loads(
+                    fix_json(
+                        message[len(StormAudioResponses.PRESET_X) :]  # noqa: E203
                     )
-                    self.device_attributes.source_id = source_id
-                    self._update_attributes()
-
-                case message if message.startswith(StormAudioResponses.LOUDNESS_X):
-                    loudness, *_tail = json.loads(
-                        message[len(StormAudioResponses.LOUDNESS_X) :]  # noqa: E203
+                )
+                self.device_attributes.preset_id = preset_id
+                self._update_attributes()
+
+            case (
+                StormAudioResponses.PROC_STATE_OFF
+                | StormAudioResponses.PROC_STATE_INDETERMINATE
+            ):
+                # Maps both the initialization and the process of shutting down to OFF
+                # as they are not "fully booted"
+                self.device_attributes.state = StormAudioStates.OFF
+                self._update_attributes()
+
+            case StormAudioResponses.PROC_STATE_ON:
+                self.device_attributes.state = StormAudioStates.ON
+                self._update_attributes()
+
+            case StormAudioResponses.STORM_XT_ON | StormAudioResponses.STORM_XT_OFF:
+                storm_xt_active = message == StormAudioResponses.STORM_XT_ON
+                self.device_attributes.storm_xt_active = storm_xt_active
+                self._update_attributes()
+
+            case message if message.startswith(StormAudioResponses.SURROUND_MODE_X):
+                upmixer_mode_id, *_tail = json.loads(
+                    fix_json(
+                        message[len(StormAudioResponses.SURROUND_MODE_X) :]  # noqa: E203
                     )
-                    self.device_attributes.loudness_mode_id = loudness
-                    self._update_attributes()
+                )
+                self.device_attributes.upmixer_mode_id = upmixer_mode_id
+                self._update_attributes()
 
-                case StormAudioResponses.MUTE_ON | StormAudioResponses.MUTE_OFF:
-                    self.device_attributes.muted = (
-                        message == StormAudioResponses.MUTE_ON
+            case message if message.startswith(StormAudioResponses.ALLOWED_MODE_X):
+                actual_upmixer_mode_id, *_tail = json.loads(
+                    fix_json(
+                        message[len(StormAudioResponses.ALLOWED_MODE_X) :]  # noqa: E203
                     )
-                    self._update_attributes()
+                )
+                self.device_attributes.actual_upmixer_mode_id = actual_upmixer_mode_id
+                self._update_attributes()
+
+            case message if message.startswith(StormAudioResponses.VOLUME_X):
+                # The UC remotes currently only support absolute volume scales.
+                # That's why we need to convert the relative values from the ISPs.
+                volume, *_tail = json.loads(
+                    message[len(StormAudioResponses.VOLUME_X) :]  # noqa: E203
+                )
+                absolute_volume = int(volume) + MAX_VOLUME
+                self.device_attributes.volume = absolute_volume
+                self._update_attributes()
 
-                case StormAudioResponses.PRESET_LIST_START:
-                    self.device_attributes.presets = {}
+            case message if message.startswith(StormAudioResponses.BASS_X):
+                bass, *_tail = json.loads(
+                    message[len(StormAudioResponses.BASS_X) :]  # noqa: E203
+                )
+                self.device_attributes.bass = bass
+                self._update_attributes()
 
-                case message if message.startswith(StormAudioResponses.PRESET_LIST_X):
-                    preset_name, preset_id, *_tail = json.loads(
-                        fix_json(
-                            message[len(StormAudioResponses.PRESET_LIST_X) :]  # noqa: E203
-                        )
-                    )
+            case message if message.startswith(StormAudioResponses.TREBLE_X):
+                treble, *_tail = json.loads(
+                    message[len(StormAudioResponses.TREBLE_X) :]  # noqa: E203
+                )
+                self.device_attributes.treble = treble
+                self._update_attributes()
 
-                    self.device_attributes.presets.update({preset_name: preset_id})
+            case message if message.startswith(StormAudioResponses.BRIGHTNESS_X):
+                brightness, *_tail = json.loads(
+                    message[len(StormAudioResponses.BRIGHTNESS_X) :]  # noqa: E203
+                )
+                self.device_attributes.brightness = brightness
+                self._update_attributes()
 
-                case StormAudioResponses.PRESET_LIST_END:
-                    self.update_config(presets=self.device_attributes.presets)
-                    self._update_attributes()
+            case message if message.startswith(StormAudioResponses.CENTER_ENHANCE_X):
+                center_enhance, *_tail = json.loads(
+                    message[len(StormAudioResponses.CENTER_ENHANCE_X) :]  # noqa: E203
+                )
+                self.device_attributes.center_enhance = center_enhance
+                self._update_attributes()
 
-                case message if message.startswith(
-                    StormAudioResponses.PRESET_X
-                ) and not message.startswith(StormAudioResponses.PRESET_CUSTOM_X):
-                    preset_id, *_tail = json.loads(
-                        fix_json(
-                            message[len(StormAudioResponses.PRESET_X) :]  # noqa: E203
-                        )
-                    )
-                    self.device_attributes.preset_id = preset_id
-                    self._update_attributes()
-
-                case (
-                    StormAudioResponses.PROC_STATE_OFF
-                    | StormAudioResponses.PROC_STATE_INDETERMINATE
-                ):
-                    # Maps both the initialization and the process of shutting down to OFF
-                    # as they are not "fully booted"
-                    self.device_attributes.state = StormAudioStates.OFF
-                    self._update_attributes()
-
-                case StormAudioResponses.PROC_STATE_ON:
-                    self.device_attributes.state = StormAudioStates.ON
-                    self._update_attributes()
-
-                case StormAudioResponses.STORM_XT_ON | StormAudioResponses.STORM_XT_OFF:
-                    storm_xt_active = message == StormAudioResponses.STORM_XT_ON
-                    self.device_attributes.storm_xt_active = storm_xt_active
-                    self._update_attributes()
-
-                case message if message.startswith(StormAudioResponses.SURROUND_MODE_X):
-                    upmixer_mode_id, *_tail = json.loads(
-                        fix_json(
-                            message[len(StormAudioResponses.SURROUND_MODE_X) :]  # noqa: E203
-                        )
-                    )
-                    self.device_attributes.upmixer_mode_id = upmixer_mode_id
-                    self._update_attributes()
+            case message if message.startswith(StormAudioResponses.SURROUND_ENHANCE_X):
+                surround_enhance, *_tail = json.loads(
+                    message[len(StormAudioResponses.SURROUND_ENHANCE_X) :]  # noqa: E203
+                )
+                self.device_attributes.surround_enhance = surround_enhance
+                self._update_attributes()
 
-                case message if message.startswith(StormAudioResponses.ALLOWED_MODE_X):
-                    actual_upmixer_mode_id, *_tail = json.loads(
-                        fix_json(
-                            message[len(StormAudioResponses.ALLOWED_MODE_X) :]  # noqa: E203
-                        )
-                    )
-                    self.device_attributes.actual_upmixer_mode_id = (
-                        actual_upmixer_mode_id
-                    )
-                    self._update_attributes()
+            case message if message.startswith(StormAudioResponses.LFE_ENHANCE_X):
+                lfe_enhance, *_tail = json.loads(
+                    message[len(StormAudioResponses.LFE_ENHANCE_X) :]  # noqa: E203
+                )
+                self.device_attributes.lfe_enhance = lfe_enhance
+                self._update_attributes()
 
-                case message if message.startswith(StormAudioResponses.VOLUME_X):
-                    # The UC remotes currently only support absolute volume scales.
-                    # That's why we need to convert the relative values from the ISPs.
-                    volume, *_tail = json.loads(
-                        message[len(StormAudioResponses.VOLUME_X) :]  # noqa: E203
-                    )
-                    absolute_volume = int(volume) + MAX_VOLUME
-                    self.device_attributes.volume = absolute_volume
-                    self._update_attributes()
+            case message if message.startswith(StormAudioResponses.AURO_PRESET_X):
+                auro_preset_id, *_tail = json.loads(
+                    message[len(StormAudioResponses.AURO_PRESET_X) :]  # noqa: E203
+                )
+                self.device_attributes.auro_preset_id = auro_preset_id
+                self._update_attributes()
 
-                case message if message.startswith(StormAudioResponses.BASS_X):
-                    bass, *_tail = json.loads(
-                        message[len(StormAudioResponses.BASS_X) :]  # noqa: E203
-                    )
-                    self.device_attributes.bass = bass
-                    self._update_attributes()
+            case message if message.startswith(StormAudioResponses.AURO_STRENGTH_X):
+                auro_strength, *_tail = json.loads(
+                    message[len(StormAudioResponses.AURO_STRENGTH_X) :]  # noqa: E203
+                )
+                self.device_attributes.auro_strength = auro_strength
+                self._update_attributes()
+
+            case _:
+                self._count_unhandled(message)
+                return False
+
+        return True
+
+    def apply_lines(self, lines: Iterable[str]) -> dict[str, Any]:
+        """
+        Apply a batch of raw lines as a single state transition and return the resulting changes.
+
+        All lines run through the regular parser, but the configuration is written at most once and the entities
+        are notified at most once, after the whole batch has been applied. This is suitable for replaying captured
+        traffic. Computing the changes copies all device attributes twice, so the live reader uses `_apply_batch`.
+
+        :param lines: The raw lines, as received from the device
+        :return: The changed device attributes with their new values
+        """
+        before = asdict(self.device_attributes)
+        self._apply_batch(lines)
+        after = asdict(self.device_attributes)
+
+        return {
+            attribute: value
+            for attribute, value in after.items()
+            if before[attribute] != value
+        }
+
+    def _apply_batch(self, lines: Iterable[str]) -> None:
+        """Apply a batch of raw lines as a single state transition, e.g. every read containing multiple lines."""
+        self._batching = True
+        self._batch_updated = False
+
+        try:
+            for line in lines:
+                try:
+                    self._process_message(line.strip())
+                except Exception as ex:  # pylint: disable=broad-exception-caught
+                    _LOG.error("Error handling message %s: %s", line, ex)
+        finally:
+            self._batching = False
+            if self._batch_config:
+                config, self._batch_config = self._batch_config, {}
+                self.update_config(**config)
+            if self._batch_updated:
+                self._update_attributes()
+
+    def _handle_changed_message(self, message: str) -> None:
+        """
+        Handle a message, unless it is identical to the last message seen for the same state path.
+
+        The ISP resends its whole state on every connect and power-on, which is mostly unchanged. Skipping those
+        lines saves parsing them and updating the entities. List items and list markers are always handled, as
+        they are only meaningful as a sequence. A line is only cached once it has been handled successfully, so
+        unhandled lines are counted every time and don't count as cache hits.
+        """
+        if _get_path(message) in IGNORED_RESPONSE_PATHS:
+            self.metrics.ignored_lines += 1
+            return
 
-                case message if message.startswith(StormAudioResponses.TREBLE_X):
-                    treble, *_tail = json.loads(
-                        message[len(StormAudioResponses.TREBLE_X) :]  # noqa: E203
-                    )
-                    self.device_attributes.treble = treble
-                    self._update_attributes()
+        if message.endswith((".start", ".end")) or ".list." in message:
+            self._handle_message(message)
+            return
 
-                case message if message.startswith(StormAudioResponses.BRIGHTNESS_X):
-                    brightness, *_tail = json.loads(
-                        message[len(StormAudioResponses.BRIGHTNESS_X) :]  # noqa: E203
-                    )
-                    self.device_attributes.brightness = brightness
-                    self._update_attributes()
-
-                case message if message.startswith(
-                    StormAudioResponses.CENTER_ENHANCE_X
-                ):
-                    center_enhance, *_tail = json.loads(
-                        message[len(StormAudioResponses.CENTER_ENHANCE_X) :]  # noqa: E203
-                    )
-                    self.device_attributes.center_enhance = center_enhance
-                    self._update_attributes()
-
-                case message if message.startswith(
-                    StormAudioResponses.SURROUND_ENHANCE_X
-                ):
-                    surround_enhance, *_tail = json.loads(
-                        message[len(StormAudioResponses.SURROUND_ENHANCE_X) :]  # noqa: E203
-                    )
-                    self.device_attributes.surround_enhance = surround_enhance
-                    self._update_attributes()
+        key = get_response_prefix(message)
+        if self._raw_lines.get(key) == message:
+            self.metrics.line_cache_hits += 1
+            return
 
-                case message if message.startswith(StormAudioResponses.LFE_ENHANCE_X):
-                    lfe_enhance, *_tail = json.loads(
-                        message[len(StormAudioResponses.LFE_ENHANCE_X) :]  # noqa: E203
-                    )
-                    self.device_attributes.lfe_enhance = lfe_enhance
-                    self._update_attributes()
+        self._raw_lines.pop(key, None)
+        if self._handle_message(message):
+            self.metrics.line_cache_misses += 1
+            self._raw_lines[key] = message
 
-                case message if message.startswith(StormAudioResponses.AURO_PRESET_X):
-                    auro_preset_id, *_tail = json.loads(
-                        message[len(StormAudioResponses.AURO_PRESET_X) :]  # noqa: E203
-                    )
-                    self.device_attributes.auro_preset_id = auro_preset_id
-                    self._update_attributes()
+    def _count_unhandled(self, message: str) -> None:
+        """Count an unhandled message by its prefix, to see which unparsed messages dominate the traffic."""
+        unhandled = self.metrics.unhandled_prefixes
+        prefix = get_response_prefix(message)
+        if prefix not in unhandled and len(unhandled) >= MAX_UNHANDLED_PREFIXES:
+            prefix = "other"
 
-                case message if message.startswith(StormAudioResponses.AURO_STRENGTH_X):
-                    auro_strength, *_tail = json.loads(
-                        message[len(StormAudioResponses.AURO_STRENGTH_X) :]  # noqa: E203
-                    )
-                    self.device_attributes.auro_strength = auro_strength
-                    self._update_attributes()
+        unhandled[prefix] = unhandled.get(prefix, 0) + 1
+
+    def invalidate_line_cache(self) -> None:
+        """Forget the last seen lines, so the next lines of every state path are parsed again."""
+        self._raw_lines.clear()
+
+    def _swap_list(self, attribute: str) -> None:
+        """
+        Swap in a completely received list (i.e. sources or presets).
+
+        The lists are received into a shadow buffer, so lookups keep working while a list is being rebuilt.
+        The entities and the configuration are only updated, if the list has actually changed.
+        """
+        current: dict[str, int] = getattr(self.device_attributes, attribute)
+        received = self._list_buffers.pop(attribute, {})
+
+        if list(received.items()) == list(current.items()):
+            _LOG.debug("[%s] The %s are unchanged", self.log_id, attribute)
+            return
+
+        _LOG.info(
+            "[%s] The %s have changed: added %s, removed %s, renumbered %s",
+            self.log_id,
+            attribute,
+            sorted(received.keys() - current.keys()),
+            sorted(current.keys() - received.keys()),
+            sorted(
+                name
+                for name in received.keys() & current.keys()
+                if received[name] != current[name]
+            ),
+        )
+        setattr(self.device_attributes, attribute, received)
+        if self._batching:
+            self._batch_config[attribute] = received
+        else:
+            self.update_config(**{attribute: received})
+        self._update_attributes()
+
+    def _start_burst(self) -> None:
+        """Start tracking the initial state dump, which the ISP streams on every connect."""
+        self._burst_complete.clear()
+        self._list_buffers.clear()
+        self._burst_started_at = time.monotonic()
+        self._burst_lines = 0
+        self._burst_cache_hits = self.metrics.line_cache_hits
+        self._schedule_burst_timer()
+
+    def _schedule_burst_timer(self) -> None:
+        """Complete the burst after an idle gap, but no later than `BURST_MAX_DURATION` after it started."""
+        if self._burst_timer:
+            self._burst_timer.cancel()
+        remaining = self._burst_started_at + BURST_MAX_DURATION - time.monotonic()
+        self._burst_timer = asyncio.get_running_loop().call_later(
+            max(min(BURST_IDLE_GAP, remaining), 0), self._complete_burst
+        )
 
-        await self._client.parse_response_messages(self._connection, message_handler)
+    def _track_burst(self, message: str) -> None:
+        """Complete the burst on a terminal marker, after an idle gap or once it has taken too long."""
+        if not self._in_burst:
+            return
+
+        self._burst_lines += 1
+        if message in BURST_END_MARKERS:
+            self._complete_burst()
+        else:
+            self._schedule_burst_timer()
+
+    def call_later(
+        self, delay: float, callback: Callable[[], None]
+    ) -> asyncio.TimerHandle:
+        """
+        Schedule a callback of an entity, e.g. an update held back by its rate limit.
+
+        The callback is cancelled once the connection is closed or the device is removed, so it never fires on a
+        removed entity or with the state of a lost connection.
+        """
+
+        def run() -> None:
+            self._entity_timers.discard(handle)
+            callback()
+
+        self._entity_timers = {
+            timer for timer in self._entity_timers if not timer.cancelled()
+        }
+        handle = asyncio.get_running_loop().call_later(delay, run)
+        self._entity_timers.add(handle)
+        return handle
+
+    def _cancel_entity_timers(self) -> None:
+        for timer in self._entity_timers:
+            timer.cancel()
+        self._entity_timers.clear()
+
+    def _complete_burst(self) -> None:
+        """Publish the consolidated state and send the commands queued meanwhile."""
+        if self._burst_complete.is_set():
+            return
+
+        if self._burst_timer:
+            self._burst_timer.cancel()
+            self._burst_timer = None
+
+        self._burst_complete.set()
+        self.metrics.burst_duration = time.monotonic() - self._burst_started_at
+        self.metrics.burst_lines = self._burst_lines
+        _LOG.info(
+            "[%s] Initial state received: %d line(s) in %.0f ms, %d unchanged",
+            self.log_id,
+            self._burst_lines,
+            self.metrics.burst_duration * 1000,
+            self.metrics.line_cache_hits - self._burst_cache_hits,
+        )
+        _LOG.debug(
+            "[%s] Most frequent unhandled messages: %s",
+            self.log_id,
+            sorted(
+                self.metrics.unhandled_prefixes.items(),
+                key=lambda item: item[1],
+                reverse=True,
+            )[:10],
+        )
+
+        self._update_attributes()
+
+        task = asyncio.create_task(self._flush_command_queue())
+        self._background_tasks.add(task)
+        task.add_done_callback(self._on_background_task_done)
+
+    def _on_background_task_done(self, task: asyncio.Task) -> None:
+        self._background_tasks.discard(task)
+        if not task.cancelled() and (error := task.exception()) is not None:
+            _LOG.error(
+                "[%s] Background task failed: %s", self.log_id, error, exc_info=error
+            )
 
     async def _send_command(self, command: str) -> None:
-        """Send a command to the device."""
+        """
+        Send a command to the device.
+
+        While the device is offline, the command is either queued until the device reconnects
+        (see `StormAudioConfig.queue_while_offline`) or rejected right away.
+
+        :raises DeviceOfflineError: If the device is not connected and the command isn't queued, or the connection
+            is lost while sending the command
+        """
+        record(STAGE_QUEUED, command)
         if not self._connection:
-            _LOG.error("[%s] Cannot send command, not connected", self.log_id)
+            self._queue_command(command)
+            return
+
+        await self._wait_for_burst()
+        if not self._connection:
+            # The connection has been lost while waiting for the initial state
+            self._queue_command(command)
+            return
+
+        try:
+            await self._client.send_command(self._connection, command)
+        except ConnectionError as error:
+            raise DeviceOfflineError(
+                f"Connection lost while sending {command}"
+            ) from error
+
+    async def _wait_for_burst(self) -> None:
+        """Wait for the initial state dump to complete, so commands don't race with it."""
+        if self._burst_complete.is_set():
             return
 
-        await self._client.send_command(self._connection, command)
+        try:
+            await asyncio.wait_for(self._burst_complete.wait(), BURST_TIME_OUT)
+        except asyncio.TimeoutError:
+            if not self._connection:
+                # The burst of the next connection will be waited for instead
+                return
+            _LOG.warning(
+                "[%s] Initial state is still incomplete, publishing it anyway",
+                self.log_id,
+            )
+            self._complete_burst()
 
     async def _wait_for_response(
         self, pattern: str, timeout: float = 5.0, prefix_match: bool = False
     ) -> str | None:
-        return await self._client.wait_for_response(pattern, timeout, prefix_match)
+        if not self._connection:
+            # The command has been queued, there won't be any response until the device reconnects.
+            return None
+
+        started_at = time.monotonic()
+        try:
+            response = await self._client.wait_for_response(
+                pattern, timeout, prefix_match
+            )
+        except ConnectionLostError as error:
+            raise DeviceOfflineError(
+                f"Connection lost while waiting for {pattern}"
+            ) from error
+
+        if response is not None:
+            rtt = time.monotonic() - started_at
+            self.metrics.ack_rtt = (
+                rtt
+                if self.metrics.ack_rtt is None
+                else self.metrics.ack_rtt
+                + ACK_RTT_WEIGHT * (rtt - self.metrics.ack_rtt)
+            )
+        return response
+
+    def _queue_command(self, command: str) -> None:
+        """
+        Queue a command until the device reconnects.
+
+        A setter (i.e. a command with a value like `ssp.vol.[-40]`) supersedes any queued setter of the same kind,
+        so only the final volume, source, preset, etc. is sent on reconnect.
+
+        :raises DeviceOfflineError: If queueing is disabled
+        """
+        if not self._device_config.queue_while_offline:
+            raise DeviceOfflineError(f"Cannot send {command}, not connected")
+
+        if ".[" in command:
+            setter = command.split(".[", 1)[0] + ".["
+            self._command_queue = [
+                (queued_command, deadline)
+                for queued_command, deadline in self._command_queue
+                if not queued_command.startswith(setter)
+            ]
+
+        self._command_queue.append((command, time.monotonic() + QUEUE_TIME_OUT))
+        record(STAGE_QUEUED_OFFLINE, command)
+        _LOG.debug("[%s] Not connected, queued: %s", self.log_id, command)
+
+    async def _flush_command_queue(self) -> None:
+        """
+        Send all queued commands, which haven't expired yet, in a single write.
+
+        If the connection is lost (again) while sending, the commands are queued again, unless a command queued
+        meanwhile supersedes them.
+        """
+        if not self._command_queue or not self._connection:
+            return
+
+        now = time.monotonic()
+        queue, self._command_queue = self._command_queue, []
+        commands = [command for command, deadline in queue if deadline >= now]
+
+        if len(commands) < len(queue):
+            _LOG.info(
+                "[%s] Dropped %d expired queued command(s)",
+                self.log_id,
+                len(queue) - len(commands),
+            )
+
+        if commands:
+            _LOG.info("[%s] Sending %d queued command(s)", self.log_id, len(commands))
+            try:
+                await self._client.send_commands(self._connection, commands)
+            except ConnectionError as error:
+                _LOG.warning(
+                    "[%s] Connection lost while sending the queued commands, queueing them again: %s",
+                    self.log_id,
+                    error,
+                )
+                queued_setters = {
+                    command.split(".[", 1)[0]
+                    for command, _deadline in self._command_queue
+                    if ".[" in command
+                }
+                self._command_queue = [
+                    (command, deadline)
+                    for command, deadline in queue
+                    if deadline >= now
+                    and (
+                        ".[" not in command
+                        or command.split(".[", 1)[0] not in queued_setters
+                    )
+                ] + self._command_queue
+
+    async def query_state(
+        self, queries: Iterable[StateQuery] | None = None, timeout: float = 5.0
+    ) -> dict[StateQuery, str | None]:
+        """
+        Query the given attributes from the device in a single round-trip.
+
+        All query commands are sent in one write and their responses share a single deadline.
+        The responses pass through the regular message handler, so the device attributes are
+        up to date once this method returns. This is much cheaper than a reconnect, which
+        makes it suitable for periodic resyncs or after a suspected desync.
+
+        :param queries: The attributes to query. Defaults to all queryable attributes.
+        :param timeout: Deadline in seconds for all responses
+        :return: Mapping of each query to its raw response or None if it didn't arrive in time
+        :raises DeviceOfflineError: If the device is not connected or the connection is lost before all responses
+            arrived
+        """
+        if not self._connection:
+            raise DeviceOfflineError("Cannot query state, not connected")
+
+        await self._wait_for_burst()
+        # The responses must be parsed again, even if they are unchanged, as the state might be out of sync.
+        self.invalidate_line_cache()
+        queries = list(StateQuery) if queries is None else list(queries)
+        try:
+            responses = await self._client.send_commands_and_wait(
+                self._connection,
+                {
+                    STATE_QUERY_MAPPING[query][0]: STATE_QUERY_MAPPING[query][1]
+                    for query in queries
+                },
+                timeout,
+            )
+        except ConnectionError as error:
+            raise DeviceOfflineError("Connection lost while querying state") from error
+
+        return {
+            query: responses.get(STATE_QUERY_MAPPING[query][0]) for query in queries
+        }
+
+    def _is_redundant(self, command: str, is_current: bool, force: bool) -> bool:
+        """
+        Return whether the command can be skipped, as the device already is in its target state.
+
+        Only the complete state of a connected, powered-on device is trusted. Pass `force` to always send the command.
+        """
+        if (
+            force
+            or not is_current
+            or not self._connection
+            or not self._burst_complete.is_set()
+            or self.state != StormAudioStates.ON
+        ):
+            return False
+
+        self.metrics.elided_commands += 1
+        _LOG.debug(
+            "[%s] Skipping %s, the device already is in the target state",
+            self.log_id,
+            command,
+        )
+        return True
 
     def _update_attributes(self) -> None:
-        """Update the device attributes via an event."""
-        self.push_update()
+        """
+        Update the device attributes via an event.
+
+        The update is deferred to the end of a batch of lines and suppressed while the initial state dump is
+        still incomplete.
+        """
+        if self._batching:
+            self._batch_updated = True
+        elif not self._in_burst:
+            record(STAGE_ATTRIBUTES_UPDATED)
+            self.push_update()
+
+    @property
+    def _in_burst(self) -> bool:
+        """Return whether the initial state dump of the current connection is still incomplete."""
+        return self._connection is not None and not self._burst_complete.is_set()
 
     async def power_on(self):
         """Power on the StormAudio processor."""
@@ -522,29 +1118,48 @@ class StormAudioDevice(PersistentConnectionDevice):
                 StormAudioResponses.PROC_STATE_ON, MAX_TIME_OUT
             )
 
-    async def mute_on(self):
+    async def mute_on(self, force: bool = False):
         """Mute the StormAudio processor."""
+        if self._is_redundant(
+            StormAudioCommands.MUTE_ON, self.device_attributes.muted, force
+        ):
+            return
+
         await self._send_command(StormAudioCommands.MUTE_ON)
         await self._wait_for_response(StormAudioResponses.MUTE_ON)
 
-    async def mute_off(self):
+    async def mute_off(self, force: bool = False):
         """Unmute the StormAudio processor."""
+        if self._is_redundant(
+            StormAudioCommands.MUTE_OFF, not self.device_attributes.muted, force
+        ):
+            return
+
         await self._send_command(StormAudioCommands.MUTE_OFF)
         await self._wait_for_response(StormAudioResponses.MUTE_OFF)
 
     async def mute_toggle(self):
         """Toggle mute of the StormAudio processor."""
         await self._send_command(StormAudioCommands.MUTE_TOGGLE)
+        await self._wait_for_response(
+            pattern=StormAudioResponses.MUTE_X,
+            prefix_match=True,
+        )
 
-    async def volume_x(self, volume):
+    async def volume_x(self, volume, force: bool = False):
         """Set the volume of the StormAudio processor."""
         # The UC remotes only support absolute volume scales for now.
         # That's why we need to convert the relative values from the ISPs.
         sanitized_volume = max(MIN_VOLUME, min(MAX_VOLUME, int(volume)))
         relative_volume = sanitized_volume - MAX_VOLUME
-        await self._send_command(
-            StormAudioCommands.VOLUME_X_FORMAT.format(relative_volume)
-        )
+        command = StormAudioCommands.VOLUME_X_FORMAT.format(relative_volume)
+
+        if self._is_redundant(
+            command, self.device_attributes.volume == sanitized_volume, force
+        ):
+            return
+
+        await self._send_command(command)
         await self._wait_for_response(
             pattern=StormAudioResponses.VOLUME_X,
             prefix_match=True,
@@ -566,25 +1181,39 @@ class StormAudioDevice(PersistentConnectionDevice):
             prefix_match=True,
         )
 
-    async def select_source(self, source: str):
+    async def select_source(self, source: str, force: bool = False):
         """Select the input of the StormAudio processor."""
         source_id = self.device_attributes.sources.get(source)
 
         if source_id is not None:
-            await self._send_command(
-                StormAudioCommands.INPUT_X_FORMAT.format(source_id)
-            )
+            command = StormAudioCommands.INPUT_X_FORMAT.format(source_id)
+            if self._is_redundant(
+                command, self.device_attributes.source_id == source_id, force
+            ):
+                return
+
+            await self._send_command(command)
             await self._wait_for_response(
                 StormAudioResponses.INPUT_X_FORMAT.format(source_id)
             )
 
-    async def select_sound_mode(self, mode: str):
+    async def select_sound_mode(self, mode: str, force: bool = False):
         """Set the surround mode of the StormAudio processor."""
         sound_mode_id = self.device_attributes.upmixer_modes.get(mode)
 
         if sound_mode_id is not None:
-            await self._send_command(
-                StormAudioCommands.SURROUND_MODE_X_FORMAT.format(sound_mode_id)
+            command = StormAudioCommands.SURROUND_MODE_X_FORMAT.format(sound_mode_id)
+            if self._is_redundant(
+                command,
+                self.device_attributes.upmixer_mode_id == sound_mode_id,
+                force,
+            ):
+                return
+
+            await self._send_command(command)
+            await self._wait_for_response(
+                pattern=StormAudioResponses.SURROUND_MODE_X,
+                prefix_match=True,
             )
 
     async def cursor_up(self):
@@ -621,28 +1250,64 @@ class StormAudioDevice(PersistentConnectionDevice):
     async def preset_next(self):
         """Set the next preset."""
         await self._send_command(StormAudioCommands.PRESET_NEXT)
+        await self._wait_for_response(
+            pattern=StormAudioResponses.PRESET_CURRENT_X,
+            prefix_match=True,
+        )
 
     async def preset_prev(self):
         """Set the previous preset."""
         await self._send_command(StormAudioCommands.PRESET_PREV)
+        await self._wait_for_response(
+            pattern=StormAudioResponses.PRESET_CURRENT_X,
+            prefix_match=True,
+        )
 
-    async def loudness_off(self):
+    async def loudness_off(self, force: bool = False):
         """Set the loudness to off."""
+        if self._is_redundant(
+            StormAudioCommands.LOUDNESS_OFF,
+            self.device_attributes.loudness_mode_id == 0,
+            force,
+        ):
+            return
+
         await self._send_command(StormAudioCommands.LOUDNESS_OFF)
         await self._wait_for_response(StormAudioResponses.LOUDNESS_OFF)
 
-    async def loudness_low(self):
+    async def loudness_low(self, force: bool = False):
         """Set the loudness to low."""
+        if self._is_redundant(
+            StormAudioCommands.LOUDNESS_LOW,
+            self.device_attributes.loudness_mode_id == 1,
+            force,
+        ):
+            return
+
         await self._send_command(StormAudioCommands.LOUDNESS_LOW)
         await self._wait_for_response(StormAudioResponses.LOUDNESS_LOW)
 
-    async def loudness_medium(self):
+    async def loudness_medium(self, force: bool = False):
         """Set the loudness to medium."""
+        if self._is_redundant(
+            StormAudioCommands.LOUDNESS_MEDIUM,
+            self.device_attributes.loudness_mode_id == 2,
+            force,
+        ):
+            return
+
         await self._send_command(StormAudioCommands.LOUDNESS_MEDIUM)
         await self._wait_for_response(StormAudioResponses.LOUDNESS_MEDIUM)
 
-    async def loudness_full(self):
+    async def loudness_full(self, force: bool = False):
         """Set the loudness to full."""
+        if self._is_redundant(
+            StormAudioCommands.LOUDNESS_FULL,
+            self.device_attributes.loudness_mode_id == 3,
+            force,
+        ):
+            return
+
         await self._send_command(StormAudioCommands.LOUDNESS_FULL)
         await self._wait_for_response(StormAudioResponses.LOUDNESS_FULL)
 
@@ -662,8 +1327,13 @@ class StormAudioDevice(PersistentConnectionDevice):
             prefix_match=True,
         )
 
-    async def bass_reset(self):
+    async def bass_reset(self, force: bool = False):
         """Reset the bass."""
+        if self._is_redundant(
+            StormAudioCommands.BASS_RESET, self.device_attributes.bass == 0, force
+        ):
+            return
+
         await self._send_command(StormAudioCommands.BASS_RESET)
         await self._wait_for_response(
             pattern=StormAudioResponses.BASS_X,
@@ -686,8 +1356,13 @@ class StormAudioDevice(PersistentConnectionDevice):
             prefix_match=True,
         )
 
-    async def treble_reset(self):
+    async def treble_reset(self, force: bool = False):
         """Reset the treble."""
+        if self._is_redundant(
+            StormAudioCommands.TREBLE_RESET, self.device_attributes.treble == 0, force
+        ):
+            return
+
         await self._send_command(StormAudioCommands.TREBLE_RESET)
         await self._wait_for_response(
             pattern=StormAudioResponses.TREBLE_X,
@@ -710,8 +1385,15 @@ class StormAudioDevice(PersistentConnectionDevice):
             prefix_match=True,
         )
 
-    async def brightness_reset(self):
+    async def brightness_reset(self, force: bool = False):
         """Reset the brightness."""
+        if self._is_redundant(
+            StormAudioCommands.BRIGHTNESS_RESET,
+            self.device_attributes.brightness == 0,
+            force,
+        ):
+            return
+
         await self._send_command(StormAudioCommands.BRIGHTNESS_RESET)
         await self._wait_for_response(
             pattern=StormAudioResponses.BRIGHTNESS_X,
@@ -734,8 +1416,15 @@ class StormAudioDevice(PersistentConnectionDevice):
             prefix_match=True,
         )
 
-    async def center_enhance_reset(self):
+    async def center_enhance_reset(self, force: bool = False):
         """Reset the center enhancement."""
+        if self._is_redundant(
+            StormAudioCommands.CENTER_ENHANCE_RESET,
+            self.device_attributes.center_enhance == 0,
+            force,
+        ):
+            return
+
         await self._send_command(StormAudioCommands.CENTER_ENHANCE_RESET)
         await self._wait_for_response(
             pattern=StormAudioResponses.CENTER_ENHANCE_X,
@@ -758,8 +1447,15 @@ class StormAudioDevice(PersistentConnectionDevice):
             prefix_match=True,
         )
 
-    async def surround_enhance_reset(self):
+    async def surround_enhance_reset(self, force: bool = False):
         """Reset the surround enhancement."""
+        if self._is_redundant(
+            StormAudioCommands.SURROUND_ENHANCE_RESET,
+            self.device_attributes.surround_enhance == 0,
+            force,
+        ):
+            return
+
         await self._send_command(StormAudioCommands.SURROUND_ENHANCE_RESET)
         await self._wait_for_response(
             pattern=StormAudioResponses.SURROUND_ENHANCE_X,
@@ -782,123 +1478,531 @@ class StormAudioDevice(PersistentConnectionDevice):
             prefix_match=True,
         )
 
-    async def lfe_enhance_reset(self):
+    async def lfe_enhance_reset(self, force: bool = False):
         """Reset the LFE enhancement."""
+        if self._is_redundant(
+            StormAudioCommands.LFE_ENHANCE_RESET,
+            self.device_attributes.lfe_enhance == 0,
+            force,
+        ):
+            return
+
         await self._send_command(StormAudioCommands.LFE_ENHANCE_RESET)
         await self._wait_for_response(
             pattern=StormAudioResponses.LFE_ENHANCE_X,
             prefix_match=True,
         )
 
-    async def dolby_mode_off(self):
+    async def dolby_mode_off(self, force: bool = False):
         """Set the Dolby mode to off mode."""
+        if self._is_redundant(
+            StormAudioCommands.DOLBY_MODE_OFF,
+            self.device_attributes.dolby_mode_id == 0,
+            force,
+        ):
+            return
+
         await self._send_command(StormAudioCommands.DOLBY_MODE_OFF)
         await self._wait_for_response(StormAudioResponses.DOLBY_MODE_OFF)
 
-    async def dolby_mode_movie(self):
+    async def dolby_mode_movie(self, force: bool = False):
         """Set the Dolby mode to movie mode."""
+        if self._is_redundant(
+            StormAudioCommands.DOLBY_MODE_MOVIE,
+            self.device_attributes.dolby_mode_id == 1,
+            force,
+        ):
+            return
+
         await self._send_command(StormAudioCommands.DOLBY_MODE_MOVIE)
         await self._wait_for_response(StormAudioResponses.DOLBY_MODE_MOVIE)
 
-    async def dolby_mode_music(self):
+    async def dolby_mode_music(self, force: bool = False):
         """Set the Dolby mode to music mode."""
+        if self._is_redundant(
+            StormAudioCommands.DOLBY_MODE_MUSIC,
+            self.device_attributes.dolby_mode_id == 2,
+            force,
+        ):
+            return
+
         await self._send_command(StormAudioCommands.DOLBY_MODE_MUSIC)
         await self._wait_for_response(StormAudioResponses.DOLBY_MODE_MUSIC)
 
-    async def dolby_mode_night(self):
+    async def dolby_mode_night(self, force: bool = False):
         """Set the Dolby mode to night mode."""
+        if self._is_redundant(
+            StormAudioCommands.DOLBY_MODE_NIGHT,
+            self.device_attributes.dolby_mode_id == 3,
+            force,
+        ):
+            return
+
         await self._send_command(StormAudioCommands.DOLBY_MODE_NIGHT)
         await self._wait_for_response(StormAudioResponses.DOLBY_MODE_NIGHT)
 
-    async def storm_xt_on(self):
+    async def storm_xt_on(self, force: bool = False):
         """Set the StormXT mode to on."""
+        if self._is_redundant(
+            StormAudioCommands.STORM_XT_ON,
+            self.device_attributes.storm_xt_active,
+            force,
+        ):
+            return
+
         await self._send_command(StormAudioCommands.STORM_XT_ON)
+        await self._wait_for_response(
+            pattern=StormAudioResponses.STORM_XT_ON,
+        )
 
-    async def storm_xt_off(self):
+    async def storm_xt_off(self, force: bool = False):
         """Set the StormXT mode to off."""
+        if self._is_redundant(
+            StormAudioCommands.STORM_XT_OFF,
+            not self.device_attributes.storm_xt_active,
+            force,
+        ):
+            return
+
         await self._send_command(StormAudioCommands.STORM_XT_OFF)
+        await self._wait_for_response(
+            pattern=StormAudioResponses.STORM_XT_OFF,
+        )
 
     async def storm_xt_toggle(self):
         """Toggle the StormXT mode."""
         await self._send_command(StormAudioCommands.STORM_XT_TOGGLE)
+        await self._wait_for_response(
+            pattern=StormAudioResponses.STORM_XT_X,
+            prefix_match=True,
+        )
 
-    async def auro_preset_small(self):
+    async def auro_preset_small(self, force: bool = False):
         """Set the Auro-Matic preset to "small"."""
+        if self._is_redundant(
+            StormAudioCommands.AURO_PRESET_SMALL,
+            self.device_attributes.auro_preset_id == 0,
+            force,
+        ):
+            return
+
         await self._send_command(StormAudioCommands.AURO_PRESET_SMALL)
+        await self._wait_for_response(
+            pattern=StormAudioResponses.AURO_PRESET_X,
+            prefix_match=True,
+        )
 
-    async def auro_preset_medium(self):
+    async def auro_preset_medium(self, force: bool = False):
         """Set the Auro-Matic preset to "medium"."""
+        if self._is_redundant(
+            StormAudioCommands.AURO_PRESET_MEDIUM,
+            self.device_attributes.auro_preset_id == 1,
+            force,
+        ):
+            return
+
         await self._send_command(StormAudioCommands.AURO_PRESET_MEDIUM)
+        await self._wait_for_response(
+            pattern=StormAudioResponses.AURO_PRESET_X,
+            prefix_match=True,
+        )
 
-    async def auro_preset_large(self):
+    async def auro_preset_large(self, force: bool = False):
         """Set the Auro-Matic preset to "large"."""
+        if self._is_redundant(
+            StormAudioCommands.AURO_PRESET_LARGE,
+            self.device_attributes.auro_preset_id == 2,
+            force,
+        ):
+            return
+
         await self._send_command(StormAudioCommands.AURO_PRESET_LARGE)
+        await self._wait_for_response(
+            pattern=StormAudioResponses.AURO_PRESET_X,
+            prefix_match=True,
+        )
 
-    async def auro_preset_speech(self):
+    async def auro_preset_speech(self, force: bool = False):
         """Set the Auro-Matic preset to "speech"."""
+        if self._is_redundant(
+            StormAudioCommands.AURO_PRESET_SPEECH,
+            self.device_attributes.auro_preset_id == 3,
+            force,
+        ):
+            return
+
         await self._send_command(StormAudioCommands.AURO_PRESET_SPEECH)
+        await self._wait_for_response(
+            pattern=StormAudioResponses.AURO_PRESET_X,
+            prefix_match=True,
+        )
 
-    async def auro_preset_x(self, auro_preset_name: str):
+    async def auro_preset_x(self, auro_preset_name: str, force: bool = False):
         """Set the Auro-Matic preset to the given value."""
         auro_preset_id = self.device_attributes.auro_presets.get(auro_preset_name)
 
         if auro_preset_id is not None:
-            await self._send_command(
-                StormAudioCommands.AURO_PRESET_X_FORMAT.format(auro_preset_id)
+            command = StormAudioCommands.AURO_PRESET_X_FORMAT.format(auro_preset_id)
+            if self._is_redundant(
+                command,
+                self.device_attributes.auro_preset_id == auro_preset_id,
+                force,
+            ):
+                return
+
+            await self._send_command(command)
+            await self._wait_for_response(
+                pattern=StormAudioResponses.AURO_PRESET_X,
+                prefix_match=True,
             )
 
-    async def auro_strength_x(self, auro_strength: int):
+    async def auro_strength_x(self, auro_strength: int, force: bool = False):
         """Set the Auro-Matic strength to the given value."""
         if int(auro_strength) in self.device_attributes.auro_strength_list:
-            await self._send_command(
-                StormAudioCommands.AURO_STRENGTH_X_FORMAT.format(auro_strength)
+            command = StormAudioCommands.AURO_STRENGTH_X_FORMAT.format(auro_strength)
+            if self._is_redundant(
+                command,
+                self.device_attributes.auro_strength == int(auro_strength),
+                force,
+            ):
+                return
+
+            await self._send_command(command)
+            await self._wait_for_response(
+                pattern=StormAudioResponses.AURO_STRENGTH_X,
+                prefix_match=True,
             )
         else:
             _LOG.error(
                 f"[%s] Invalid Auro-Matic strength: {auro_strength}", self.log_id
             )
 
-    async def dolby_center_spread_on(self):
+    async def dolby_center_spread_on(self, force: bool = False):
         """Set the Dolby Center Spread to on."""
+        if self._is_redundant(
+            StormAudioCommands.DOLBY_CENTER_SPREAD_ON,
+            self.device_attributes.dolby_center_spread,
+            force,
+        ):
+            return
+
         await self._send_command(StormAudioCommands.DOLBY_CENTER_SPREAD_ON)
         await self._wait_for_response(StormAudioResponses.DOLBY_CENTER_SPREAD_ON)
 
-    async def dolby_center_spread_off(self):
+    async def dolby_center_spread_off(self, force: bool = False):
         """Set the Dolby Center Spread to off."""
+        if self._is_redundant(
+            StormAudioCommands.DOLBY_CENTER_SPREAD_OFF,
+            not self.device_attributes.dolby_center_spread,
+            force,
+        ):
+            return
+
         await self._send_command(StormAudioCommands.DOLBY_CENTER_SPREAD_OFF)
         await self._wait_for_response(StormAudioResponses.DOLBY_CENTER_SPREAD_OFF)
 
     async def dolby_center_spread_toggle(self):
         """Toggle the Dolby Center Spread."""
         await self._send_command(StormAudioCommands.DOLBY_CENTER_SPREAD_TOGGLE)
+        await self._wait_for_response(
+            pattern=StormAudioResponses.DOLBY_CENTER_SPREAD_X,
+            prefix_match=True,
+        )
 
-    async def dolby_virtualizer_on(self):
+    async def dolby_virtualizer_on(self, force: bool = False):
         """Set the Dolby Virtualizer to on."""
+        if self._is_redundant(
+            StormAudioCommands.DOLBY_VIRTUALIZER_ON,
+            self.device_attributes.dolby_virtualizer,
+            force,
+        ):
+            return
+
         await self._send_command(StormAudioCommands.DOLBY_VIRTUALIZER_ON)
         await self._wait_for_response(StormAudioResponses.DOLBY_VIRTUALIZER_ON)
 
-    async def dolby_virtualizer_off(self):
+    async def dolby_virtualizer_off(self, force: bool = False):
         """Set the Dolby Virtualizer to off."""
+        if self._is_redundant(
+            StormAudioCommands.DOLBY_VIRTUALIZER_OFF,
+            not self.device_attributes.dolby_virtualizer,
+            force,
+        ):
+            return
+
         await self._send_command(StormAudioCommands.DOLBY_VIRTUALIZER_OFF)
         await self._wait_for_response(StormAudioResponses.DOLBY_VIRTUALIZER_OFF)
 
     async def dolby_virtualizer_toggle(self):
         """Toggle the Dolby Virtualizer."""
         await self._send_command(StormAudioCommands.DOLBY_VIRTUALIZER_TOGGLE)
+        await self._wait_for_response(
+            pattern=StormAudioResponses.DOLBY_VIRTUALIZER_X,
+            prefix_match=True,
+        )
 
     # --- Custom commands from the Remote entity ---
-    async def preset_x(self, preset_name: str):
+    async def preset_x(self, preset_name: str, force: bool = False):
         """Select a preset by name."""
         preset_id = self.device_attributes.presets.get(preset_name)
 
         if preset_id is not None:
-            await self._send_command(
-                StormAudioCommands.PRESET_X_FORMAT.format(preset_id)
-            )
+            command = StormAudioCommands.PRESET_X_FORMAT.format(preset_id)
+            if self._is_redundant(
+                command, self.device_attributes.preset_id == preset_id, force
+            ):
+                return
+
+            await self._send_command(command)
             await self._wait_for_response(
                 StormAudioResponses.PRESET_X_FORMAT.format(preset_id)
             )
 
-    async def custom_command(self, command: str):
-        """Send any of the ISP's supported Telnet commands to the device."""
+    async def scene_x(self, scene_name: str):
+        """Apply a scene by name."""
+        scene = self._device_config.scenes.get(scene_name)
+
+        if scene is not None:
+            await self.apply_scene(scene)
+        else:
+            _LOG.warning("[%s] Unknown scene: %s", self.log_id, scene_name)
+
+    def save_scene(self, scene_name: str):
+        """Save the current state of the StormAudio processor as a scene."""
+        attributes = self.device_attributes
+        scene = {
+            SceneAttribute.SOURCE: attributes.source,
+            SceneAttribute.PRESET: attributes.preset,
+            SceneAttribute.SOUND_MODE: attributes.sound_mode,
+            SceneAttribute.VOLUME: attributes.volume,
+            SceneAttribute.MUTED: attributes.muted,
+            SceneAttribute.LOUDNESS: attributes.loudness,
+            SceneAttribute.DOLBY_MODE: attributes.dolby_mode,
+            **{
+                scene_attribute: getattr(attributes, attribute)
+                for scene_attribute, (attribute, _command) in _SCENE_LEVELS.items()
+            },
+        }
+
+        self.update_config(
+            scenes={
+                **self._device_config.scenes,
+                scene_name: {
+                    str(key): value for key, value in scene.items() if value is not None
+                },
+            }
+        )
+
+    async def apply_scene(
+        self, scene: dict[str, Any], timeout: float = MAX_TIME_OUT
+    ) -> int:
+        """
+        Apply a scene to the StormAudio processor.
+
+        Only the attributes which differ from the current state are sent. All of those commands
+        are pipelined in a single write and share a single deadline for their acknowledgements.
+
+        :param scene: The target state per scene attribute
+        :param timeout: Deadline in seconds for all acknowledgements
+        :return: The number of commands sent
+        :raises DeviceOfflineError: If the connection is lost before all acknowledgements arrived
+        """
+        if self._connection:
+            await self._wait_for_burst()
+
+        commands = self._get_scene_commands(scene)
+        if not commands:
+            _LOG.debug("[%s] Scene is already active", self.log_id)
+            return 0
+
+        if not self._connection:
+            for command in commands:
+                self._queue_command(command)
+            return len(commands)
+
+        record(STAGE_QUEUED, ", ".join(commands))
+        started_at = time.monotonic()
+        try:
+            await self._client.send_commands_and_wait(
+                self._connection, commands, timeout
+            )
+        except ConnectionError as error:
+            raise DeviceOfflineError("Connection lost while applying scene") from error
+        _LOG.info(
+            "[%s] Applied scene with %d command(s) in %.0f ms",
+            self.log_id,
+            len(commands),
+            (time.monotonic() - started_at) * 1000,
+        )
+
+        return len(commands)
+
+    def _get_scene_commands(  # pylint: disable=too-many-branches,too-many-locals
+        self, scene: dict[str, Any]
+    ) -> dict[str, str]:
+        """
+        Return the commands (and their expected responses) which are needed to apply the scene.
+
+        The ISP echoes every setter with the value set, so the expected response is the command itself. This way,
+        echoes caused by other commands of the same scene can't be mistaken for its acknowledgement. Invalid values
+        (e.g. a volume that isn't a number) are skipped with a warning, so the rest of the scene is still applied.
+        """
+        attributes = self.device_attributes
+        commands: list[str] = []
+
+        for key in scene.keys() - set(SceneAttribute):
+            _LOG.warning("[%s] Ignoring unknown scene attribute: %s", self.log_id, key)
+
+        for scene_attribute in SceneAttribute:
+            if scene_attribute not in scene:
+                continue
+
+            target = scene[scene_attribute]
+
+            match scene_attribute:
+                case SceneAttribute.SOURCE:
+                    source_id = attributes.sources.get(target)
+                    if source_id is not None and source_id != attributes.source_id:
+                        commands.append(
+                            StormAudioCommands.INPUT_X_FORMAT.format(source_id)
+                        )
+
+                case SceneAttribute.PRESET:
+                    preset_id = attributes.presets.get(target)
+                    if preset_id is not None and preset_id != attributes.preset_id:
+                        commands.append(
+                            StormAudioCommands.PRESET_X_FORMAT.format(preset_id)
+                        )
+
+                case SceneAttribute.SOUND_MODE:
+                    sound_mode_id = attributes.upmixer_modes.get(target)
+                    if (
+                        sound_mode_id is not None
+                        and sound_mode_id != attributes.upmixer_mode_id
+                    ):
+                        commands.append(
+                            StormAudioCommands.SURROUND_MODE_X_FORMAT.format(
+                                sound_mode_id
+                            )
+                        )
+
+                case SceneAttribute.VOLUME:
+                    volume = self._get_scene_level(scene_attribute, target)
+                    if volume is None:
+                        continue
+                    volume = max(MIN_VOLUME, min(MAX_VOLUME, volume))
+                    if volume != attributes.volume:
+                        commands.append(
+                            StormAudioCommands.VOLUME_X_FORMAT.format(
+                                volume - MAX_VOLUME
+                            )
+                        )
+
+                case SceneAttribute.MUTED:
+                    if not isinstance(target, bool):
+                        _LOG.warning(
+                            "[%s] Ignoring invalid scene value %s: %r",
+                            self.log_id,
+                            scene_attribute,
+                            target,
+                        )
+                    elif target != attributes.muted:
+                        commands.append(
+                            StormAudioCommands.MUTE_ON
+                            if target
+                            else StormAudioCommands.MUTE_OFF
+                        )
+
+                case SceneAttribute.LOUDNESS:
+                    loudness_id = _get_mode_id(attributes.loudness_modes, target)
+                    if (
+                        loudness_id is not None
+                        and loudness_id != attributes.loudness_mode_id
+                    ):
+                        commands.append(
+                            StormAudioCommands.LOUDNESS_X_FORMAT.format(loudness_id)
+                        )
+
+                case SceneAttribute.DOLBY_MODE:
+                    dolby_mode_id = _get_mode_id(attributes.dolby_modes, target)
+                    if (
+                        dolby_mode_id is not None
+                        and dolby_mode_id != attributes.dolby_mode_id
+                    ):
+                        commands.append(
+                            StormAudioCommands.DOLBY_MODE_X_FORMAT.format(dolby_mode_id)
+                        )
+
+                case scene_attribute if scene_attribute in _SCENE_LEVELS:
+                    attribute, command = _SCENE_LEVELS[scene_attribute]
+                    level = self._get_scene_level(scene_attribute, target)
+                    if level is not None and level != getattr(attributes, attribute):
+                        commands.append(command.format(level))
+
+        return {command: command for command in commands}
+
+    def _get_scene_level(self, scene_attribute: str, target: Any) -> int | None:
+        """Return the level of a scene attribute (e.g. the volume or bass), or `None` if it isn't a number."""
+        try:
+            return int(target)
+        except (TypeError, ValueError):
+            _LOG.warning(
+                "[%s] Ignoring invalid scene value %s: %r",
+                self.log_id,
+                scene_attribute,
+                target,
+            )
+            return None
+
+    async def custom_command(self, command: str) -> bool:
+        """
+        Send any of the ISP's supported Telnet commands to the device.
+
+        Only commands known to be echoed by the ISP (setters, on/off, toggles and steps) wait for their
+        acknowledgement, within a timeout adapted to the measured acknowledgement RTT. Others, e.g. queries or
+        `ssp.keepalive`, aren't answered under a predictable prefix, so they don't wait at all.
+
+        :return: Whether the command waited for its acknowledgement
+        """
         await self._send_command(command)
+        if ".[" not in command and not command.endswith(ACKNOWLEDGED_COMMAND_SUFFIXES):
+            return False
+
+        timeout = ACK_TIME_OUT
+        if self.metrics.ack_rtt is not None:
+            timeout = min(
+                max(ACK_RTT_FACTOR * self.metrics.ack_rtt, MIN_ACK_TIME_OUT),
+                ACK_TIME_OUT,
+            )
+        await self._wait_for_response(
+            pattern=get_response_prefix(command),
+            timeout=timeout,
+            prefix_match=True,
+        )
+        return True
+
+
+def _get_path(message: str) -> str:
+    """Return the first path segment of a message without trailing digits, e.g. `trig` for `ssp.trig1.off`."""
+    _ssp, _separator, path = message.partition(".")
+    return path.split(".", 1)[0].rstrip("0123456789")
+
+
+def _get_connect_slots() -> asyncio.Semaphore:
+    """
+    Return the semaphore, which bounds the concurrent connection attempts of all devices.
+
+    A semaphore is bound to the event loop it is first used on, so a new one is created for a new event loop, e.g.
+    when the driver is restarted within the same process.
+    """
+    global _connect_slots  # pylint: disable=global-statement
+    loop = asyncio.get_running_loop()
+    if _connect_slots is None or _connect_slots[0] is not loop:
+        _connect_slots = (loop, asyncio.Semaphore(MAX_CONCURRENT_CONNECTS))
+
+    return _connect_slots[1]
+
+
+def _get_mode_id(modes: dict[int, str], mode_name: str) -> int | None:
+    """Return the id of the given mode name."""
+    return next((mode_id for mode_id, name in modes.items() if name == mode_name), None)
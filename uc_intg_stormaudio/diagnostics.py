@@ -0,0 +1,131 @@
+"""
+Diagnostics Module.
+
+This module collects the runtime metrics of the driver and writes them to `diagnostics.json` in the configuration
+directory: periodically, and on demand via the remote entity. So the effect of the driver's optimizations (e.g. the
+commands saved) can be checked on a running installation.
+
+:license: Mozilla Public License Version 2.0, see LICENSE for more details.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+import weakref
+from dataclasses import asdict
+from typing import Any
+
+from uc_intg_stormaudio.const import Loggers
+from uc_intg_stormaudio.metrics import LoopMetrics, StormAudioMetrics
+from uc_intg_stormaudio.persistence import PersistenceWorker
+
+_LOG = logging.getLogger(Loggers.DRIVER)
+
+DIAGNOSTICS_FILE_NAME = "diagnostics.json"
+DIAGNOSTICS_INTERVAL = 900.0
+
+# The metrics of the devices are referenced weakly, so removed devices drop out of the diagnostics
+_device_metrics: weakref.WeakValueDictionary[str, StormAudioMetrics] = (
+    weakref.WeakValueDictionary()
+)
+_diagnostics: "Diagnostics | None" = None  # pylint: disable=invalid-name
+
+
+class Diagnostics:
+    """
+    Writer of the diagnostics.
+
+    The diagnostics are written via the persistence worker, so the event loop never waits for the storage. They are
+    small and written only every `DIAGNOSTICS_INTERVAL` seconds, so they don't wear out the (flash) storage.
+    """
+
+    def __init__(
+        self,
+        config_dir: str,
+        persistence: PersistenceWorker,
+        loop_metrics: LoopMetrics | None = None,
+        interval: float = DIAGNOSTICS_INTERVAL,
+    ):
+        """
+        Initialize the diagnostics.
+
+        :param config_dir: Directory the diagnostics are written to
+        :param persistence: Worker writing the diagnostics
+        :param loop_metrics: Metrics of the event loop monitor, if it is running
+        :param interval: Interval in seconds between two periodic writes
+        """
+        self._path = os.path.join(config_dir, DIAGNOSTICS_FILE_NAME)
+        self._persistence = persistence
+        self._loop_metrics = loop_metrics
+        self._interval = interval
+        self._task: asyncio.Task | None = None
+
+    def snapshot(self) -> dict[str, Any]:
+        """Return the current metrics of the driver."""
+        snapshot = {
+            "devices": {
+                identifier: asdict(metrics)
+                | {"line_cache_hit_rate": round(metrics.line_cache_hit_rate, 4)}
+                for identifier, metrics in sorted(_device_metrics.items())
+            },
+            "persistence": asdict(self._persistence.metrics),
+        }
+        if self._loop_metrics is not None:
+            snapshot["event_loop"] = asdict(self._loop_metrics) | {
+                "mean_lag": self._loop_metrics.mean_lag
+            }
+
+        return snapshot
+
+    def start(self) -> None:
+        """Start writing the diagnostics periodically, must be called on the event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def write(self) -> None:
+        """Schedule the current diagnostics to be written."""
+        snapshot = self.snapshot()
+        written_at = time.time()
+        self._persistence.schedule(
+            self._path,
+            lambda: json.dumps(
+                {"written_at": round(written_at, 3)} | snapshot,
+                indent=2,
+                default=str,
+                ensure_ascii=False,
+            ),
+        )
+        _LOG.debug("Writing the diagnostics to %s", self._path)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self._interval)
+            self.write()
+
+
+def register_device(identifier: str, metrics: StormAudioMetrics) -> None:
+    """Add the metrics of a device to the diagnostics."""
+    _device_metrics[identifier] = metrics
+
+
+def configure(
+    config_dir: str,
+    persistence: PersistenceWorker,
+    loop_metrics: LoopMetrics | None = None,
+) -> Diagnostics:
+    """Create the diagnostics of the driver, which can then be written via `write_diagnostics`."""
+    global _diagnostics  # pylint: disable=global-statement
+    _diagnostics = Diagnostics(config_dir, persistence, loop_metrics)
+    return _diagnostics
+
+
+def write_diagnostics() -> bool:
+    """Write the diagnostics right away, returns whether they have been scheduled."""
+    if _diagnostics is None:
+        _LOG.warning("Not writing the diagnostics, as they haven't been configured")
+        return False
+
+    _diagnostics.write()
+    return True
@@ -1,44 +1,526 @@
 """
 Device Discovery Module.
 
-This module handles automatic device discovery on the local network. It uses mDNS (Multicast DNS).
+This module handles automatic device discovery on the local network. It uses mDNS (Multicast DNS) and optionally
+probes the local subnet for devices listening on the StormAudio TCP port. Every candidate is confirmed by reading
+the brand and model from its initial data burst.
 
 :license: Mozilla Public License Version 2.0, see LICENSE for more details.
 """
 
+import asyncio
+import ipaddress
+import json
 import logging
+import os
 import socket
-from typing import Any
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, AsyncIterator
 
 from ucapi_framework import DiscoveredDevice
 from ucapi_framework.discovery import MDNSDiscovery
 
 from uc_intg_stormaudio.const import Loggers
+from uc_intg_stormaudio.persistence import PersistenceWorker
+from uc_intg_stormaudio.stormaudio import StormAudioClient
 
 _LOG = logging.getLogger(Loggers.SETUP_FLOW)
 
+_DEFAULT_PORT = 23
+# Time to wait for further devices after the first one has been confirmed
+_GRACE_PERIOD = 1.0
+_PROBE_CONNECT_TIME_OUT = 0.5
+_CACHE_FILE_NAME = "discovery_cache.json"
+# Time after which a device that hasn't been seen again is dropped from the cache
+_CACHE_TTL = 7 * 24 * 60 * 60
+# Time after which a refreshed expiry is persisted, even if the addresses of the device haven't changed
+_CACHE_REFRESH_INTERVAL = 24 * 60 * 60
+# Maximum number of previous addresses kept per device, to find manually configured devices after a DHCP change
+_MAX_PREVIOUS_ADDRESSES = 8
+_RESOLVE_TIME_OUT_MS = 1500
+
+
+@dataclass
+class CachedDevice:
+    """A device that has been advertised via mDNS."""
+
+    name: str
+    """Friendly name of the device."""
+
+    addresses: list[str]
+    """The addresses the device has been advertised with most recently."""
+
+    expires_at: float
+    """Unix timestamp after which the entry is considered stale."""
+
+    previous_addresses: list[str] = field(default_factory=list)
+    """The addresses the device has been advertised with before (bounded), the most recent one first."""
+
+
+class StormAudioDiscoveryCache:
+    """
+    Persistent cache of the devices advertised via mDNS.
+
+    A background mDNS browser keeps the cache up to date, e.g. when an ISP's DHCP address changes. The cache is
+    persisted in the configuration directory, so it is instantly available after a restart.
+    """
+
+    def __init__(
+        self,
+        service_type: str,
+        persistence: PersistenceWorker,
+        ttl: float = _CACHE_TTL,
+    ):
+        """
+        Initialize the cache.
+
+        :param service_type: mDNS service type of the StormAudio devices
+        :param persistence: The worker persisting the cache in the background
+        :param ttl: Time in seconds after which a device that hasn't been seen again is dropped
+        """
+        self.service_type = service_type
+        self.ttl = ttl
+        self._persistence = persistence
+        self._devices: dict[str, CachedDevice] = {}
+        self._path: str | None = None
+        self._aiozc: Any = None
+        self._browser: Any = None
+        self._tasks: set[asyncio.Task] = set()
+
+    def load(self, config_dir: str) -> None:
+        """Load the persisted cache from the configuration directory."""
+        self._path = os.path.join(config_dir, _CACHE_FILE_NAME)
+        self._load()
+
+    async def start(self) -> None:
+        """
+        Start the background browser, which keeps the cache up to date.
+
+        The browser isn't needed to connect to the configured devices (the loaded cache is sufficient for that), so
+        it can be started once the driver is up and running.
+        """
+        try:
+            from zeroconf import (  # pylint: disable=import-outside-toplevel
+                ServiceStateChange,
+            )
+            from zeroconf.asyncio import (  # pylint: disable=import-outside-toplevel
+                AsyncServiceBrowser,
+                AsyncZeroconf,
+            )
+        except ImportError as err:
+            _LOG.error("mDNS discovery cache is unavailable: %s", err)
+            return
+
+        def on_service_state_change(
+            zeroconf: Any,  # pylint: disable=unused-argument
+            service_type: str,
+            name: str,
+            state_change: ServiceStateChange,
+        ) -> None:
+            if state_change in (ServiceStateChange.Added, ServiceStateChange.Updated):
+                task = asyncio.create_task(self._resolve(service_type, name))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+        self._aiozc = AsyncZeroconf()
+        self._browser = AsyncServiceBrowser(
+            self._aiozc.zeroconf,
+            self.service_type,
+            handlers=[on_service_state_change],
+        )
+
+    @property
+    def zeroconf(self) -> Any:
+        """The `AsyncZeroconf` instance of the background browser, or `None` if the browser isn't running."""
+        return self._aiozc
+
+    async def stop(self) -> None:
+        """Stop the background browser."""
+        for task in self._tasks:
+            task.cancel()
+        if self._browser:
+            await self._browser.async_cancel()
+            self._browser = None
+        if self._aiozc:
+            await self._aiozc.async_close()
+            self._aiozc = None
+
+    def devices(self) -> list[DiscoveredDevice]:
+        """Return all cached devices, which haven't expired yet."""
+        self._expire()
+
+        return [
+            DiscoveredDevice(
+                identifier=identifier,
+                name=device.name,
+                address=device.addresses[0],
+                extra_data={"addresses": device.addresses},
+            )
+            for identifier, device in self._devices.items()
+        ]
+
+    def put(self, device: DiscoveredDevice) -> None:
+        """
+        Add or refresh a device advertised via mDNS.
+
+        The addresses it has been advertised with before are kept, so a manually configured device is still found by
+        its configured address after a DHCP change. The refreshed expiry is persisted at most once per
+        `_CACHE_REFRESH_INTERVAL`, unless the addresses have changed.
+        """
+        addresses = (device.extra_data or {}).get("addresses") or [device.address]
+        cached = CachedDevice(
+            name=device.name,
+            addresses=addresses,
+            expires_at=time.time() + self.ttl,
+        )
+        previous = self._devices.get(device.identifier)
+        if previous is not None:
+            cached.previous_addresses = [
+                address
+                for address in dict.fromkeys(
+                    previous.addresses + previous.previous_addresses
+                )
+                if address not in addresses
+            ][:_MAX_PREVIOUS_ADDRESSES]
+        self._devices[device.identifier] = cached
+
+        if previous is None or previous.addresses != cached.addresses:
+            _LOG.debug("Cached %s at %s", device.identifier, ", ".join(addresses))
+            self._save()
+        elif cached.expires_at - previous.expires_at >= _CACHE_REFRESH_INTERVAL:
+            self._save()
+        else:
+            # Keep the persisted expiry, so the next sighting is persisted once the interval has passed
+            cached.expires_at = previous.expires_at
+
+    async def lookup(self, identifier: str, address: str) -> list[str]:
+        """
+        Return the current addresses of a device.
+
+        The device is looked up by its identifier (the mDNS service name for discovered devices) or, for manually
+        configured devices, by the address it has been configured with, which might be a previous address of the
+        device. mDNS devices are actively re-resolved first.
+
+        :param identifier: The identifier of the device
+        :param address: The address the device has been configured with
+        :return: The most recently advertised addresses of the device, which might be empty
+        """
+        if self._aiozc and identifier.endswith(self.service_type):
+            await self._resolve(self.service_type, identifier)
+
+        return self.get(identifier, address)
+
+    def get(self, identifier: str, address: str) -> list[str]:
+        """Return the cached addresses of a device without re-resolving it, see `lookup`."""
+        self._expire()
+
+        if device := self._devices.get(identifier):
+            return device.addresses
+
+        for device in self._devices.values():
+            if address in device.addresses:
+                return device.addresses
+
+        for device in self._devices.values():
+            if address in device.previous_addresses:
+                return device.addresses
+
+        return []
+
+    async def _resolve(self, service_type: str, name: str) -> None:
+        try:
+            service_info = await self._aiozc.async_get_service_info(
+                service_type, name, _RESOLVE_TIME_OUT_MS
+            )
+        except Exception as err:  # pylint: disable=broad-exception-caught
+            _LOG.debug("Failed to resolve %s: %s", name, err)
+            return
+
+        if service_info and (device := _parse_service_info(service_info, service_type)):
+            self.put(device)
+
+    def _expire(self) -> None:
+        now = time.time()
+        expired = [
+            identifier
+            for identifier, device in self._devices.items()
+            if device.expires_at < now
+        ]
+        for identifier in expired:
+            del self._devices[identifier]
+
+        if expired:
+            self._save()
+
+    def _load(self) -> None:
+        try:
+            with open(self._path, encoding="utf-8") as file:
+                self._devices = {
+                    identifier: CachedDevice(**device)
+                    for identifier, device in json.load(file).items()
+                }
+        except FileNotFoundError:
+            return
+        except (OSError, TypeError, ValueError) as err:
+            _LOG.warning("Ignoring invalid discovery cache %s: %s", self._path, err)
+            return
+
+        self._expire()
+
+    def _save(self) -> None:
+        if self._path is None:
+            return
+
+        self._persistence.schedule(
+            self._path,
+            lambda: json.dumps(
+                {
+                    identifier: asdict(device)
+                    for identifier, device in self._devices.items()
+                }
+            ),
+        )
+
 
 class StormAudioDiscovery(MDNSDiscovery):
     """Discover devices on the local network."""
 
+    def __init__(
+        self,
+        service_type: str,
+        timeout: int = 5,
+        probe_subnet: bool = False,
+        probe_concurrency: int = 32,
+        cache: StormAudioDiscoveryCache | None = None,
+    ):
+        """
+        Initialize the discovery.
+
+        :param service_type: mDNS service type of the StormAudio devices
+        :param timeout: Discovery timeout in seconds
+        :param probe_subnet: Whether to probe the local subnet for devices, too
+        :param probe_concurrency: Maximum number of concurrent probes
+        :param cache: Optional cache of the devices advertised via mDNS
+        """
+        super().__init__(service_type, timeout)
+        self.probe_subnet = probe_subnet
+        self.probe_concurrency = probe_concurrency
+        self.cache = cache
+        self._refresh_task: asyncio.Task | None = None
+
+    async def discover(self) -> list[DiscoveredDevice]:
+        """
+        Perform the device discovery.
+
+        Returns shortly after the first device has been confirmed instead of waiting for the full timeout.
+        If there are cached devices, those are returned instantly. Unless the cache's background browser is already
+        keeping the cache up to date, a fresh discovery refreshes the cache in the background.
+        """
+        self._discovered_devices.clear()
+
+        if self.cache and (cached_devices := self.cache.devices()):
+            if self.cache.zeroconf is None and (
+                self._refresh_task is None or self._refresh_task.done()
+            ):
+                self._refresh_task = asyncio.create_task(self._refresh_cache())
+            self._discovered_devices.extend(cached_devices)
+        else:
+            async for device in self.discover_iter(grace_period=_GRACE_PERIOD):
+                self._discovered_devices.append(device)
+
+        _LOG.info(
+            "Discovery complete: found %d device(s)", len(self._discovered_devices)
+        )
+
+        return self._discovered_devices
+
+    async def discover_iter(
+        self, grace_period: float | None = None
+    ) -> AsyncIterator[DiscoveredDevice]:
+        """
+        Yield the confirmed devices as soon as they are found.
+
+        mDNS and the (optional) subnet probe run in parallel until the timeout is reached.
+
+        :param grace_period: If given, stop at most that many seconds after the first device has been confirmed
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        queue: asyncio.Queue[DiscoveredDevice] = asyncio.Queue()
+        confirmed_addresses: set[str] = set()
+
+        async def confirm(candidate: DiscoveredDevice, addresses: list[str]) -> None:
+            if not addresses:
+                return
+
+            client = StormAudioClient(addresses[0], _DEFAULT_PORT, addresses)
+            identity = await client.identify(connect_timeout=_PROBE_CONNECT_TIME_OUT)
+            if identity is None or not confirmed_addresses.isdisjoint(addresses):
+                return
+
+            confirmed_addresses.update(addresses)
+            if client.connected_address and ":" not in client.connected_address:
+                candidate.address = client.connected_address
+            candidate.extra_data = {**(candidate.extra_data or {}), **identity}
+            if self.cache and "addresses" in candidate.extra_data:
+                self.cache.put(candidate)
+            queue.put_nowait(candidate)
+
+        tasks = [asyncio.create_task(self._browse_mdns(confirm))]
+        if self.probe_subnet:
+            tasks.append(asyncio.create_task(self._probe_subnet(confirm)))
+
+        try:
+            while (remaining := deadline - loop.time()) > 0:
+                try:
+                    device = await asyncio.wait_for(queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+
+                _LOG.debug("Confirmed device: %s", device)
+                yield device
+
+                if grace_period is not None:
+                    deadline = min(deadline, loop.time() + grace_period)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _refresh_cache(self) -> None:
+        """Run a full discovery, which updates the cache with every confirmed mDNS device."""
+        async for device in self.discover_iter():
+            _LOG.debug("Refreshed cached device: %s", device.identifier)
+
+    async def _browse_mdns(self, confirm) -> None:
+        """
+        Browse for mDNS services and confirm every resolved service.
+
+        The zeroconf instance of the cache's background browser is shared if it is running, so its already resolved
+        services are answered from its record cache.
+        """
+        try:
+            from zeroconf import (  # pylint: disable=import-outside-toplevel
+                ServiceStateChange,
+            )
+            from zeroconf.asyncio import (  # pylint: disable=import-outside-toplevel
+                AsyncServiceBrowser,
+                AsyncZeroconf,
+            )
+        except ImportError as err:
+            _LOG.error("mDNS discovery is unavailable: %s", err)
+            return
+
+        shared_aiozc = self.cache.zeroconf if self.cache else None
+        aiozc = shared_aiozc or AsyncZeroconf()
+        tasks: set[asyncio.Task] = set()
+
+        async def resolve(type_: str, name: str) -> None:
+            try:
+                service_info = await aiozc.async_get_service_info(
+                    type_, name, _RESOLVE_TIME_OUT_MS
+                )
+                device = self.parse_mdns_service(service_info) if service_info else None
+                if device:
+                    await confirm(device, device.extra_data.get("addresses", []))
+            except Exception as err:  # pylint: disable=broad-exception-caught
+                _LOG.debug("Failed to resolve %s: %s", name, err)
+
+        def on_service_state_change(
+            zeroconf: Any,  # pylint: disable=unused-argument
+            service_type: str,
+            name: str,
+            state_change: ServiceStateChange,
+        ) -> None:
+            if state_change is ServiceStateChange.Added:
+                task = asyncio.create_task(resolve(service_type, name))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+        browser = AsyncServiceBrowser(
+            aiozc.zeroconf,
+            self.service_type,
+            handlers=[on_service_state_change],
+        )
+
+        try:
+            await asyncio.Future()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await browser.async_cancel()
+            if aiozc is not shared_aiozc:
+                await aiozc.async_close()
+
+    async def _probe_subnet(self, confirm) -> None:
+        """Probe all hosts of the local subnet with a bounded concurrency."""
+        subnet = _get_local_subnet()
+        if subnet is None:
+            _LOG.warning("Cannot determine the local subnet, skipping the probe")
+            return
+
+        _LOG.debug("Probing subnet %s", subnet)
+        semaphore = asyncio.Semaphore(self.probe_concurrency)
+
+        async def probe(address: str) -> None:
+            async with semaphore:
+                await confirm(
+                    DiscoveredDevice(
+                        identifier=address.replace(".", "_"),
+                        name=f"StormAudio ISP ({address})",
+                        address=address,
+                    ),
+                    [address],
+                )
+
+        await asyncio.gather(*(probe(str(host)) for host in subnet.hosts()))
+
     def parse_mdns_service(self, service_info: Any) -> DiscoveredDevice | None:
         """Parse mDNS service info."""
-        if not service_info.addresses:
-            return None
-
-        # Get first IPv4 address
-        address = socket.inet_ntoa(service_info.addresses[0])
-
-        # Extract name and properties
-        name = service_info.name.replace(f".{self.service_type}", "")
-        properties = {
-            k.decode(): v.decode() if isinstance(v, bytes) else v
-            for k, v in service_info.properties.items()
-        }
-
-        return DiscoveredDevice(
-            identifier=service_info.name,
-            name=name,
-            address=address,
-            extra_data=properties,
-        )
+        return _parse_service_info(service_info, self.service_type)
+
+
+def _parse_service_info(
+    service_info: Any, service_type: str
+) -> DiscoveredDevice | None:
+    """
+    Parse mDNS service info, keeping all addresses in the extra data.
+
+    The IPv4 addresses come first, as those are the ones to show to the user.
+    """
+    addresses = sorted(
+        service_info.parsed_scoped_addresses(), key=lambda address: ":" in address
+    )
+    if not addresses:
+        return None
+
+    # Extract name and properties
+    name = service_info.name.replace(f".{service_type}", "")
+    properties = {
+        k.decode(): v.decode() if isinstance(v, bytes) else v
+        for k, v in service_info.properties.items()
+    }
+
+    return DiscoveredDevice(
+        identifier=service_info.name,
+        name=name,
+        address=addresses[0],
+        extra_data={**properties, "addresses": addresses},
+    )
+
+
+def _get_local_subnet() -> ipaddress.IPv4Network | None:
+    """Return the /24 subnet of the interface used for the default route."""
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            # This doesn't send any packets, it just selects the outgoing interface.
+            sock.connect(("10.255.255.255", 1))
+            local_address = sock.getsockname()[0]
+    except OSError:
+        return None
+
+    if ipaddress.IPv4Address(local_address).is_loopback:
+        return None
+
+    return ipaddress.IPv4Network(f"{local_address}/24", strict=False)
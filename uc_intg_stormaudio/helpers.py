@@ -34,3 +34,21 @@ def fix_json(s: str) -> str:
     for i in reversed(to_escape):
         result.insert(i, "\\")
     return "".join(result)
+
+
+def get_response_prefix(command: str) -> str:
+    """
+    Return the prefix of the ISP's response to the given command.
+
+    The ISP acknowledges commands by reporting the resulting state of the addressed path,
+    e.g. `ssp.vol.up` and `ssp.vol.[-40.0]` are both answered with `ssp.vol.[<volume>]`.
+    """
+    path, separator, _value = command.partition(".[")
+    if separator:
+        return f"{path}."
+
+    segments = command.split(".")
+    if len(segments) <= 2:
+        return f"{command}."
+
+    return ".".join(segments[:-1]) + "."
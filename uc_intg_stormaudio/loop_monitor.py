@@ -0,0 +1,197 @@
+"""
+Event Loop Monitor Module.
+
+This module measures the scheduling delay (lag) of the event loop, which is shared by the socket reads, the parsing,
+the entity updates and everything else. It records the worst stalls and, in debug mode, the code running at the time
+as well as synchronous file and network calls made on the event loop.
+
+:license: Mozilla Public License Version 2.0, see LICENSE for more details.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+import traceback
+from types import FrameType
+
+from uc_intg_stormaudio.const import Loggers
+from uc_intg_stormaudio.metrics import LoopMetrics, LoopStall
+
+_LOG = logging.getLogger(Loggers.DRIVER)
+
+SAMPLE_INTERVAL = 0.1
+STALL_THRESHOLD = 0.05  # samples delayed by more than this are recorded as stalls
+MAX_WORST_STALLS = 10
+MAX_BLOCKING_CALLS = 64  # bounds the statistics of blocking calls, the remaining ones are counted as "other"
+
+# Audit events of calls, which block the calling thread (see https://docs.python.org/3/library/audit_events.html)
+_BLOCKING_AUDIT_EVENTS = frozenset(
+    {
+        "open",
+        "socket.connect",
+        "socket.getaddrinfo",
+        "socket.gethostbyaddr",
+        "socket.gethostbyname",
+        "time.sleep",
+    }
+)
+
+_PACKAGE_DIR = os.path.dirname(__file__)
+
+
+class LoopMonitor:
+    """
+    Monitor of the event loop's scheduling delay.
+
+    A sampler task sleeps for a fixed interval and measures how much later than intended it is woken up. In debug
+    mode, a watchdog thread notices a sample running late while the loop is still stalled, so it can capture the task
+    and the code location responsible for the stall. The watchdog wakes up frequently, so it isn't run otherwise.
+    """
+
+    def __init__(
+        self,
+        interval: float = SAMPLE_INTERVAL,
+        threshold: float = STALL_THRESHOLD,
+        debug: bool = False,
+    ):
+        """
+        Initialize the monitor.
+
+        :param interval: Interval in seconds between two samples
+        :param threshold: Scheduling delay in seconds above which a sample is recorded as a stall
+        :param debug: Whether to capture the code responsible for the stalls and to flag synchronous file and network
+            calls made on the event loop
+        """
+        self.metrics = LoopMetrics()
+        self._interval = interval
+        self._threshold = threshold
+        self._debug = debug
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread_id: int | None = None
+        self._due_at = 0.0
+        self._culprit: str | None = None
+        self._task: asyncio.Task | None = None
+        self._stopped = threading.Event()
+
+    def start(self) -> None:
+        """Start monitoring the running event loop."""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._due_at = time.monotonic() + self._interval
+        self._task = self._loop.create_task(self._sample())
+
+        if self._debug:
+            threading.Thread(
+                target=self._watch, name="loop-monitor", daemon=True
+            ).start()
+            # Audit hooks can't be removed again, the hook checks whether the monitor is still running instead
+            sys.addaudithook(self._audit)
+            _LOG.info(
+                "Flagging synchronous file and network calls made on the event loop"
+            )
+
+    def stop(self) -> None:
+        """Stop monitoring."""
+        self._stopped.set()
+        if self._task:
+            self._task.cancel()
+
+    async def _sample(self) -> None:
+        while True:
+            self._due_at = time.monotonic() + self._interval
+            await asyncio.sleep(self._interval)
+            self._record(max(0.0, time.monotonic() - self._due_at))
+
+    def _record(self, lag: float) -> None:
+        metrics = self.metrics
+        metrics.samples += 1
+        metrics.total_lag += lag
+        metrics.max_lag = max(metrics.max_lag, lag)
+
+        culprit, self._culprit = self._culprit, None
+        if lag <= self._threshold:
+            return
+
+        if culprit is None:
+            culprit = (
+                "unknown (the stall ended before it could be captured)"
+                if self._debug
+                else "unknown (the culprits are only captured in debug mode)"
+            )
+        metrics.stalls += 1
+        metrics.worst_stalls.append(LoopStall(lag=lag, culprit=culprit, at=time.time()))
+        metrics.worst_stalls.sort(key=lambda stall: stall.lag, reverse=True)
+        del metrics.worst_stalls[MAX_WORST_STALLS:]
+
+        _LOG.warning("Event loop stalled for %.0f ms by %s", lag * 1000, culprit)
+
+    def _watch(self) -> None:
+        """Capture the code running on the event loop, while a sample is overdue (runs in the watchdog thread)."""
+        while not self._stopped.wait(self._threshold / 2):
+            if (
+                self._culprit is None
+                and time.monotonic() - self._due_at > self._threshold
+            ):
+                self._culprit = self._capture()
+
+    def _capture(self) -> str:
+        frame = sys._current_frames().get(self._loop_thread_id)  # pylint: disable=protected-access
+        task = asyncio.current_task(self._loop)
+        location = _format_location(frame) if frame else "unknown location"
+
+        return (
+            f"{task.get_name()} at {location}" if task else f"a callback at {location}"
+        )
+
+    def _audit(self, event: str, args: tuple) -> None:
+        if (
+            event not in _BLOCKING_AUDIT_EVENTS
+            or threading.get_ident() != self._loop_thread_id
+            or self._stopped.is_set()
+        ):
+            return
+
+        # Sockets in non-blocking mode (i.e. those of asyncio) don't block the event loop
+        if (
+            event == "socket.connect"
+            and isinstance(args[0], socket.socket)
+            and not args[0].getblocking()
+        ):
+            return
+
+        caller = sys._getframe(1)  # pylint: disable=protected-access
+        # Lazy imports read their modules, but those are reported by `python -X importtime` in a more useful way
+        if caller.f_code.co_filename.startswith("<frozen importlib"):
+            return
+
+        call = f"{event} in {_format_location(caller)}"
+        blocking_calls = self.metrics.blocking_calls
+        if call not in blocking_calls and len(blocking_calls) >= MAX_BLOCKING_CALLS:
+            call = "other"
+        if call not in blocking_calls:
+            _LOG.warning("Blocking call on the event loop: %s", call)
+
+        blocking_calls[call] = blocking_calls.get(call, 0) + 1
+
+
+def _format_location(frame: FrameType) -> str:
+    """Return the innermost code location of the integration in the stack of the frame, or the frame's location."""
+    # The source lines aren't looked up, as reading the source files would be a blocking call itself
+    stack = traceback.StackSummary.extract(
+        traceback.walk_stack(frame), lookup_lines=False
+    )
+    location = next(
+        (
+            summary
+            for summary in stack
+            if summary.filename.startswith(_PACKAGE_DIR)
+            and summary.filename != __file__
+        ),
+        stack[0],
+    )
+
+    return f"{os.path.basename(location.filename)}:{location.lineno} ({location.name})"
@@ -12,7 +12,7 @@ from typing import Any, Callable
 from ucapi import EntityTypes, MediaPlayer, StatusCodes, media_player
 from ucapi.media_player import Attributes as MediaAttr
 from ucapi.media_player import DeviceClasses, States
-from ucapi_framework import Entity, create_entity_id
+from ucapi_framework import create_entity_id
 
 from uc_intg_stormaudio.config import StormAudioConfig
 from uc_intg_stormaudio.const import (
@@ -21,8 +21,9 @@ from uc_intg_stormaudio.const import (
     SimpleCommands,
     StormAudioStates,
 )
-from uc_intg_stormaudio.device import StormAudioDevice
+from uc_intg_stormaudio.device import DeviceOfflineError, StormAudioDevice
 from uc_intg_stormaudio.simple_commands import get_simple_command_map
+from uc_intg_stormaudio.tracing import TracedEntity, traced_command
 
 _LOG = logging.getLogger(Loggers.MEDIA_PLAYER)
 
@@ -41,7 +42,7 @@ FEATURES = [
 ]
 
 
-class StormAudioMediaPlayer(MediaPlayer, Entity):
+class StormAudioMediaPlayer(MediaPlayer, TracedEntity):
     """
     Media Player entity for your device.
 
@@ -96,6 +97,7 @@ class StormAudioMediaPlayer(MediaPlayer, Entity):
 
         self.subscribe_to_device(device)
 
+    @traced_command
     async def handle_command(
         self,
         entity: MediaPlayer,
@@ -145,6 +147,10 @@ class StormAudioMediaPlayer(MediaPlayer, Entity):
 
             return StatusCodes.OK
 
+        except DeviceOfflineError as ex:
+            _LOG.warning("Cannot execute command %s: %s", cmd_id, ex)
+            return StatusCodes.SERVICE_UNAVAILABLE
+
         except Exception as ex:  # pylint: disable=broad-exception-caught
             _LOG.error("Error executing command %s: %s", cmd_id, ex)
             return StatusCodes.BAD_REQUEST
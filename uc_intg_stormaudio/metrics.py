@@ -0,0 +1,127 @@
+"""
+Metrics for the Integration.
+
+This module contains the runtime metrics dataclass
+
+:license: Mozilla Public License Version 2.0, see LICENSE for more details.
+"""
+
+from dataclasses import dataclass, field
+
+
+@dataclass
+class StormAudioMetrics:
+    """
+    Metrics dataclass.
+
+    This dataclass holds the runtime metrics of the integration for a single StormAudio ISP.
+    """
+
+    elided_commands: int = 0
+    """Number of commands (and thus round-trips) saved, as the device already was in the target state."""
+
+    address_failovers: int = 0
+    """Number of times the device has been reconnected at a new address taken from the discovery cache."""
+
+    ack_rtt: float | None = None
+    """Moving average in seconds of the time between writing a command and receiving its acknowledgement."""
+
+    connect_rtt: float | None = None
+    """Duration in seconds of the most recent connection establishment, i.e. the RTT of the winning address."""
+
+    burst_duration: float | None = None
+    """Duration in seconds of the most recent initial state dump."""
+
+    burst_lines: int = 0
+    """Number of lines of the most recent initial state dump."""
+
+    line_cache_hits: int = 0
+    """Number of state lines skipped, as they were identical to the last line seen for the same state path."""
+
+    line_cache_misses: int = 0
+    """Number of state lines handled, as they differed from the last line seen for the same state path."""
+
+    ignored_lines: int = 0
+    """Number of lines rejected right away, as the driver doesn't process their paths."""
+
+    unhandled_prefixes: dict[str, int] = field(default_factory=dict)
+    """Number of unhandled messages per prefix (bounded, the remaining ones are counted as `other`)."""
+
+    suppressed_updates: int = 0
+    """Number of sensor updates held back by the update rate limit, i.e. coalesced into a trailing update."""
+
+    @property
+    def line_cache_hit_rate(self) -> float:
+        """Return the share of the handled state lines, which have been skipped."""
+        total = self.line_cache_hits + self.line_cache_misses
+        return self.line_cache_hits / total if total else 0.0
+
+
+@dataclass
+class PersistenceMetrics:
+    """
+    Persistence metrics dataclass.
+
+    This dataclass holds the runtime metrics of the background persistence worker, which is shared by all devices.
+    """
+
+    writes: int = 0
+    """Number of files written."""
+
+    coalesced_writes: int = 0
+    """Number of writes saved, as the file has been scheduled again before it was written."""
+
+    failed_writes: int = 0
+    """Number of files which couldn't be serialized or written."""
+
+    max_write_duration: float = 0.0
+    """Longest duration in seconds of writing a file, i.e. how long the event loop would have stalled otherwise."""
+
+    max_loop_stall: float = 0.0
+    """Longest duration in seconds the event loop has been blocked by persisting, i.e. by rendering a file."""
+
+
+@dataclass
+class LoopStall:
+    """A stall of the event loop, i.e. a sample which has been scheduled considerably later than intended."""
+
+    lag: float
+    """Scheduling delay in seconds of the sample."""
+
+    culprit: str
+    """The task and code location, which were running on the event loop while it stalled (if caught in time)."""
+
+    at: float
+    """Unix timestamp of the stall."""
+
+
+@dataclass
+class LoopMetrics:
+    """
+    Event loop metrics dataclass.
+
+    This dataclass holds the scheduling delays (lag) of the event loop, which is shared by all devices.
+    """
+
+    samples: int = 0
+    """Number of lag samples taken."""
+
+    total_lag: float = 0.0
+    """Sum of the scheduling delays in seconds of all samples."""
+
+    max_lag: float = 0.0
+    """Longest scheduling delay in seconds of any sample."""
+
+    stalls: int = 0
+    """Number of samples exceeding the stall threshold."""
+
+    worst_stalls: list[LoopStall] = field(default_factory=list)
+    """The longest stalls (bounded), the longest one first."""
+
+    blocking_calls: dict[str, int] = field(default_factory=dict)
+    """Number of synchronous file and network calls made on the event loop per call and caller (debug mode only)."""
+
+    @property
+    def mean_lag(self) -> float:
+        """Return the mean scheduling delay in seconds."""
+        return self.total_lag / self.samples if self.samples else 0.0
@@ -0,0 +1,194 @@
+"""
+Persistence Module.
+
+This module writes the integration's files (configuration, discovery cache) in the background, so the event loop
+reading the ISP's messages never waits for the (slow) flash storage of the Remote.
+
+:license: Mozilla Public License Version 2.0, see LICENSE for more details.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable
+
+from ucapi_framework import BaseConfigManager
+from ucapi_framework.config import _EnhancedJSONEncoder
+
+from uc_intg_stormaudio.config import StormAudioConfig
+from uc_intg_stormaudio.const import Loggers
+from uc_intg_stormaudio.metrics import PersistenceMetrics
+
+_LOG = logging.getLogger(Loggers.DRIVER)
+
+
+class PersistenceWorker:
+    """
+    Background worker, which persists files one after another.
+
+    Repeated writes to the same file are coalesced: a file is only rendered (serialized) right before it is written,
+    so all writes scheduled in the meantime result in a single write of the latest content. The files are written
+    atomically (temporary file and rename) in a thread, so only the rendering happens on the event loop.
+    """
+
+    def __init__(self):
+        """Initialize the worker."""
+        self.metrics = PersistenceMetrics()
+        self._pending: dict[str, Callable[[], str]] = {}
+        self._failed: set[str] = set()
+        self._writing: str | None = None
+        self._task: asyncio.Task | None = None
+
+    def schedule(self, path: str, render: Callable[[], str]) -> None:
+        """
+        Schedule a file to be written.
+
+        :param path: Path of the file
+        :param render: Callable returning the content of the file, called right before the file is written
+        """
+        if path in self._pending:
+            self.metrics.coalesced_writes += 1
+        self._pending[path] = render
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Without a running event loop, there is nothing to be stalled, so the file is written right away
+            self._write_pending_sync()
+            return
+
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._run())
+
+    async def flush(self) -> None:
+        """Wait until all scheduled files have been written, e.g. before the driver exits."""
+        if self._task is not None:
+            await asyncio.shield(self._task)
+
+    def write_now(self, path: str, render: Callable[[], str]) -> bool:
+        """
+        Write a file right away and return whether it has been written.
+
+        This blocks the event loop, so it is only meant for rare writes whose result must be reported (e.g. a
+        restored backup). A scheduled write of the file is superseded.
+        """
+        self._pending.pop(path, None)
+        if self._writing == path:
+            # The worker is writing an older content of the file, which must not be the last one written
+            self._pending[path] = render
+
+        data = self._render(path, render)
+        return data is not None and self._write(path, data)
+
+    def has_failed(self, path: str) -> bool:
+        """Return whether the most recent write of the file has failed."""
+        return path in self._failed
+
+    async def _run(self) -> None:
+        while next_write := self._next_write():
+            self._writing = next_write[0]
+            try:
+                await asyncio.to_thread(self._write, *next_write)
+            finally:
+                self._writing = None
+
+    def _write_pending_sync(self) -> None:
+        while next_write := self._next_write():
+            self._write(*next_write)
+
+    def _next_write(self) -> tuple[str, str] | None:
+        """Return the next file to write and its content, rendered on the event loop."""
+        while self._pending:
+            path = next(iter(self._pending))
+            if (data := self._render(path, self._pending.pop(path))) is not None:
+                return path, data
+
+        return None
+
+    def _render(self, path: str, render: Callable[[], str]) -> str | None:
+        started_at = time.perf_counter()
+        try:
+            data = render()
+        except (TypeError, ValueError) as err:
+            self.metrics.failed_writes += 1
+            self._failed.add(path)
+            _LOG.error("Cannot serialize %s: %s", path, err)
+            return None
+
+        self.metrics.max_loop_stall = max(
+            self.metrics.max_loop_stall, time.perf_counter() - started_at
+        )
+        return data
+
+    def _write(self, path: str, data: str) -> bool:
+        """Write a file atomically, i.e. via a temporary file, so it is never left half-written."""
+        started_at = time.perf_counter()
+        # Each thread has its own temporary file, as `write_now` might write the file while the worker does
+        temporary_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(temporary_path, "w", encoding="utf-8") as file:
+                file.write(data)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temporary_path, path)
+        except OSError as err:
+            self.metrics.failed_writes += 1
+            self._failed.add(path)
+            _LOG.error("Cannot write %s: %s", path, err)
+            try:
+                os.remove(temporary_path)
+            except OSError:
+                pass
+            return False
+
+        self._failed.discard(path)
+        duration = time.perf_counter() - started_at
+        self.metrics.writes += 1
+        self.metrics.max_write_duration = max(self.metrics.max_write_duration, duration)
+        _LOG.debug("Wrote %s in %.1f ms", path, duration * 1000)
+        return True
+
+
+class StormAudioConfigManager(BaseConfigManager[StormAudioConfig]):
+    """Configuration manager, which persists the configuration via the background persistence worker."""
+
+    def __init__(self, *args, persistence: PersistenceWorker, **kwargs):
+        """Initialize the configuration manager, see `BaseConfigManager`."""
+        self._persistence = persistence
+        self._write_through = False
+        super().__init__(*args, **kwargs)
+
+    def store(self) -> bool:
+        """
+        Store the configuration file, it is written atomically in the background.
+
+        As the write is deferred, a failure (e.g. as the storage is full or read-only) is only logged by the worker.
+        It is reported by the next call, which then writes the configuration right away and returns the actual
+        result. Restored backups are always written right away, see `restore_from_backup_json`.
+
+        :return: True if the configuration has been saved or scheduled to be saved, False if it couldn't be saved
+        """
+        if self._write_through or self._persistence.has_failed(self._cfg_file_path):
+            if not self._write_through:
+                _LOG.warning(
+                    "The previous write of the configuration has failed, writing it again right away"
+                )
+            return self._persistence.write_now(self._cfg_file_path, self._render)
+
+        self._persistence.schedule(self._cfg_file_path, self._render)
+        return True
+
+    def restore_from_backup_json(self, backup_json: str) -> bool:
+        """Restore the configuration from a backup, which is written right away, so the result can be reported."""
+        self._write_through = True
+        try:
+            return super().restore_from_backup_json(backup_json)
+        finally:
+            self._write_through = False
+
+    def _render(self) -> str:
+        return json.dumps(self._config, ensure_ascii=False, cls=_EnhancedJSONEncoder)
@@ -0,0 +1,182 @@
+"""
+Sampling Profiler Module.
+
+This module profiles the running driver on demand, e.g. when an installation feels sluggish and no profiler can be
+attached to the driver inside the Remote. It periodically samples the stack of the event loop's thread and writes the
+samples as collapsed stacks (the input format of flame graph tools) to the configuration directory.
+
+:license: Mozilla Public License Version 2.0, see LICENSE for more details.
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from types import FrameType
+
+from uc_intg_stormaudio.const import Loggers
+from uc_intg_stormaudio.persistence import PersistenceWorker
+
+_LOG = logging.getLogger(Loggers.DRIVER)
+
+SAMPLE_INTERVAL = 0.01
+DEFAULT_DURATION = 30.0
+MAX_DURATION = 600.0
+
+# Tags of the samples, i.e. the root frames of the collapsed stacks
+TAG_MESSAGE_HANDLER = "message_handler"
+TAG_SYNC_STATE = "sync_state"
+TAG_CLIENT_IO = "client_io"
+TAG_IDLE = "idle"
+TAG_OTHER = "other"
+
+_MESSAGE_HANDLERS = frozenset({"_process_message", "_apply_batch", "apply_lines"})
+# Innermost frames of an idle event loop: the selector of asyncio, or the runner for event loops implemented in C
+_IDLE_FRAMES = frozenset({("selectors.py", "select"), ("runners.py", "run")})
+_CLIENT_FILE_NAME = "stormaudio.py"
+
+_profiler: "SamplingProfiler | None" = None  # pylint: disable=invalid-name
+
+
+class SamplingProfiler:
+    """
+    Sampling profiler of the event loop's thread.
+
+    A thread takes the samples, so the profiled code isn't instrumented and the overhead is limited to reading the
+    stack once per sample interval. Every sample is tagged with the innermost activity found on the stack: the
+    message handler of the devices, the `sync_state` of the entities, the I/O of the `StormAudioClient`, or idle
+    (waiting for I/O).
+    """
+
+    def __init__(
+        self,
+        output_dir: str,
+        persistence: PersistenceWorker,
+        interval: float = SAMPLE_INTERVAL,
+    ):
+        """
+        Initialize the profiler.
+
+        :param output_dir: Directory the profiles are written to
+        :param persistence: Worker writing the profiles
+        :param interval: Interval in seconds between two samples
+        """
+        self._output_dir = output_dir
+        self._persistence = persistence
+        self._interval = interval
+        self._task: asyncio.Task | None = None
+
+    @property
+    def running(self) -> bool:
+        """Whether a profile is being taken."""
+        return self._task is not None and not self._task.done()
+
+    def start(self, duration: float = DEFAULT_DURATION) -> bool:
+        """
+        Start profiling the event loop's thread for the given duration, unless a profile is already being taken.
+
+        Must be called on the event loop.
+        """
+        if self.running:
+            _LOG.warning("Not profiling, as a profile is already being taken")
+            return False
+
+        duration = min(max(duration, self._interval), MAX_DURATION)
+        self._task = asyncio.get_running_loop().create_task(
+            self._profile(threading.get_ident(), duration)
+        )
+        return True
+
+    async def _profile(self, thread_id: int, duration: float) -> None:
+        _LOG.info("Profiling the driver for %.0f s", duration)
+        stacks = await asyncio.to_thread(self._sample, thread_id, duration)
+
+        samples = sum(stacks.values())
+        if not samples:
+            return
+
+        tags = Counter()
+        for stack, count in stacks.items():
+            tags[stack.split(";", 1)[0]] += count
+        _LOG.info(
+            "Profile of %d samples: %s",
+            samples,
+            ", ".join(
+                f"{tag} {count / samples:.0%}" for tag, count in tags.most_common()
+            ),
+        )
+
+        path = os.path.join(
+            self._output_dir, f"profile_{time.strftime('%Y%m%d-%H%M%S')}.collapsed"
+        )
+        self._persistence.schedule(
+            path,
+            lambda: "".join(
+                f"{stack} {count}\n" for stack, count in sorted(stacks.items())
+            ),
+        )
+        _LOG.info("Writing the profile to %s", path)
+
+    def _sample(self, thread_id: int, duration: float) -> Counter:
+        """Sample the stack of the given thread (runs in a worker thread)."""
+        stacks = Counter()
+        ends_at = time.monotonic() + duration
+
+        while time.monotonic() < ends_at:
+            frame = sys._current_frames().get(thread_id)  # pylint: disable=protected-access
+            if frame:
+                stacks[_collapse(frame)] += 1
+            # Release the reference to the frames right away, so the profiled code can free their locals
+            frame = None
+            time.sleep(self._interval)
+
+        return stacks
+
+
+def _collapse(frame: FrameType) -> str:
+    """Return the stack of the frame as a single line, from its tag (root) to the innermost frame."""
+    names = []
+    tag = None
+    while frame:
+        code = frame.f_code
+        file_name = os.path.basename(code.co_filename)
+        names.append(f"{file_name}:{code.co_qualname}")
+        if tag is None:
+            tag = _tag(file_name, code.co_name, innermost=len(names) == 1)
+        frame = frame.f_back
+
+    names.append(tag or TAG_OTHER)
+    return ";".join(reversed(names))
+
+
+def _tag(file_name: str, function: str, innermost: bool) -> str | None:
+    """Return the tag of a frame, or `None` if the frame itself doesn't tell what the thread is busy with."""
+    if innermost and (file_name, function) in _IDLE_FRAMES:
+        return TAG_IDLE
+    if function in _MESSAGE_HANDLERS:
+        return TAG_MESSAGE_HANDLER
+    if function == "sync_state":
+        return TAG_SYNC_STATE
+    if file_name == _CLIENT_FILE_NAME:
+        return TAG_CLIENT_IO
+
+    return None
+
+
+def configure(output_dir: str, persistence: PersistenceWorker) -> SamplingProfiler:
+    """Create the profiler of the driver, which can then be started via `start_profiling`."""
+    global _profiler  # pylint: disable=global-statement
+    _profiler = SamplingProfiler(output_dir, persistence)
+    return _profiler
+
+
+def start_profiling(duration: float = DEFAULT_DURATION) -> bool:
+    """Start profiling the driver for the given duration in seconds, returns whether the profile was started."""
+    if _profiler is None:
+        _LOG.warning("Not profiling, as the profiler hasn't been configured")
+        return False
+
+    return _profiler.start(duration)
@@ -8,12 +8,13 @@ Remote Entity.
 
 import asyncio
 import logging
+import time
 from typing import Any
 
 from ucapi import EntityTypes, Remote, StatusCodes, remote
 from ucapi.remote import Attributes as RemoteAttr
 from ucapi.remote import States
-from ucapi_framework import Entity, create_entity_id
+from ucapi_framework import create_entity_id
 
 from uc_intg_stormaudio.config import StormAudioConfig
 from uc_intg_stormaudio.const import (
@@ -22,8 +23,11 @@ from uc_intg_stormaudio.const import (
     SimpleCommands,
     StormAudioStates,
 )
-from uc_intg_stormaudio.device import StormAudioDevice
+from uc_intg_stormaudio.device import DeviceOfflineError, StormAudioDevice
+from uc_intg_stormaudio.diagnostics import write_diagnostics
+from uc_intg_stormaudio.profiler import start_profiling
 from uc_intg_stormaudio.simple_commands import get_simple_command_map
+from uc_intg_stormaudio.tracing import TracedEntity, traced_command
 
 _LOG = logging.getLogger(Loggers.REMOTE)
 
@@ -34,11 +38,18 @@ FEATURES = [
 ]
 
 _PRESET_CMD_PREFIX = "PRESET_"
+_DEFAULT_SPACING = (
+    100  # ms between raw commands, which don't wait for an acknowledgement
+)
+_DIAGNOSTICS_CMD = "DIAGNOSTICS"
+_PROFILE_CMD_PREFIX = "PROFILE_"
+_SAVE_SCENE_CMD_PREFIX = "SAVE_SCENE_"
+_SCENE_CMD_PREFIX = "SCENE_"
 _SOURCE_CMD_PREFIX = "SOURCE_"
 _VOLUME_CMD_PREFIX = "VOLUME_"
 
 
-class StormAudioRemote(Remote, Entity):
+class StormAudioRemote(Remote, TracedEntity):
     """
     Remote entity for your device.
 
@@ -73,6 +84,7 @@ class StormAudioRemote(Remote, Entity):
 
         self.subscribe_to_device(device)
 
+    @traced_command
     async def handle_command(
         self,
         entity: Remote,
@@ -106,7 +118,7 @@ class StormAudioRemote(Remote, Entity):
                     if params:
                         command = params.get("command", None)
                         repeat = params.get("repeat", 1)
-                        delay = params.get("delay", 100)
+                        delay = params.get("delay")
                         await self._handle_send_cmd(command, repeat, delay)
                     else:
                         raise ValueError(
@@ -117,10 +129,18 @@ class StormAudioRemote(Remote, Entity):
                     if params:
                         command_list = params.get("sequence") if params else None
                         repeat = params.get("repeat", 1)
-                        delay = params.get("delay", 100)
+                        delay = params.get("delay")
+                        started_at = time.monotonic()
 
                         for command in command_list:
                             await self._handle_send_cmd(command, repeat, delay)
+
+                        _LOG.info(
+                            "[%s] Sent sequence of %d command(s) in %.0f ms",
+                            entity.id,
+                            len(command_list) * repeat,
+                            (time.monotonic() - started_at) * 1000,
+                        )
                     else:
                         raise ValueError(
                             "Cannot process command without any given parameters."
@@ -133,12 +153,28 @@ class StormAudioRemote(Remote, Entity):
 
             return StatusCodes.OK
 
+        except DeviceOfflineError as ex:
+            _LOG.warning("Cannot execute command %s: %s", cmd_id, ex)
+            return StatusCodes.SERVICE_UNAVAILABLE
+
         except Exception as ex:  # pylint: disable=broad-exception-caught
             _LOG.error("Error executing command %s: %s", cmd_id, ex)
             return StatusCodes.BAD_REQUEST
 
-    async def _handle_send_cmd(self, command: str, repeat: int, delay: int) -> None:
+    async def _handle_send_cmd(  # pylint: disable=too-many-branches
+        self, command: str, repeat: int, delay: int | None
+    ) -> None:
+        """
+        Send the given command `repeat` times.
+
+        Each command waits for the ISP's acknowledgement before the next one is sent. Raw commands, which the ISP
+        doesn't acknowledge, are spaced by `_DEFAULT_SPACING` instead.
+        If a delay (in ms) is given explicitly, it is used as the minimum spacing between commands.
+        """
         for _ in range(repeat):
+            started_at = time.monotonic()
+            spacing = delay
+
             if command in self._command_map:
                 await self._command_map[command]()
             elif isinstance(command, str) and command.startswith(_PRESET_CMD_PREFIX):
@@ -150,11 +186,28 @@ class StormAudioRemote(Remote, Entity):
             elif isinstance(command, str) and command.startswith(_VOLUME_CMD_PREFIX):
                 volume = int(command[len(_VOLUME_CMD_PREFIX) :])  # noqa: E203
                 await self._device.volume_x(volume)
+            elif isinstance(command, str) and command.startswith(_SCENE_CMD_PREFIX):
+                scene_name = command[len(_SCENE_CMD_PREFIX) :]  # noqa: E203
+                await self._device.scene_x(scene_name)
+            elif isinstance(command, str) and command.startswith(
+                _SAVE_SCENE_CMD_PREFIX
+            ):
+                scene_name = command[len(_SAVE_SCENE_CMD_PREFIX) :]  # noqa: E203
+                self._device.save_scene(scene_name)
+            elif command == _DIAGNOSTICS_CMD:
+                write_diagnostics()
+            elif isinstance(command, str) and command.startswith(_PROFILE_CMD_PREFIX):
+                duration = float(command[len(_PROFILE_CMD_PREFIX) :])  # noqa: E203
+                start_profiling(duration)
             else:
-                await self._device.custom_command(command)
-
-            if delay > 0:
-                await asyncio.sleep(delay / 1000)
+                acknowledged = await self._device.custom_command(command)
+                if spacing is None and not acknowledged:
+                    spacing = _DEFAULT_SPACING
+
+            if spacing:
+                remaining_delay = spacing / 1000 - (time.monotonic() - started_at)
+                if remaining_delay > 0:
+                    await asyncio.sleep(remaining_delay)
 
     def map_entity_states(self, device_state: StormAudioStates) -> States:
         """Convert a device-specific state to a UC API entity state."""
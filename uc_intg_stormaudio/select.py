@@ -11,7 +11,7 @@ from ucapi import EntityTypes, Select, StatusCodes
 from ucapi.select import Attributes as SelectAttr
 from ucapi.select import Commands as SelectCommands
 from ucapi.select import States
-from ucapi_framework import Entity, create_entity_id
+from ucapi_framework import create_entity_id
 
 from uc_intg_stormaudio.const import (
     SELECT_STATE_MAPPING,
@@ -19,7 +19,8 @@ from uc_intg_stormaudio.const import (
     SelectType,
     StormAudioStates,
 )
-from uc_intg_stormaudio.device import StormAudioDevice
+from uc_intg_stormaudio.device import DeviceOfflineError, StormAudioDevice
+from uc_intg_stormaudio.tracing import TracedEntity, traced_command
 
 _LOG = logging.getLogger(Loggers.SELECT)
 
@@ -31,7 +32,7 @@ _selects = {
 }
 
 
-class StormAudioSelect(Select, Entity):
+class StormAudioSelect(Select, TracedEntity):
     """Select for the StormAudio ISPs."""
 
     def __init__(
@@ -85,6 +86,7 @@ class StormAudioSelect(Select, Entity):
                 raise ValueError(f"Unsupported select type: {select_type}")
         return select
 
+    @traced_command
     async def handle_command(
         self,
         entity: Select,
@@ -100,18 +102,23 @@ class StormAudioSelect(Select, Entity):
             params if params else "",
         )
 
-        match self._select_type:
-            case SelectType.AURO_PRESET:
-                return await self._handle_auro_preset_command(cmd_id, params)
+        try:
+            match self._select_type:
+                case SelectType.AURO_PRESET:
+                    return await self._handle_auro_preset_command(cmd_id, params)
 
-            case SelectType.AURO_STRENGTH:
-                return await self._handle_auro_strength_command(cmd_id, params)
+                case SelectType.AURO_STRENGTH:
+                    return await self._handle_auro_strength_command(cmd_id, params)
 
-            case SelectType.PRESET:
-                return await self._handle_preset_command(cmd_id, params)
+                case SelectType.PRESET:
+                    return await self._handle_preset_command(cmd_id, params)
 
-            case SelectType.SOUND_MODE:
-                return await self._handle_sound_mode_command(cmd_id, params)
+                case SelectType.SOUND_MODE:
+                    return await self._handle_sound_mode_command(cmd_id, params)
+
+        except DeviceOfflineError as ex:
+            _LOG.warning("Cannot execute command %s: %s", cmd_id, ex)
+            return StatusCodes.SERVICE_UNAVAILABLE
 
     async def _handle_auro_preset_command(
         self, cmd_id: str, params: dict[str, Any] | None
@@ -4,21 +4,28 @@ Sensor Entity.
 :license: Mozilla Public License Version 2.0, see LICENSE for more details.
 """
 
+import asyncio
 import logging
+import time
 from typing import Any, Callable
 
 from ucapi import EntityTypes, Sensor
 from ucapi.sensor import Attributes as SensorAttr
 from ucapi.sensor import DeviceClasses, Options, States
-from ucapi_framework import Entity, create_entity_id
+from ucapi_framework import create_entity_id
 
+from uc_intg_stormaudio.config import StormAudioConfig
 from uc_intg_stormaudio.const import (
+    SENSOR_MAX_UPDATE_RATES,
     SENSOR_STATE_MAPPING,
+    UNCAPPED_SENSOR_TYPES,
     Loggers,
     SensorType,
+    StatusType,
     StormAudioStates,
 )
 from uc_intg_stormaudio.device import StormAudioDevice
+from uc_intg_stormaudio.tracing import TracedEntity
 
 _LOG = logging.getLogger(Loggers.SENSOR)
 
@@ -53,11 +60,69 @@ _binary_sensors = {
     SensorType.STORM_XT: "StormXT",
 }
 
+_status_sensors = {
+    StatusType.AUDIO: (
+        "Audio",
+        [
+            SensorType.AUDIO_STREAM,
+            SensorType.VOLUME_DB,
+            SensorType.MUTE,
+            SensorType.LOUDNESS,
+        ],
+    ),
+    StatusType.VIDEO: (
+        "Video",
+        [SensorType.HDMI_1_VIDEO_STREAM, SensorType.HDMI_2_VIDEO_STREAM],
+    ),
+    StatusType.PROCESSING: (
+        "Processing",
+        [
+            SensorType.SOURCE,
+            SensorType.PRESET,
+            SensorType.UPMIXER_MODE,
+            SensorType.DOLBY_MODE,
+            SensorType.DOLBY_CENTER_SPREAD,
+            SensorType.DOLBY_VIRTUALIZER,
+            SensorType.AURO_PRESET,
+            SensorType.AURO_STRENGTH,
+            SensorType.STORM_XT,
+        ],
+    ),
+    StatusType.TONE: (
+        "Tone",
+        [
+            SensorType.BASS_DB,
+            SensorType.TREBLE_DB,
+            SensorType.BRIGHTNESS_DB,
+            SensorType.CENTER_ENHANCE_DB,
+            SensorType.SURROUND_ENHANCE_DB,
+            SensorType.LFE_ENHANCE_DB,
+        ],
+    ),
+}
+
+_sensor_labels = {
+    **_simple_custom_sensors,
+    **_decibel_based_custom_sensors,
+    **_binary_sensors,
+}
+
+
+def get_sensor_types(device_config: StormAudioConfig) -> list[SensorType | StatusType]:
+    """Return the sensor types to create for the given device, i.e. only those of the chosen sensor groups."""
+    groups = [group for group in StatusType if group in device_config.sensor_groups]
+    if device_config.consolidated_status:
+        return groups
+
+    return [
+        sensor_type for group in groups for sensor_type in _status_sensors[group][1]
+    ]
+
 
-class StormAudioSensor(Sensor, Entity):  # pylint: disable=too-few-public-methods
+class StormAudioSensor(Sensor, TracedEntity):  # pylint: disable=too-few-public-methods
     """Sensor for the StormAudio ISPs."""
 
-    def __init__(self, device: StormAudioDevice, sensor_type: SensorType):
+    def __init__(self, device: StormAudioDevice, sensor_type: SensorType | StatusType):
         """Initialize the sensor entity."""
         self._device = device
         self._sensor_type = sensor_type
@@ -85,6 +150,21 @@ class StormAudioSensor(Sensor, Entity):  # pylint: disable=too-few-public-method
             SensorType.VOLUME_DB: self._get_volume_sensor_attributes,
         }
 
+        max_update_rate = device.device_config.max_update_rates.get(
+            sensor_type, SENSOR_MAX_UPDATE_RATES.get(sensor_type, 0)
+        )
+        self._min_update_interval = 1 / max_update_rate if max_update_rate > 0 else 0
+        self._uncapped_sensor_types = [
+            member_type
+            for member_type in _status_sensors.get(sensor_type, ("", []))[1]
+            if member_type in UNCAPPED_SENSOR_TYPES
+        ]
+        self._last_update = 0.0
+        self._last_attributes: dict[str, Any] | None = None
+        self._last_uncapped_values: list[Any] | None = None
+        self._pending_attributes: dict[str, Any] | None = None
+        self._flush_handle: asyncio.TimerHandle | None = None
+
         sensor_config = self._get_sensor_config(sensor_type, device)
 
         _LOG.debug("Initializing sensor: %s", sensor_config["identifier"])
@@ -142,6 +222,15 @@ class StormAudioSensor(Sensor, Entity):  # pylint: disable=too-few-public-method
                     "attributes": self._device.get_device_attributes(sensor_entity_id),
                 }
 
+            case sensor_type if _status_sensors.get(sensor_type) is not None:
+                name, _sensor_types = _status_sensors[sensor_type]
+                sensor = {
+                    "identifier": sensor_entity_id,
+                    "name": f"{device.name} Status: {name}",
+                    "device_class": DeviceClasses.CUSTOM,
+                    "attributes": self._device.get_device_attributes(sensor_entity_id),
+                }
+
             case _:
                 raise ValueError(f"Unsupported sensor type: {sensor_type}")
         return sensor
@@ -151,13 +240,98 @@ class StormAudioSensor(Sensor, Entity):  # pylint: disable=too-few-public-method
         return SENSOR_STATE_MAPPING[device_state]
 
     async def sync_state(self) -> None:
-        """Update the sensor attributes."""
+        """
+        Update the sensor attributes.
+
+        If the sensor has a maximum update rate, updates within the minimum interval are held back and only the
+        latest of them is sent once the interval has passed. Changes of the uncapped values of a status sensor
+        (see `UNCAPPED_SENSOR_TYPES`) are sent right away.
+        """
         attributes = self._entity_attribute_map.get(self._sensor_type)
         if attributes is not None:
-            self.update(attributes())
+            attributes = attributes()
+        elif self._sensor_type in _status_sensors:
+            attributes = self._get_status_sensor_attributes()
         else:
             raise ValueError(f"Unsupported sensor type: {self._sensor_type}")
 
+        if not self._min_update_interval:
+            self.update(attributes)
+            return
+
+        if self._flush_handle is not None and self._flush_handle.cancelled():
+            # The device has cancelled the held back update, as its connection has been closed
+            self._flush_handle = None
+            self._pending_attributes = None
+
+        # Unchanged values are passed on right away, as they never reach the Remote anyway
+        delay = self._last_update + self._min_update_interval - time.monotonic()
+        if self._flush_handle is None and attributes == self._last_attributes:
+            self.update(attributes)
+            return
+
+        if self._flush_handle is None and delay <= 0:
+            self._send_rate_limited_update(attributes)
+            return
+
+        if self._get_uncapped_values() != self._last_uncapped_values:
+            if self._flush_handle is not None:
+                self._flush_handle.cancel()
+                self._flush_handle = None
+            self._pending_attributes = None
+            self._send_rate_limited_update(attributes)
+            return
+
+        if attributes != self._pending_attributes:
+            self._device.metrics.suppressed_updates += 1
+        self._pending_attributes = attributes
+        if self._flush_handle is None:
+            self._flush_handle = self._device.call_later(
+                delay, self._flush_pending_update
+            )
+
+    def _flush_pending_update(self) -> None:
+        """Send the latest update held back by the update rate limit (trailing edge)."""
+        attributes, self._pending_attributes = self._pending_attributes, None
+        self._flush_handle = None
+        if attributes is not None:
+            self._send_rate_limited_update(attributes)
+
+    def _send_rate_limited_update(self, attributes: dict[str, Any]) -> None:
+        self._last_update = time.monotonic()
+        self._last_attributes = attributes
+        self._last_uncapped_values = self._get_uncapped_values()
+        self.update(attributes)
+
+    def _get_uncapped_values(self) -> list[Any]:
+        """Return the values of the status sensor's members, whose changes are sent right away."""
+        return [
+            self._entity_attribute_map[sensor_type]().get(SensorAttr.VALUE)
+            for sensor_type in self._uncapped_sensor_types
+        ]
+
+    def _get_status_sensor_attributes(self) -> dict[str, Any]:
+        """Get the consolidated status sensor attributes, which summarize all sensors of the group."""
+        _name, sensor_types = _status_sensors[self._sensor_type]
+        values = []
+
+        for sensor_type in sensor_types:
+            attributes = self._entity_attribute_map[sensor_type]()
+            value = attributes.get(SensorAttr.VALUE)
+            if value is None or value == "":
+                continue
+
+            unit = attributes.get(SensorAttr.UNIT)
+            values.append(
+                f"{_sensor_labels[sensor_type]}: {value}"
+                + (f" {unit}" if unit == "dB" else "")
+            )
+
+        return {
+            SensorAttr.STATE: SENSOR_STATE_MAPPING[self._device.state],
+            SensorAttr.VALUE: " | ".join(values),
+        }
+
     def _get_audio_stream_sensor_attributes(self) -> dict[str, Any]:
         """Get the current Audio stream sensor attributes."""
         values = [
@@ -10,11 +10,11 @@ forms for manual device entry and validation of device connections.
 import logging
 from typing import Any
 
-from ucapi import IntegrationSetupError, RequestUserInput, SetupError
+from ucapi import IntegrationSetupError, RequestUserInput, SetupError, UserDataResponse
 from ucapi_framework import BaseSetupFlow, DiscoveredDevice
 
 from uc_intg_stormaudio.config import StormAudioConfig
-from uc_intg_stormaudio.const import Loggers
+from uc_intg_stormaudio.const import Loggers, SelectType, StatusType
 from uc_intg_stormaudio.stormaudio import StormAudioClient
 
 _LOG = logging.getLogger(Loggers.SETUP_FLOW)
@@ -52,6 +52,26 @@ _MANUAL_INPUT_SCHEMA = RequestUserInput(
     ],
 )
 
+_sensor_group_labels = {
+    StatusType.AUDIO: {"en": "Audio sensors", "de": "Audio-Sensoren"},
+    StatusType.VIDEO: {"en": "Video sensors", "de": "Video-Sensoren"},
+    StatusType.PROCESSING: {"en": "Processing sensors", "de": "Verarbeitungs-Sensoren"},
+    StatusType.TONE: {"en": "Tone control sensors", "de": "Klangregelungs-Sensoren"},
+}
+
+_select_labels = {
+    SelectType.AURO_PRESET: {
+        "en": "Auro-Matic preset select",
+        "de": "Auswahl Auro-Matic-Preset",
+    },
+    SelectType.AURO_STRENGTH: {
+        "en": "Auro-Matic strength select",
+        "de": "Auswahl Auro-Matic-Stärke",
+    },
+    SelectType.PRESET: {"en": "Preset select", "de": "Auswahl Preset"},
+    SelectType.SOUND_MODE: {"en": "Sound mode select", "de": "Auswahl Sound-Modus"},
+}
+
 
 class StormAudioSetupFlow(BaseSetupFlow[StormAudioConfig]):
     """
@@ -135,6 +155,106 @@ class StormAudioSetupFlow(BaseSetupFlow[StormAudioConfig]):
             _LOG.info("Please verify the device address and try again")
             return SetupError(IntegrationSetupError.CONNECTION_REFUSED)
 
+    async def get_additional_configuration_screen(
+        self, device_config: StormAudioConfig, previous_input: dict[str, Any]
+    ) -> RequestUserInput | None:
+        """
+        Let the user choose the sensor groups and selects to expose, all other entities are never created.
+
+        If the device is set up again, the choices of its stored configuration are pre-filled.
+        """
+        if stored_config := self._get_stored_config(device_config):
+            device_config.sensor_groups = list(stored_config.sensor_groups)
+            device_config.select_types = list(stored_config.select_types)
+            device_config.consolidated_status = stored_config.consolidated_status
+
+        return RequestUserInput(
+            {"en": "Entities", "de": "Entitäten"},
+            [
+                {
+                    "id": "info",
+                    "label": {
+                        "en": "Choose the entities to expose",
+                        "de": "Wähle die Entitäten aus",
+                    },
+                    "field": {
+                        "label": {
+                            "value": {
+                                "en": "Entities you don't need aren't created at all, which saves resources.",
+                                "de": "Nicht benötigte Entitäten werden gar nicht erst erstellt, was Ressourcen spart.",
+                            }
+                        }
+                    },
+                },
+                *(
+                    {
+                        "id": f"sensor_group_{group}",
+                        "label": label,
+                        "field": {
+                            "checkbox": {"value": group in device_config.sensor_groups}
+                        },
+                    }
+                    for group, label in _sensor_group_labels.items()
+                ),
+                {
+                    "id": "consolidated_status",
+                    "label": {
+                        "en": "One status sensor per group instead of one sensor per value",
+                        "de": "Ein Status-Sensor pro Gruppe statt ein Sensor pro Wert",
+                    },
+                    "field": {"checkbox": {"value": device_config.consolidated_status}},
+                },
+                *(
+                    {
+                        "id": f"select_type_{select_type}",
+                        "label": label,
+                        "field": {
+                            "checkbox": {
+                                "value": select_type in device_config.select_types
+                            }
+                        },
+                    }
+                    for select_type, label in _select_labels.items()
+                ),
+            ],
+        )
+
+    async def handle_additional_configuration_response(
+        self, msg: UserDataResponse
+    ) -> None:
+        """Store the chosen sensor groups and selects in the pending device configuration."""
+        config = self._pending_device_config
+        values = msg.input_values
+
+        config.sensor_groups = [
+            group
+            for group in StatusType
+            if _is_checked(values.get(f"sensor_group_{group}"))
+        ]
+        config.select_types = [
+            select_type
+            for select_type in SelectType
+            if _is_checked(values.get(f"select_type_{select_type}"))
+        ]
+        config.consolidated_status = _is_checked(values.get("consolidated_status"))
+
+        _LOG.debug(
+            "Exposing the sensor groups %s and the selects %s",
+            config.sensor_groups,
+            config.select_types,
+        )
+
+    def _get_stored_config(
+        self, device_config: StormAudioConfig
+    ) -> StormAudioConfig | None:
+        """Return the stored configuration of the device, if it is reconfigured or set up again."""
+        for identifier in (self._selected_config_id, device_config.identifier):
+            if identifier is not None and (
+                stored_config := self.config.get(identifier)
+            ):
+                return stored_config
+        return None
+
     async def test_connection(self, config: StormAudioConfig):
         """Try to connect to the added device. If it works, it is most probably a StormAudio device."""
         _LOG.debug("Attempting to connect to device at %s", config.address)
@@ -142,3 +262,8 @@ class StormAudioSetupFlow(BaseSetupFlow[StormAudioConfig]):
         client = StormAudioClient(address=config.address, port=config.port)
         connection = await client.connect()
         await client.close(connection)
+
+
+def _is_checked(value: Any) -> bool:
+    """Return whether a checkbox has been checked, as the values may be submitted as strings."""
+    return value is True or str(value).lower() == "true"
@@ -0,0 +1,68 @@
+"""
+Startup Profile Module.
+
+This module records the timeline of the driver's startup phases, e.g. to find out what delays the driver
+after a restart of the Remote.
+
+:license: Mozilla Public License Version 2.0, see LICENSE for more details.
+"""
+
+import json
+import logging
+import os
+import sys
+import time
+
+from uc_intg_stormaudio.const import Loggers
+from uc_intg_stormaudio.persistence import PersistenceWorker
+
+_LOG = logging.getLogger(Loggers.DRIVER)
+
+_PROFILE_FILE_NAME = "startup_profile.json"
+
+
+class StartupProfile:
+    """
+    Timeline of the startup phases.
+
+    The interpreter startup and all the imports happen before the profile can be created. Therefore, their duration
+    is taken from the CPU time the process has consumed so far, as importing is CPU-bound.
+    """
+
+    def __init__(self):
+        """Start the timeline, the time spent so far is recorded as the `imports` phase."""
+        self._imports = time.process_time()
+        self._modules = len(sys.modules)
+        self._started_at = time.perf_counter()
+        self._last_mark = self._started_at
+        self._phases: list[tuple[str, float]] = [("imports", self._imports)]
+
+    def mark(self, phase: str) -> None:
+        """Record the end of a phase, which started at the end of the previous one."""
+        now = time.perf_counter()
+        self._phases.append((phase, now - self._last_mark))
+        self._last_mark = now
+
+    def write(self, config_dir: str, persistence: PersistenceWorker) -> None:
+        """Log the timeline and write it to the configuration directory."""
+        total = self._imports + self._last_mark - self._started_at
+        _LOG.info(
+            "Startup took %.0f ms: %s",
+            total * 1000,
+            ", ".join(
+                f"{phase} {duration * 1000:.0f} ms" for phase, duration in self._phases
+            ),
+        )
+
+        profile = {
+            "total_ms": round(total * 1000, 1),
+            "phases_ms": {
+                phase: round(duration * 1000, 1) for phase, duration in self._phases
+            },
+            "modules_at_startup": self._modules,
+            "modules_loaded": len(sys.modules),
+        }
+        persistence.schedule(
+            os.path.join(config_dir, _PROFILE_FILE_NAME),
+            lambda: json.dumps(profile, indent=2),
+        )
@@ -7,22 +7,58 @@ This module handles the TCP/Telnet connection to the StormAudio device.
 """
 
 import asyncio
+import json
 import logging
+import socket
+import time
 from asyncio import StreamReader, StreamWriter
 
-from uc_intg_stormaudio.const import Loggers
+from uc_intg_stormaudio.const import Loggers, StormAudioResponses
+from uc_intg_stormaudio.tracing import (
+    STAGE_ACKNOWLEDGED,
+    STAGE_WRITTEN,
+    CommandTrace,
+    current_trace,
+    record,
+    use_trace,
+)
 
 _LOG = logging.getLogger(Loggers.DEVICE)
 
+# See RFC 8305, the recommended connection attempt delay is 250 ms
+HAPPY_EYEBALLS_DELAY = 0.25
+DNS_CACHE_TTL = 300.0
+READ_SIZE = 64 * 1024
+
+
+class ConnectionLostError(ConnectionError):
+    """Raised for pending responses, when the connection they have been waiting on is lost."""
+
 
 class StormAudioClient:
     """TCP-Client for interacting with the StormAudio device."""
 
-    def __init__(self, address: str, port: int):
-        """Initialize the client."""
-        self._waiters: list[tuple[str, asyncio.Future[str], bool]] = []
+    def __init__(self, address: str, port: int, addresses: list[str] | None = None):
+        """
+        Initialize the client.
+
+        :param address: IP address or hostname of the device
+        :param port: Port number of the device
+        :param addresses: Additional candidate addresses of the device, e.g. all the addresses advertised via mDNS
+        """
+        self._waiters: list[
+            tuple[str, asyncio.Future[str], bool, CommandTrace | None]
+        ] = []
+        self._generation = 0
         self._address = address
         self._port = port
+        self.addresses: list[str] = addresses or []
+        self.connected_address: str | None = None
+        """The address of the most recent successful connection, which is tried first on the next connect."""
+        self.connect_rtt: float | None = None
+        """Duration in seconds of the most recent successful connection establishment."""
+        # The expiry (monotonic time) and the addresses of the most recent resolution of the address
+        self._dns_cache: tuple[float, list[str]] | None = None
 
     @property
     def log_id(self) -> str:
@@ -30,17 +66,171 @@ class StormAudioClient:
         return f"{self._address}:{self._port}"
 
     async def connect(self) -> tuple[StreamReader, StreamWriter]:
-        """Establish a TCP connection to the device."""
-        reader, writer = await asyncio.open_connection(self._address, self._port)
+        """
+        Establish a TCP connection to the device.
+
+        The connection attempts to all candidate addresses are raced against each other (happy eyeballs): every
+        attempt is started after the previous one failed or after a short delay, whatever happens first.
+        """
+        candidates = await self._get_candidates()
+
+        started_at = time.monotonic()
+        index, connection, errors = await self._race_connections(candidates)
+
+        if connection is None:
+            _LOG.debug(
+                "[%s] Failed to connect to any of %s: %s",
+                self.log_id,
+                candidates,
+                errors,
+            )
+            raise next(
+                iter(errors), OSError(f"No address to connect to for {self._address}")
+            )
+
+        # Each connection starts a new generation. Waiters of a previous one can never be resolved anymore.
+        self.fail_waiters()
+        self._generation += 1
+
+        self.connected_address = candidates[index]
+        self.connect_rtt = time.monotonic() - started_at
+        _LOG.debug(
+            "[%s] Connected via %s in %.0f ms",
+            self.log_id,
+            self.connected_address,
+            self.connect_rtt * 1000,
+        )
+
+        return connection
+
+    async def _race_connections(
+        self, candidates: list[str]
+    ) -> tuple[int, tuple[StreamReader, StreamWriter] | None, list[Exception]]:
+        """
+        Race the connection attempts to the candidate addresses, see RFC 8305.
+
+        `loop.create_connection` only races the addresses of a single host, while the candidates also include the
+        addresses advertised via mDNS. Attempts which succeeded as well, but lost the race, are closed.
+
+        :return: The index of the winning candidate, its connection (or `None`) and the errors of the failed attempts
+        """
+        attempts: dict[asyncio.Task, int] = {}
+        pending: set[asyncio.Task] = set()
+        errors: list[Exception] = []
+        try:
+            while pending or len(attempts) < len(candidates):
+                timeout = None
+                if len(attempts) < len(candidates):
+                    candidate = candidates[len(attempts)]
+                    attempt = asyncio.create_task(
+                        asyncio.open_connection(candidate, self._port)
+                    )
+                    attempts[attempt] = len(attempts)
+                    pending.add(attempt)
+                    if len(attempts) < len(candidates):
+                        timeout = HAPPY_EYEBALLS_DELAY
 
-        return reader, writer
+                done, pending = await asyncio.wait(
+                    pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                # The first attempt (in the order of the candidates) wins if several ones succeeded at once
+                for attempt in sorted(done, key=attempts.__getitem__):
+                    if (error := attempt.exception()) is not None:
+                        errors.append(error)
+                    else:
+                        done.discard(attempt)
+                        pending |= done
+                        return attempts[attempt], attempt.result(), errors
+        finally:
+            for attempt in pending:
+                attempt.cancel()
+            for result in await asyncio.gather(*pending, return_exceptions=True):
+                if isinstance(result, tuple):
+                    result[1].close()
+
+        return -1, None, errors
+
+    async def _get_candidates(self) -> list[str]:
+        """Return all candidate addresses, starting with the one which won the previous race."""
+        try:
+            resolved = await self._resolve()
+        except socket.gaierror:
+            if not self.addresses:
+                raise
+            resolved = []
+
+        candidates = [self.connected_address] if self.connected_address else []
+        for candidate in resolved + self.addresses:
+            if candidate not in candidates:
+                candidates.append(candidate)
+
+        return candidates
+
+    async def _resolve(self) -> list[str]:
+        """Resolve the address of the device, caching the result to avoid hammering the resolver on reconnects."""
+        now = time.monotonic()
+        if self._dns_cache and self._dns_cache[0] > now:
+            return self._dns_cache[1]
+
+        address_infos = await asyncio.get_running_loop().getaddrinfo(
+            self._address, self._port, type=socket.SOCK_STREAM
+        )
+        addresses = list(
+            dict.fromkeys(sockaddr[0] for _f, _t, _p, _c, sockaddr in address_infos)
+        )
+        self._dns_cache = (now + DNS_CACHE_TTL, addresses)
+
+        return addresses
 
     async def close(self, connection: tuple[StreamReader, StreamWriter]) -> None:
-        """Close the TCP connection."""
+        """Close the TCP connection and fail all pending waiters."""
+        self.fail_waiters()
         _reader, writer = connection
         writer.close()
         await writer.wait_closed()
 
+    async def identify(
+        self, connect_timeout: float = 1.0, read_timeout: float = 2.0
+    ) -> dict[str, str] | None:
+        """
+        Connect to the device and read its brand and model from the initial data burst.
+
+        :param connect_timeout: Timeout in seconds for establishing the connection
+        :param read_timeout: Timeout in seconds for reading the brand and model
+        :return: The brand and model or None, if this is not a StormAudio (compatible) device
+        """
+        try:
+            connection = await asyncio.wait_for(self.connect(), connect_timeout)
+        except (OSError, asyncio.TimeoutError):
+            return None
+
+        reader, _writer = connection
+        identity: dict[str, str] = {}
+
+        try:
+            async with asyncio.timeout(read_timeout):
+                while len(identity) < 2 and (data := await reader.readline()):
+                    message = data.decode(errors="replace").strip()
+
+                    for key, prefix in (
+                        ("brand", StormAudioResponses.BRAND_X),
+                        ("model", StormAudioResponses.MODEL_X),
+                    ):
+                        if message.startswith(prefix):
+                            value, *_tail = json.loads(
+                                message[len(prefix) :]  # noqa: E203
+                            )
+                            identity[key] = value
+        except (OSError, ValueError, asyncio.TimeoutError):
+            pass
+        finally:
+            try:
+                await self.close(connection)
+            except OSError:
+                pass
+
+        return identity if len(identity) == 2 else None
+
     async def send_command(
         self, connection: tuple[StreamReader, StreamWriter], command: str
     ) -> None:
@@ -49,50 +239,172 @@ class StormAudioClient:
         _LOG.debug("[%s] Sending: %s", self.log_id, command)
         writer.write((command + "\n").encode())
         await writer.drain()
+        record(STAGE_WRITTEN, command)
+
+    async def send_commands(
+        self, connection: tuple[StreamReader, StreamWriter], commands: list[str]
+    ) -> None:
+        """Send multiple commands to the device in a single write."""
+        _reader, writer = connection
+        _LOG.debug("[%s] Sending: %s", self.log_id, ", ".join(commands))
+        writer.write("".join(command + "\n" for command in commands).encode())
+        await writer.drain()
+        record(STAGE_WRITTEN, ", ".join(commands))
+
+    async def send_commands_and_wait(
+        self,
+        connection: tuple[StreamReader, StreamWriter],
+        commands: dict[str, str],
+        timeout: float = 1.0,
+    ) -> dict[str, str | None]:
+        """
+        Send multiple commands in a single write and wait for all of their responses.
+
+        The waiters are registered before the commands are sent and share a single deadline.
+
+        :param connection: The connection to send the commands on
+        :param commands: Mapping of each command to the prefix of its expected response
+        :param timeout: Deadline in seconds for all responses
+        :return: Mapping of each command to its response or None if it didn't arrive in time
+        :raises ConnectionLostError: If the connection is lost before all responses arrived
+        """
+        if not commands:
+            return {}
+
+        loop = asyncio.get_running_loop()
+        trace = current_trace()
+        waiters = {
+            command: (pattern, loop.create_future(), True, trace)
+            for command, pattern in commands.items()
+        }
+        self._waiters.extend(waiters.values())
+
+        try:
+            await self.send_commands(connection, list(commands))
+            _done, pending = await asyncio.wait(
+                [
+                    future
+                    for _pattern, future, _prefix_match, _trace in waiters.values()
+                ],
+                timeout=timeout,
+            )
+        finally:
+            for waiter in waiters.values():
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+
+        for _pattern, future, _prefix_match, _trace in waiters.values():
+            if future.done() and future.exception():
+                raise future.exception()
+
+        if pending:
+            _LOG.warning(
+                "[%s] Timeout waiting for %d of %d responses",
+                self.log_id,
+                len(pending),
+                len(commands),
+            )
+
+        return {
+            command: future.result() if future.done() else None
+            for command, (_pattern, future, _prefix_match, _trace) in waiters.items()
+        }
 
     async def wait_for_response(
         self, pattern: str, timeout: float = 1.0, prefix_match: bool = False
     ) -> str | None:
-        """Wait for a specific response from the device."""
+        """
+        Wait for a specific response from the device.
+
+        :raises ConnectionLostError: If the connection is lost before the response arrived
+        """
         future = asyncio.get_running_loop().create_future()
-        self._waiters.append((pattern, future, prefix_match))
+        waiter = (pattern, future, prefix_match, current_trace())
+        self._waiters.append(waiter)
 
         try:
             return await asyncio.wait_for(future, timeout=timeout)
         except asyncio.TimeoutError:
             _LOG.warning("[%s] Timeout waiting for response: %s", self.log_id, pattern)
-            if (pattern, future, prefix_match) in self._waiters:
-                self._waiters.remove((pattern, future, prefix_match))
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
             return None
 
-    def _notify_waiters(self, message: str) -> None:
+    def fail_waiters(self) -> None:
+        """Fail all pending waiters, as their connection has been lost."""
+        waiters, self._waiters = self._waiters, []
+        for _pattern, future, _prefix_match, _trace in waiters:
+            if not future.done():
+                future.set_exception(ConnectionLostError("Connection lost"))
+
+    def _notify_waiters(self, message: str) -> CommandTrace | None:
+        """Resolve the first waiter matching the message, and return the trace of its command (if any)."""
         for waiter in self._waiters[:]:
-            pattern, future, prefix_match = waiter
+            pattern, future, prefix_match, trace = waiter
             match = message.startswith(pattern) if prefix_match else pattern in message
             if match and not future.done():
                 future.set_result(message)
                 self._waiters.remove(waiter)
-                break
+                if trace:
+                    trace.record(STAGE_ACKNOWLEDGED, message)
+                return trace
+
+        return None
 
     async def parse_response_messages(
-        self, connection: tuple[StreamReader, StreamWriter], message_handler=None
+        self,
+        connection: tuple[StreamReader, StreamWriter],
+        message_handler=None,
+        batch_handler=None,
     ) -> None:
-        """Retrieve and process the response messages from the TCP connection."""
+        """
+        Retrieve and process the response messages from the TCP connection.
+
+        If a single read contains multiple messages and a batch handler is given, those are passed to the batch
+        handler at once. Otherwise, every message is passed to the message handler.
+
+        Once the connection is lost, all pending waiters fail. Messages of a connection that has already been
+        superseded by a new one never resolve any waiters.
+
+        A message acknowledging a traced command is handled within the command's trace, so the resulting updates
+        are recorded in it. A batch is handled within the trace of its first acknowledged command.
+        """
         reader, _writer = connection
+        generation = self._generation
+        buffer = b""
 
-        while True:
-            data = await reader.readline()
-            if not data:
-                break  # Connection closed
+        try:
+            while data := await reader.read(READ_SIZE):
+                *lines, buffer = (buffer + data).split(b"\n")
+
+                messages = [
+                    message for line in lines if (message := line.decode().strip())
+                ]
+                traces = []
+                for message in messages:
+                    _LOG.debug("[%s] Received: %s", self.log_id, message)
 
-            # Process message
-            message = data.decode().strip()
-            _LOG.debug("[%s] Received: %s", self.log_id, message)
+                    traces.append(
+                        self._notify_waiters(message)
+                        if generation == self._generation
+                        else None
+                    )
 
-            self._notify_waiters(message)
+                if batch_handler and len(messages) > 1:
+                    self._handle(
+                        batch_handler, messages, next(filter(None, traces), None)
+                    )
+                elif message_handler:
+                    for message, trace in zip(messages, traces):
+                        self._handle(message_handler, message, trace)
+        finally:
+            if generation == self._generation:
+                self.fail_waiters()
 
-            if message_handler:
-                try:
-                    message_handler(message)
-                except Exception as ex:  # pylint: disable=broad-exception-caught
-                    _LOG.error("Error handling message %s: %s", message, ex)
+    @staticmethod
+    def _handle(handler, messages, trace: CommandTrace | None) -> None:
+        try:
+            with use_trace(trace):
+                handler(messages)
+        except Exception as ex:  # pylint: disable=broad-exception-caught
+            _LOG.error("Error handling message %s: %s", messages, ex)
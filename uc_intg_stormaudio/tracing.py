@@ -0,0 +1,224 @@
+"""
+Command Tracing Module.
+
+This module traces every command of the Remote end-to-end: from receiving it, via writing it to the ISP and matching
+the ISP's acknowledgement, to updating the device attributes and the entities. The traces are written as JSON lines
+to a bounded, rotating file in the configuration directory, so it is visible exactly where each millisecond goes.
+
+The trace of a command is propagated via a context variable, so it follows the command into all the tasks and
+callbacks it causes (e.g. `sync_state` of the entities). Only the ISP's acknowledgement arrives in the reader task,
+which therefore passes the trace of the matched command on to the message handler.
+
+:license: Mozilla Public License Version 2.0, see LICENSE for more details.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import queue
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import wraps
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, Iterator
+
+from ucapi_framework import Entity
+
+from uc_intg_stormaudio.const import Loggers
+
+_LOG = logging.getLogger(Loggers.DRIVER)
+
+TRACE_FILE_NAME = "command_traces.jsonl"
+MAX_TRACE_FILE_SIZE = 1024 * 1024
+TRACE_FILE_BACKUPS = 2
+TRACE_LINGER = 1.0  # traces are written this long after their command has been handled, to catch the late updates
+
+# Stages of a command
+STAGE_RECEIVED = "received"
+STAGE_QUEUED = "queued"
+STAGE_QUEUED_OFFLINE = "queued_offline"
+STAGE_WRITTEN = "written"
+STAGE_ACKNOWLEDGED = "acknowledged"
+STAGE_ATTRIBUTES_UPDATED = "attributes_updated"
+STAGE_ENTITY_UPDATED = "entity_updated"
+STAGE_HANDLED = "handled"
+
+_current_trace: ContextVar["CommandTrace | None"] = ContextVar(
+    "command_trace", default=None
+)
+_tracer: "CommandTracer | None" = None  # pylint: disable=invalid-name
+
+
+@dataclass
+class CommandTrace:
+    """
+    Trace of a single command.
+
+    Every stage is recorded with its offset in milliseconds from receiving the command, and an optional detail,
+    e.g. the raw command written to the ISP or the entity updated.
+    """
+
+    entity_id: str
+    """Identifier of the entity, which received the command."""
+
+    command: str
+    """Identifier of the command."""
+
+    params: dict[str, Any] | None = None
+    """Parameters of the command."""
+
+    received_at: float = field(default_factory=time.time)
+    """Time (epoch) the command has been received."""
+
+    status: str | None = None
+    """Status code returned to the Remote."""
+
+    stages: list[tuple[str, float, str | None]] = field(default_factory=list)
+    """Recorded stages with their offset in milliseconds and their detail."""
+
+    closed: bool = False
+    """Whether the trace has been written, so no further stages are recorded."""
+
+    _started_at: float = field(
+        default_factory=time.perf_counter, init=False, repr=False
+    )
+
+    def record(self, stage: str, detail: str | None = None) -> None:
+        """Record a stage of the command."""
+        if not self.closed:
+            self.stages.append(
+                (stage, (time.perf_counter() - self._started_at) * 1000, detail)
+            )
+
+    def to_json(self) -> str:
+        """Return the trace as a single JSON line."""
+        return json.dumps(
+            {
+                "received_at": round(self.received_at, 3),
+                "entity_id": self.entity_id,
+                "command": self.command,
+                "params": self.params,
+                "status": self.status,
+                "stages": [
+                    {"stage": stage, "ms": round(offset, 3)}
+                    | ({"detail": detail} if detail is not None else {})
+                    for stage, offset, detail in self.stages
+                ],
+            },
+            default=str,
+            ensure_ascii=False,
+        )
+
+
+class CommandTracer:
+    """
+    Writer of the command traces.
+
+    The traces are written by a background thread to a rotating file, so neither the file I/O nor the rotation
+    happen on the event loop and the traces never take more than a bounded amount of (flash) storage.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = MAX_TRACE_FILE_SIZE,
+        backup_count: int = TRACE_FILE_BACKUPS,
+    ):
+        """
+        Initialize the tracer and start its writer thread.
+
+        :param path: Path of the trace file
+        :param max_bytes: Size of the trace file, at which it is rotated
+        :param backup_count: Number of rotated trace files to keep
+        """
+        handler = RotatingFileHandler(
+            path,
+            maxBytes=max_bytes,
+            backupCount=backup_count,
+            encoding="utf-8",
+            delay=True,
+        )
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._queue_handler = QueueHandler(self._queue)
+        self._listener = QueueListener(self._queue, handler)
+        self._listener.start()
+        _LOG.info("Tracing the commands to %s", path)
+
+    def finish(self, trace: CommandTrace, status: str | None) -> None:
+        """Record the end of the command and write its trace, once its late updates have been recorded."""
+        trace.status = status
+        trace.record(STAGE_HANDLED, status)
+        asyncio.get_running_loop().call_later(TRACE_LINGER, self._write, trace)
+
+    def _write(self, trace: CommandTrace) -> None:
+        trace.closed = True
+        self._queue_handler.enqueue(logging.makeLogRecord({"msg": trace.to_json()}))
+
+    def stop(self) -> None:
+        """Stop the writer thread, after it has written all traces enqueued so far."""
+        self._listener.stop()
+
+
+class TracedEntity(Entity):
+    """Entity, which records its updates sent to the Remote in the current command trace."""
+
+    def filter_changed_attributes(self, update: dict[str, Any]) -> dict[str, Any]:
+        """Filter the given attributes and return only the changed values, which are sent to the Remote."""
+        changed = super().filter_changed_attributes(update)
+        if changed:
+            record(STAGE_ENTITY_UPDATED, self._framework_entity_id)
+        return changed
+
+
+def traced_command(handle_command):
+    """Trace the commands handled by the decorated `handle_command` method of an entity."""
+
+    @wraps(handle_command)
+    async def wrapper(self, entity, cmd_id: str, params, *args, **kwargs):
+        if _tracer is None:
+            return await handle_command(self, entity, cmd_id, params, *args, **kwargs)
+
+        trace = CommandTrace(entity.id, cmd_id, params)
+        trace.record(STAGE_RECEIVED)
+        status = None
+        try:
+            with use_trace(trace):
+                status = await handle_command(
+                    self, entity, cmd_id, params, *args, **kwargs
+                )
+            return status
+        finally:
+            _tracer.finish(trace, getattr(status, "name", status))
+
+    return wrapper
+
+
+def configure(config_dir: str) -> CommandTracer:
+    """Start tracing the commands to the trace file in the configuration directory."""
+    global _tracer  # pylint: disable=global-statement
+    _tracer = CommandTracer(os.path.join(config_dir, TRACE_FILE_NAME))
+    return _tracer
+
+
+def current_trace() -> CommandTrace | None:
+    """Return the trace of the command currently being handled, if any."""
+    return _current_trace.get()
+
+
+def record(stage: str, detail: str | None = None) -> None:
+    """Record a stage in the trace of the command currently being handled, if any."""
+    if trace := _current_trace.get():
+        trace.record(stage, detail)
+
+
+@contextmanager
+def use_trace(trace: CommandTrace | None) -> Iterator[None]:
+    """Make the given trace the current trace within the context, e.g. while handling a command's acknowledgement."""
+    token = _current_trace.set(trace)
+    try:
+        yield
+    finally:
+        _current_trace.reset(token)